@@ -11,39 +11,57 @@ from flask import (
     redirect,
     url_for,
     session,
+    Response,
+    stream_with_context,
 )
 import os
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
-import tempfile
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables FIRST
 load_dotenv(dotenv_path=".env")
 
 # Import models and database
-from models import db, Customer, Quote, Job, PdfData
+from models import db, Customer, Quote, Job, PdfData, RfmsOutbox
 from models.customer import ApprovedCustomer
 
 # Import utility modules
-from utils.pdf_extractor import extract_data_from_pdf
 from utils.rfms_api import RfmsApi
-from utils.email_utils import EmailSender
+from utils.rfms_resilience import CircuitOpenError
+from utils.email_utils import EmailSender, email_sender
 # Import the payload service with comprehensive format support
 from utils import payload_service
-
-# Configure logging
+from utils.upload_stream import StreamingUploadRequest, NotAPdfUpload, spool_upload
+from utils.rfms_outbox import OutboxDispatcher, enqueue_export
+from utils.memory_guard import MemoryGuard
+from utils.po_splitter import extract_purchase_orders
+from utils.pdf_history import list_pdfs, load_archived_pdf, parse_date_bound
+from utils.db_engine import configure_database
+from utils.write_behind import WriteBehindQueue
+from utils.http_cache import init_http_cache, revalidated
+from utils.http_compression import init_compression
+from utils.customer_search import CustomerSearch, decode_search_cursor, encode_search_cursor
+from utils.tracing import current_trace, init_tracing, install_log_record_factory, span, use_trace
+
+# Configure logging; every record carries the request's trace ID ("-" outside a request)
+install_log_record_factory()
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(), logging.FileHandler("app.log")],
+    format="%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s",
+    # delay: the file is opened on the first record, not at import
+    handlers=[logging.StreamHandler(), logging.FileHandler("app.log", delay=True)],
 )
 logger = logging.getLogger(__name__)
 
 # App configuration
 app = Flask(__name__)
+# Stream PDF uploads to disk with on-the-fly hashing instead of buffering them
+app.request_class = StreamingUploadRequest
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key")
 # Ensure DATABASE_URI is used, allowing different DBs for different forks via .env
 app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
@@ -52,21 +70,27 @@ app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", "uploads")
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max upload size
+app.config["PDF_MAX_UPLOAD_BYTES"] = int(os.getenv("PDF_MAX_UPLOAD_BYTES", str(app.config["MAX_CONTENT_LENGTH"])))
+app.config["UPLOAD_SPOOL_DIR"] = os.getenv("UPLOAD_SPOOL_DIR", app.config["UPLOAD_FOLDER"])
 app.config["ALLOWED_EXTENSIONS"] = {"pdf"}
 
-# Disable caching in development
-@app.after_request
-def add_header(response):
-    if 'Cache-Control' not in response.headers:
-        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    return response
+# gzip/brotli for large text responses; registered first so it runs after every other hook
+init_compression(app)
+# Fingerprinted static URLs cached as immutable, ETag revalidation for read APIs, no-store otherwise
+init_http_cache(app)
+# Trace ID per request; span timings go out as Server-Timing and one trace record per request
+init_tracing(app)
 
 # Ensure upload directory exists
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
-# Initialize database with app
+# Initialize database with app (WAL and busy timeouts on SQLite, pool sizing elsewhere)
+configure_database(app)
 db.init_app(app)
 
+# Non-critical writes (the shared RFMS session row) are coalesced and committed in batches
+write_behind = WriteBehindQueue(app)
+
 # RFMS API Client Initialization
 rfms_base_url = os.getenv("RFMS_BASE_URL", "https://api.rfms.online")
 rfms_store_code = os.getenv("RFMS_STORE_CODE")
@@ -99,9 +123,17 @@ else:
         store_code=rfms_store_code,
         username=rfms_username,
         api_key=rfms_api_key,
+        write_behind=write_behind,
     )
     logger.info("RFMS API client initialized successfully with comprehensive format support")
 
+@app.errorhandler(CircuitOpenError)
+def handle_rfms_circuit_open(error):
+    logger.warning(f"[CIRCUIT] Request rejected fast: {str(error)}")
+    response = jsonify({"error": "RFMS is currently unavailable. Please try again shortly.", "detail": str(error)})
+    response.headers["Retry-After"] = os.getenv("RFMS_CIRCUIT_OPEN_SECONDS", "30")
+    return response, 503
+
 def ensure_rfms_api():
     if rfms_api_client is None:
         raise Exception("RFMS API client not configured or failed to initialize. Please check credentials and logs.")
@@ -109,6 +141,104 @@ def ensure_rfms_api():
     # rfms_api_client.ensure_session() # Assuming this is still needed and part of your RfmsApi class
     return rfms_api_client
 
+# Background pool for RFMS calls that can overlap with PDF extraction
+def _new_rfms_executor():
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("RFMS_BACKGROUND_WORKERS", "4")),
+        thread_name_prefix="rfms-bg",
+    )
+
+rfms_executor = _new_rfms_executor()
+
+def submit_rfms_task(fn, *args, **kwargs):
+    """
+    Run fn on the RFMS background pool inside an app context (session storage uses the DB).
+
+    RFMS calls made by fn are recorded in the submitting request's trace.
+    """
+    trace = current_trace()
+    def run():
+        with app.app_context(), use_trace(trace):
+            return fn(*args, **kwargs)
+    return rfms_executor.submit(run)
+
+# Customer search pages are cached briefly and the next page is prefetched on the RFMS pool
+customer_search = CustomerSearch(ensure_rfms_api, submit_rfms_task)
+
+# Durable outbox: exports are stored before RFMS is called and delivered in the background
+outbox_dispatcher = OutboxDispatcher(app, ensure_rfms_api)
+
+def reset_after_fork():
+    """
+    Drop process-bound state inherited from a pre-fork master (gunicorn --preload).
+
+    The child gets its own DB connection pool, log file descriptor and RFMS
+    thread pool; the outbox dispatcher and mail queue already restart per pid.
+    """
+    global rfms_executor
+    rfms_executor = _new_rfms_executor()
+    memory_guard.reset()
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: the parent's connections stay usable by the parent
+            engine.dispose(close=False)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler):
+            handler.close()  # reopened on the next record
+
+# RSS accounting around extractions; workers over the ceiling are recycled
+memory_guard = MemoryGuard(ceiling_mb=float(os.getenv("WORKER_MAX_RSS_MB", "0")))
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+@app.after_request
+def recycle_worker_over_memory(response):
+    # Only gunicorn replaces a worker that exits; the dev server would just stop
+    if memory_guard.recycle_pending and request.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn"):
+        response.call_on_close(memory_guard.recycle)
+    return response
+
+@app.before_request
+def start_outbox_dispatcher():
+    if rfms_api_client is not None and os.getenv("RFMS_OUTBOX_ENABLED", "true").lower() == "true":
+        outbox_dispatcher.ensure_started()
+
+@app.before_request
+def start_mail_queue():
+    # Deliver mail spooled before a crash or redeploy without waiting for a new notification
+    if email_sender.queue_enabled and email_sender.is_configured:
+        email_sender.queue.start_if_pending()
+
+def start_po_check(api_client, po_number, session_future=None):
+    """Start the RFMS duplicate-PO lookup in the background once the session is ready."""
+    def check():
+        if session_future is not None:
+            session_future.result()
+        return api_client.find_order_by_po_number(po_number)
+    return submit_rfms_task(check)
+
+def resolve_po_status(api_client, po_number, po_future=None):
+    """
+    Turn the result of a duplicate-PO lookup into a (status, message) pair.
+
+    Uses the already running lookup when one was started for this PO number,
+    otherwise queries RFMS directly.
+    """
+    if not po_number:
+        return "missing", "No purchase order number extracted from PDF."
+    try:
+        with span("po_check"):
+            if po_future is not None:
+                result = po_future.result()
+            else:
+                result = api_client.find_order_by_po_number(po_number)
+        if result and isinstance(result, list) and len(result) > 0:
+            return "duplicate", "This purchase order already exists in RFMS. Please check before proceeding."
+        return "new", "New purchase order approved for processing."
+    except Exception as e:
+        logger.error(f"Error checking PO number in RFMS: {str(e)}")
+        return "error", f"Error checking PO number in RFMS: {str(e)}"
+
 def allowed_file(filename):
     return (
         "." in filename
@@ -132,21 +262,78 @@ def index():
     }
     return render_template("index.html", recent_pdfs=recent_pdfs, stats=stats)
 
+def apply_ui_field_mapping(extracted_data):
+    """Copy PDF phones and alternate contacts into the phone3/phone4/BEST CONTACT fields the UI shows."""
+    logger.info(f"[UI_MAPPING] Starting UI field mapping...")
+    logger.info(f"[UI_MAPPING] Available data - pdf_phone3: '{extracted_data.get('pdf_phone3', '')}', pdf_phone4: '{extracted_data.get('pdf_phone4', '')}', alternate_contacts: {len(extracted_data.get('alternate_contacts', []))}")
+    
+    # Map PDF extracted phones to UI fields for display and editing
+    if extracted_data.get("pdf_phone3") and not extracted_data.get("phone3"):
+        extracted_data["phone3"] = extracted_data["pdf_phone3"]
+        logger.info(f"[UI_MAPPING] Mapped pdf_phone3 '{extracted_data['pdf_phone3']}' to phone3 field for UI display")
+    
+    if extracted_data.get("pdf_phone4") and not extracted_data.get("phone4"):
+        extracted_data["phone4"] = extracted_data["pdf_phone4"]
+        logger.info(f"[UI_MAPPING] Mapped pdf_phone4 '{extracted_data['pdf_phone4']}' to phone4 field for UI display")
+    
+    # Build consolidated BEST CONTACT field from alternate_contacts
+    alt_contacts = extracted_data.get("alternate_contacts", [])
+    if alt_contacts:
+        best_contact_lines = []
+        available_phones = []
+        
+        # Build contact summary text and collect all phones
+        for contact in alt_contacts:
+            if contact.get("name") and contact.get("name").strip():
+                contact_line = f"{contact.get('type', 'Contact')}: {contact.get('name')}"
+                if contact.get("phone"):
+                    contact_line += f" ({contact.get('phone')})"
+                    if contact.get("phone") not in available_phones:
+                        available_phones.append(contact.get("phone"))
+                if contact.get("phone2"):
+                    contact_line += f", {contact.get('phone2')}"
+                    if contact.get("phone2") not in available_phones:
+                        available_phones.append(contact.get("phone2"))
+                if contact.get("email"):
+                    contact_line += f" - {contact.get('email')}"
+                best_contact_lines.append(contact_line)
+        
+        # Set BEST CONTACT field
+        if best_contact_lines:
+            extracted_data["best_contact_summary"] = "; ".join(best_contact_lines)
+            logger.info(f"[UI_MAPPING] Created best_contact_summary: '{extracted_data['best_contact_summary'][:100]}...'")
+        
+        # Ensure phone3 and phone4 are set from available phones if not already set
+        if not extracted_data.get("phone3") and available_phones:
+            extracted_data["phone3"] = available_phones[0]
+            logger.info(f"[UI_MAPPING] Set phone3 from alternate_contacts: '{available_phones[0]}'")
+        
+        if not extracted_data.get("phone4") and len(available_phones) > 1:
+            extracted_data["phone4"] = available_phones[1] 
+            logger.info(f"[UI_MAPPING] Set phone4 from alternate_contacts: '{available_phones[1]}'")
+    
+    logger.info(f"[UI_MAPPING] Final UI fields - phone3: '{extracted_data.get('phone3', '')}', phone4: '{extracted_data.get('phone4', '')}', best_contact_summary: '{extracted_data.get('best_contact_summary', '')[:50]}...'")
+
 @app.route("/upload-pdf", methods=["POST"])
 def upload_pdf_api():
     api_client = ensure_rfms_api()
-    session_ok = api_client.ensure_session() # Assuming ensure_session is part of your RfmsApi class
-    logger.info(
-        f"RFMS session ready after PDF upload: {session_ok}, token: {api_client.session_token}, expiry: {api_client.session_expiry}"
-    )
-    if not session_ok:
-        return jsonify({"error": "Could not establish RFMS session. Please try again."}), 500
+    # Refresh the RFMS session in the background while the PDF is parsed
+    session_future = submit_rfms_task(api_client.ensure_session)
 
-    if "pdf_file" not in request.files:
+    try:
+        # Parsing streams the body through PdfUploadSpool, which rejects
+        # oversized or non-PDF uploads as soon as it sees them
+        with span("upload.receive"):
+            uploaded_files = request.files
+    except HTTPException as e:
+        logger.warning(f"Upload rejected while streaming: {e.description}")
+        return jsonify({"error": e.description}), e.code
+
+    if "pdf_file" not in uploaded_files:
         logger.warning("No file part in upload request.")
         return jsonify({"error": "No file part"}), 400
 
-    file = request.files["pdf_file"]
+    file = uploaded_files["pdf_file"]
     if file.filename == "":
         logger.warning("No selected file in upload request.")
         return jsonify({"error": "No selected file"}), 400
@@ -154,98 +341,69 @@ def upload_pdf_api():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         builder_name = request.form.get('builder_name', '')
-        logger.info(f"Processing PDF for builder: {builder_name}")
+        builder_id = request.form.get('builder_id', '')
+        logger.info(f"Processing PDF for builder: {builder_name} (RFMS ID {builder_id or 'n/a'})")
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            file.save(tmp_file.name)
-            temp_path = tmp_file.name
         try:
-            extracted_data = extract_data_from_pdf(temp_path, builder_name=builder_name)
-            logger.info(f"Successfully extracted data for {filename}")
-            os.remove(temp_path)
+            spool, temp_path, content_sha256 = spool_upload(file, app.config["UPLOAD_SPOOL_DIR"])
+        except NotAPdfUpload as e:
+            logger.warning(f"Rejected upload {filename}: {e.description}")
+            return jsonify({"error": e.description}), e.code
+        if spool is not None:
+            # Close the upload's handle before the extractor opens the file; it is removed below
+            spool.release()
+        # Start the duplicate-PO lookup as soon as the extractor finds a PO number
+        po_checks = {}
+        def on_po_number(po_number):
+            if po_number not in po_checks:
+                po_checks[po_number] = start_po_check(api_client, po_number, session_future)
+
+        try:
+            # One result per purchase order; bundled POs are split and extracted concurrently
+            with memory_guard.track(filename), span("pdf.extract"):
+                purchase_orders = extract_purchase_orders(
+                    temp_path, builder_name=builder_name, on_po_number=on_po_number, builder_id=builder_id
+                )
+            logger.info(f"Successfully extracted {len(purchase_orders)} PO(s) from {filename}")
+
+            with span("rfms.session_wait"):
+                session_ok = session_future.result()
+            logger.info(
+                f"RFMS session ready after PDF upload: {session_ok}, token: {api_client.session_token}, expiry: {api_client.session_expiry}"
+            )
+            if not session_ok:
+                return jsonify({"error": "Could not establish RFMS session. Please try again."}), 500
 
             # --- Check for duplicate PO number in RFMS ---
-            po_number = extracted_data.get("po_number", "")
-            po_status = "unknown"
-            po_message = ""
-            if po_number:
-                try:
-                    result = api_client.find_order_by_po_number(po_number)
-                    if result and isinstance(result, list) and len(result) > 0:
-                        po_status = "duplicate"
-                        po_message = "This purchase order already exists in RFMS. Please check before proceeding."
-                    else:
-                        po_status = "new"
-                        po_message = "New purchase order approved for processing."
-                except Exception as e:
-                    logger.error(f"Error checking PO number in RFMS: {str(e)}")
-                    po_status = "error"
-                    po_message = f"Error checking PO number in RFMS: {str(e)}"
-            else:
-                po_status = "missing"
-                po_message = "No purchase order number extracted from PDF."
+            for po_data in purchase_orders:
+                po_data["content_sha256"] = content_sha256
+                po_number = po_data.get("po_number", "")
+                po_status, po_message = resolve_po_status(api_client, po_number, po_checks.get(po_number))
 
-            # Add PO status info to response
-            extracted_data["po_status"] = po_status
-            extracted_data["po_status_message"] = po_message
+                # Add PO status info to response
+                po_data["po_status"] = po_status
+                po_data["po_status_message"] = po_message
 
             # Enhanced UI mapping for phone fields and BEST CONTACT
-            logger.info(f"[UI_MAPPING] Starting UI field mapping...")
-            logger.info(f"[UI_MAPPING] Available data - pdf_phone3: '{extracted_data.get('pdf_phone3', '')}', pdf_phone4: '{extracted_data.get('pdf_phone4', '')}', alternate_contacts: {len(extracted_data.get('alternate_contacts', []))}")
-            
-            # Map PDF extracted phones to UI fields for display and editing
-            if extracted_data.get("pdf_phone3") and not extracted_data.get("phone3"):
-                extracted_data["phone3"] = extracted_data["pdf_phone3"]
-                logger.info(f"[UI_MAPPING] Mapped pdf_phone3 '{extracted_data['pdf_phone3']}' to phone3 field for UI display")
-            
-            if extracted_data.get("pdf_phone4") and not extracted_data.get("phone4"):
-                extracted_data["phone4"] = extracted_data["pdf_phone4"]
-                logger.info(f"[UI_MAPPING] Mapped pdf_phone4 '{extracted_data['pdf_phone4']}' to phone4 field for UI display")
-            
-            # Build consolidated BEST CONTACT field from alternate_contacts
-            alt_contacts = extracted_data.get("alternate_contacts", [])
-            if alt_contacts:
-                best_contact_lines = []
-                available_phones = []
-                
-                # Build contact summary text and collect all phones
-                for contact in alt_contacts:
-                    if contact.get("name") and contact.get("name").strip():
-                        contact_line = f"{contact.get('type', 'Contact')}: {contact.get('name')}"
-                        if contact.get("phone"):
-                            contact_line += f" ({contact.get('phone')})"
-                            if contact.get("phone") not in available_phones:
-                                available_phones.append(contact.get("phone"))
-                        if contact.get("phone2"):
-                            contact_line += f", {contact.get('phone2')}"
-                            if contact.get("phone2") not in available_phones:
-                                available_phones.append(contact.get("phone2"))
-                        if contact.get("email"):
-                            contact_line += f" - {contact.get('email')}"
-                        best_contact_lines.append(contact_line)
-                
-                # Set BEST CONTACT field
-                if best_contact_lines:
-                    extracted_data["best_contact_summary"] = "; ".join(best_contact_lines)
-                    logger.info(f"[UI_MAPPING] Created best_contact_summary: '{extracted_data['best_contact_summary'][:100]}...'")
-                
-                # Ensure phone3 and phone4 are set from available phones if not already set
-                if not extracted_data.get("phone3") and available_phones:
-                    extracted_data["phone3"] = available_phones[0]
-                    logger.info(f"[UI_MAPPING] Set phone3 from alternate_contacts: '{available_phones[0]}'")
-                
-                if not extracted_data.get("phone4") and len(available_phones) > 1:
-                    extracted_data["phone4"] = available_phones[1] 
-                    logger.info(f"[UI_MAPPING] Set phone4 from alternate_contacts: '{available_phones[1]}'")
-            
-            logger.info(f"[UI_MAPPING] Final UI fields - phone3: '{extracted_data.get('phone3', '')}', phone4: '{extracted_data.get('phone4', '')}', best_contact_summary: '{extracted_data.get('best_contact_summary', '')[:50]}...'")
+            for po_data in purchase_orders:
+                apply_ui_field_mapping(po_data)
 
+            # The first PO stays at the top level for single-PO clients
+            extracted_data = dict(purchase_orders[0])
+            if len(purchase_orders) > 1:
+                extracted_data["purchase_orders"] = purchase_orders
             return jsonify(extracted_data), 200
+        except CircuitOpenError:
+            # Answered by handle_rfms_circuit_open with a 503 and Retry-After
+            raise
         except Exception as e:
             logger.error(f"Error extracting data from PDF {filename}: {str(e)}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
             return jsonify({"error": f"Error extracting data: {str(e)}"}), 500
+        finally:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
     else:
         logger.warning(f"Invalid file type uploaded: {file.filename}")
         return jsonify({"error": "Invalid file type. Please upload a PDF."}), 400
@@ -253,79 +411,93 @@ def upload_pdf_api():
 @app.route("/upload", methods=["POST"])
 def upload_file():
     """Handles PDF upload, extraction, saves to DB, and redirects to preview."""
-    if "pdf_file" not in request.files:
+    try:
+        with span("upload.receive"):
+            uploaded_files = request.files
+    except HTTPException as e:
+        flash(e.description)
+        return redirect(request.url)
+
+    if "pdf_file" not in uploaded_files:
         flash("No file part")
         return redirect(request.url)
 
-    file = request.files["pdf_file"]
+    file = uploaded_files["pdf_file"]
     if file.filename == "":
         flash("No selected file")
         return redirect(request.url)
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        # It's often better to save to a temporary location first,
-        # or process in memory if possible, rather than directly to UPLOAD_FOLDER
-        # before validation and extraction are complete.
-        # For now, keeping original logic but consider changing if uploads are large/frequent.
         file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(file_path)
+        try:
+            spool, spooled_path, content_sha256 = spool_upload(file, app.config["UPLOAD_SPOOL_DIR"])
+        except NotAPdfUpload as e:
+            flash(e.description)
+            return redirect(request.url)
+        # The upload was streamed into the upload folder already; just rename it into place
+        if spool is not None:
+            spool.persist(file_path)
+        else:
+            os.replace(spooled_path, file_path)
 
         try:
-            extracted_data = extract_data_from_pdf(file_path, builder_name="")
-            
-            # --- Check for duplicate PO number in RFMS ---
             api_client = ensure_rfms_api()
-            po_number = extracted_data.get("po_number", "")
-            po_status = "unknown"
-            po_message = ""
-            if po_number:
-                try:
-                    result = api_client.find_order_by_po_number(po_number)
-                    if result and isinstance(result, list) and len(result) > 0:
-                        po_status = "duplicate"
-                        po_message = "This purchase order already exists in RFMS. Please check before proceeding."
-                    else:
-                        po_status = "new"
-                        po_message = "New purchase order approved for processing."
-                except Exception as e:
-                    logger.error(f"Error checking PO number in RFMS: {str(e)}")
-                    po_status = "error"
-                    po_message = f"Error checking PO number in RFMS: {str(e)}"
-            else:
-                po_status = "missing"
-                po_message = "No purchase order number extracted from PDF."
-
-            # Add PO status info to response and DB
-            extracted_data["po_status"] = po_status
-            extracted_data["po_status_message"] = po_message
-
-            # Map PDF extracted phones to UI fields for display and editing
-            # This ensures the alternate contact phones appear in the Phone 3 and Phone 4 fields
-            if extracted_data.get("pdf_phone3") and not extracted_data.get("phone3"):
-                extracted_data["phone3"] = extracted_data["pdf_phone3"]
-                logger.info(f"[UI_MAPPING] Mapped pdf_phone3 '{extracted_data['pdf_phone3']}' to phone3 field for UI display")
-            
-            if extracted_data.get("pdf_phone4") and not extracted_data.get("phone4"):
-                extracted_data["phone4"] = extracted_data["pdf_phone4"]
-                logger.info(f"[UI_MAPPING] Mapped pdf_phone4 '{extracted_data['pdf_phone4']}' to phone4 field for UI display")
-
-            pdf_data_entry = PdfData(
-                filename=filename,
-                customer_name=extracted_data.get("customer_name", ""),
-                business_name=extracted_data.get("business_name", ""),
-                po_number=extracted_data.get("po_number", ""),
-                scope_of_work=extracted_data.get("scope_of_work", ""),
-                dollar_value=extracted_data.get("dollar_value", 0),
-                extracted_data=extracted_data, # Storing the full JSON
-                created_at=datetime.now(),
-                # processed=False # Initialize as not processed until user confirms
-            )
-            db.session.add(pdf_data_entry)
+            session_future = submit_rfms_task(api_client.ensure_session)
+            po_checks = {}
+            def on_po_number(po_number):
+                if po_number not in po_checks:
+                    po_checks[po_number] = start_po_check(api_client, po_number, session_future)
+
+            with memory_guard.track(filename), span("pdf.extract"):
+                purchase_orders = extract_purchase_orders(file_path, builder_name="", on_po_number=on_po_number)
+
+            # One PdfData row per PO so each can be reviewed and batch-exported on its own
+            entries = []
+            for extracted_data in purchase_orders:
+                extracted_data["content_sha256"] = content_sha256
+
+                # --- Check for duplicate PO number in RFMS ---
+                po_number = extracted_data.get("po_number", "")
+                po_status, po_message = resolve_po_status(api_client, po_number, po_checks.get(po_number))
+
+                # Add PO status info to response and DB
+                extracted_data["po_status"] = po_status
+                extracted_data["po_status_message"] = po_message
+
+                # Map PDF extracted phones to UI fields for display and editing
+                # This ensures the alternate contact phones appear in the Phone 3 and Phone 4 fields
+                if extracted_data.get("pdf_phone3") and not extracted_data.get("phone3"):
+                    extracted_data["phone3"] = extracted_data["pdf_phone3"]
+                    logger.info(f"[UI_MAPPING] Mapped pdf_phone3 '{extracted_data['pdf_phone3']}' to phone3 field for UI display")
+
+                if extracted_data.get("pdf_phone4") and not extracted_data.get("phone4"):
+                    extracted_data["phone4"] = extracted_data["pdf_phone4"]
+                    logger.info(f"[UI_MAPPING] Mapped pdf_phone4 '{extracted_data['pdf_phone4']}' to phone4 field for UI display")
+
+                pdf_data_entry = PdfData(
+                    filename=filename,
+                    customer_name=extracted_data.get("customer_name", ""),
+                    business_name=extracted_data.get("business_name", ""),
+                    po_number=extracted_data.get("po_number", ""),
+                    scope_of_work=extracted_data.get("scope_of_work", ""),
+                    dollar_value=extracted_data.get("dollar_value", 0),
+                    extracted_data=extracted_data, # Storing the full JSON
+                    created_at=datetime.now(),
+                    # processed=False # Initialize as not processed until user confirms
+                )
+                db.session.add(pdf_data_entry)
+                entries.append(pdf_data_entry)
             db.session.commit()
 
-            flash(f"File '{filename}' uploaded and data extracted. Please review below.")
-            return redirect(url_for("preview_data", pdf_id=pdf_data_entry.id))
+            if len(entries) > 1:
+                flash(
+                    f"File '{filename}' contained {len(entries)} purchase orders "
+                    f"({', '.join(e.po_number or '?' for e in entries)}). Reviewing the first."
+                )
+            else:
+                flash(f"File '{filename}' uploaded and data extracted. Please review below.")
+            return redirect(url_for("preview_data", pdf_id=entries[0].id))
 
         except Exception as e:
             logger.error(f"Error processing uploaded PDF {filename}: {str(e)}")
@@ -346,45 +518,141 @@ def preview_data(pdf_id):
     return render_template("preview.html", pdf_data=pdf_data, extracted_data_json=json.dumps(pdf_data.extracted_data))
 
 
+@app.route("/api/pdfs")
+@revalidated()
+def list_pdfs_api():
+    """
+    Upload history, newest first, one keyset page at a time.
+
+    Query parameters: limit, cursor (next_cursor of the previous page), builder,
+    po, processed (true/false), since and until (ISO dates), archived (true to
+    search the monthly archives instead of recent uploads).
+    """
+    args = request.args
+    try:
+        processed = args.get("processed")
+        page = list_pdfs(
+            cursor=args.get("cursor") or None,
+            limit=args.get("limit", 50, type=int),
+            archived=args.get("archived", "false").lower() == "true",
+            builder=args.get("builder", "").strip(),
+            po_number=args.get("po", "").strip(),
+            processed=None if processed in (None, "") else processed.lower() == "true",
+            since=parse_date_bound(args["since"]) if args.get("since") else None,
+            until=parse_date_bound(args["until"], end=True) if args.get("until") else None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+
+@app.route("/api/pdfs/<int:pdf_id>")
+@revalidated()
+def get_pdf_api(pdf_id):
+    """One upload with its extracted data, from the live table or the archives."""
+    pdf_data = db.session.get(PdfData, pdf_id)
+    if pdf_data is not None:
+        return jsonify(pdf_data.to_dict())
+    record = load_archived_pdf(pdf_id)
+    if record is None:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(record)
+
+
 @app.route("/api/customers/search", methods=["POST"])
 def search_customers():
+    """
+    Search approved customers, then RFMS, one page at a time.
+
+    Body: {"term": "..."} for the first page, or {"cursor": "..."} for the page
+    after it. The next page's cursor comes back in X-Next-Cursor (JSON list) or
+    as the last line of the stream when the client accepts application/x-ndjson.
+    """
     api_client = ensure_rfms_api()
-    data = request.get_json()
-    search_term = data.get("term", "") if data else ""
-    start_index = int(data.get("start_index", 0)) if data else 0
+    data = request.get_json(silent=True) or {}
+    cursor = data.get("cursor")
+    try:
+        if cursor:
+            search_term, start_index = decode_search_cursor(cursor)
+        else:
+            search_term, start_index = data.get("term", ""), int(data.get("start_index", 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if not search_term:
         logger.warning("Empty search term provided")
         return jsonify({"error": "Search term is required."}), 400
 
+    stream = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
     try:
         logger.info(f"Searching for customers with term: {search_term}, start_index: {start_index}")
-        approved_matches = ApprovedCustomer.query.filter(
-            (ApprovedCustomer.name.ilike(f"%{search_term}%")) |
-            (ApprovedCustomer.business_name.ilike(f"%{search_term}%")) |
-            (ApprovedCustomer.first_name.ilike(f"%{search_term}%")) |
-            (ApprovedCustomer.last_name.ilike(f"%{search_term}%"))
-        ).all()
+        approved_matches = []
+        if not cursor:
+            approved_matches = [a.to_dict() for a in ApprovedCustomer.query.filter(
+                (ApprovedCustomer.name.ilike(f"%{search_term}%")) |
+                (ApprovedCustomer.business_name.ilike(f"%{search_term}%")) |
+                (ApprovedCustomer.first_name.ilike(f"%{search_term}%")) |
+                (ApprovedCustomer.last_name.ilike(f"%{search_term}%"))
+            ).all()]
         if approved_matches:
             logger.info(f"[APPROVED_CUSTOMER] Cache hit for search '{search_term}'")
-            return jsonify([a.to_dict() for a in approved_matches])
+            # RFMS is only asked if the user wants more than the approved list
+            next_cursor = None if search_term.isdigit() else encode_search_cursor(search_term, 0)
+            if stream:
+                return _customer_stream(approved_matches, None, next_cursor)
+            response = jsonify(approved_matches)
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            return response
 
         if search_term.isdigit():
             formatted_customers = api_client.find_customer_by_id(search_term)
-        else:
-            customers = api_client.find_customer_by_name(search_term, include_inactive=True, start_index=start_index)
-            formatted_customers = api_client._format_customer_list(customers) # Assuming _format_customer_list is part of RfmsApi
-
-        if not isinstance(formatted_customers, list) or not formatted_customers:
-            logger.info(f"No customers found for search term: {search_term}")
-            return jsonify([])
-        
-        logger.info(f"Found {len(formatted_customers)} customers for search term: {search_term}")
-        return jsonify(formatted_customers)
+            if not isinstance(formatted_customers, list):
+                formatted_customers = []
+            if stream:
+                return _customer_stream(formatted_customers, None, None)
+            return jsonify(formatted_customers)
+
+        if stream:
+            # Headers go out now; rows follow as soon as RFMS answers
+            return _customer_stream([], (search_term, start_index), None)
+        page = customer_search.search(search_term, start_index)
+        logger.info(f"Found {len(page['customers'])} customers for search term: {search_term}")
+        response = jsonify(page["customers"])
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return response
     except Exception as e:
         logger.error(f"Error searching customers: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def _customer_stream(customers, rfms_page, next_cursor):
+    """
+    NDJSON search results: one {"customer": ...} line per record, then {"next_cursor": ...}.
+
+    rfms_page, a (term, start_index) pair, is fetched inside the stream so the
+    client can render earlier lines while RFMS is still answering.
+    """
+    def generate():
+        cursor = next_cursor
+        for customer in customers:
+            yield json.dumps({"customer": customer}) + "\n"
+        if rfms_page:
+            try:
+                page = customer_search.search(*rfms_page)
+            except Exception as e:
+                logger.error(f"Error searching customers: {str(e)}")
+                yield json.dumps({"error": str(e)}) + "\n"
+                return
+            for customer in page["customers"]:
+                yield json.dumps({"customer": customer}) + "\n"
+            cursor = page["next_cursor"]
+        yield json.dumps({"next_cursor": cursor}) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 @app.route("/api/create_customer", methods=["POST"])
 def create_customer_api():
     api_client = ensure_rfms_api()
@@ -452,19 +720,8 @@ def create_job_api():
         logger.error(f"Error creating job directly: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route("/api/export-to-rfms", methods=["POST"])
-def export_to_rfms_api():
-    """Export customer, job, and order data to RFMS API using comprehensive format."""
-    api_client = ensure_rfms_api()
-    export_request_data = request.json
-    if not export_request_data:
-        logger.warning("No data provided for RFMS export")
-        return jsonify({"error": "No data provided for export"}), 400
-    
-    # Log the format transition
-    logger.info("RFMS Export - Using Comprehensive Format (AZ002876 + Lines)")
-    logger.info("Format Features: Customer fields + Phone optimization + Comprehensive lines")
-    
+def validate_export_request(export_request_data):
+    """Return an error message if an export payload is not ready for RFMS, else None."""
     # Validate Description of Works (publicNotes) 5-word minimum
     description = ''
     if 'job_details' in export_request_data:
@@ -473,14 +730,32 @@ def export_to_rfms_api():
         description = export_request_data.get('publicNotes', '')
     word_count = len(description.strip().split())
     if word_count < 5:
-        return jsonify({'error': 'General Scope of Works required!  example: Restrectch carpet back in bedroom two or Floor preperation PO for adding to billing group'}), 400
+        return 'General Scope of Works required!  example: Restrectch carpet back in bedroom two or Floor preperation PO for adding to billing group'
 
     # Basic validation (can be expanded in payload_service)
     required_sections = ["sold_to", "ship_to", "job_details"]
     for section in required_sections:
         if section not in export_request_data:
             logger.warning(f"Missing required section for export: {section}")
-            return jsonify({"error": f"Missing required section: {section}"}), 400
+            return f"Missing required section: {section}"
+    return None
+
+@app.route("/api/export-to-rfms", methods=["POST"])
+def export_to_rfms_api():
+    """Queue customer, job, and order data for export to RFMS using comprehensive format."""
+    ensure_rfms_api()
+    export_request_data = request.json
+    if not export_request_data:
+        logger.warning("No data provided for RFMS export")
+        return jsonify({"error": "No data provided for export"}), 400
+    
+    # Log the format transition
+    logger.info("RFMS Export - Using Comprehensive Format (AZ002876 + Lines)")
+    logger.info("Format Features: Customer fields + Phone optimization + Comprehensive lines")
+    
+    validation_error = validate_export_request(export_request_data)
+    if validation_error:
+        return jsonify({"error": validation_error}), 400
             
     logger.info("Starting comprehensive format export to RFMS via /api/export-to-rfms")
     
@@ -492,46 +767,151 @@ def export_to_rfms_api():
     logger.info(f"Export Details: Customer ID={sold_to_id}, PO={po_number}, Supervisor={supervisor_name}")
     
     try:
-        # Delegate payload construction and actual export logic to the service
-        result = payload_service.export_data_to_rfms(api_client, export_request_data, logger)
-        
-        # Log success with format information
-        order_id = result.get("order_id")
-        format_used = result.get("format_used", "comprehensive_lines_az002876_structure")
-        logger.info(f"RFMS Export Success: Order {order_id} created using {format_used}")
-        
-        # Update PdfData entry to processed = True if applicable
-        pdf_id = export_request_data.get("pdf_id") # Assuming you pass this from frontend
-        if pdf_id:
-            pdf_entry = PdfData.query.get(pdf_id)
-            if pdf_entry:
-                pdf_entry.processed = True
-                # Store RFMS job/quote IDs if available in result (column not yet added to model)
-                # pdf_entry.rfms_job_id = result.get("order_id") 
-                db.session.commit()
-                logger.info(f"Updated PDF entry {pdf_id} as processed")
-
-        return jsonify(result)
+        # Build the payload once up front so bad data is rejected now rather than
+        # failing in the background after the user has moved on
+        payload_service.build_rfms_order_payload(export_request_data)
+
+        entry, created = enqueue_export(export_request_data)
+        if entry.status == entry.STATUS_DELIVERED:
+            # Same export already went through (e.g. a browser retry) - return the stored outcome
+            logger.info(f"RFMS Export already delivered: Order {entry.rfms_order_id} (outbox {entry.id})")
+            result = dict(entry.result)
+            result.update(outbox=entry.to_dict(), duplicate_request=True)
+            return jsonify(result)
+
+        outbox_dispatcher.ensure_started()
+        outbox_dispatcher.wake()
+        return jsonify({
+            "success": True,
+            "queued": True,
+            "message": f"Export for PO {po_number} queued for RFMS" + ("" if created else " (already queued)"),
+            "outbox": entry.to_dict(),
+        }), 202
     except payload_service.PayloadError as pe: # Custom exception from service for bad data
         logger.error(f"Payload construction error during RFMS export: {str(pe)}")
         return jsonify({"error": f"Data validation error: {str(pe)}"}), 400
     except Exception as e:
-        logger.error(f"Error during comprehensive format RFMS export: {str(e)}")
-        # Consider more specific error handling based on exceptions from RfmsApi
+        logger.error(f"Error queueing comprehensive format RFMS export: {str(e)}")
         return jsonify({"error": f"An unexpected error occurred during RFMS export: {str(e)}"}), 500
 
+@app.route("/api/export-to-rfms/outbox/<int:outbox_id>", methods=["GET"])
+def export_outbox_status_api(outbox_id):
+    """Delivery status of a queued RFMS export."""
+    entry = db.session.get(RfmsOutbox, outbox_id)
+    if entry is None:
+        return jsonify({"error": "Outbox entry not found"}), 404
+    return jsonify(entry.to_dict())
+
+
+def _export_batch_item(index, export_request_data):
+    """Queue and deliver one item of a batch; never raises so one bad PO cannot sink the batch."""
+    item_result = {
+        "index": index,
+        "pdf_id": export_request_data.get("pdf_id"),
+        "po_number": export_request_data.get("job_details", {}).get("po_number", ""),
+    }
+    try:
+        payload_service.build_rfms_order_payload(export_request_data)
+        entry, _ = enqueue_export(export_request_data)
+        # export_data_to_rfms creates the parent order before the billing-group
+        # child, so ordering within an item is preserved by delivering it as a unit
+        entry = outbox_dispatcher.deliver(entry.id)
+        item_result["outbox_id"] = entry.id
+        if entry.status == entry.STATUS_DELIVERED:
+            item_result.update(status="success", order_id=entry.rfms_order_id, result=entry.result)
+        elif entry.status == entry.STATUS_FAILED:
+            item_result.update(status="failed", error=entry.last_error)
+        else:
+            # Delivery is retrying in the background (or held by another worker)
+            item_result.update(status="queued", error=entry.last_error)
+    except payload_service.PayloadError as pe:
+        logger.error(f"[BATCH_EXPORT] Item {index} failed: {str(pe)}")
+        item_result.update(status="failed", error=str(pe))
+    except Exception as e:
+        logger.error(f"[BATCH_EXPORT] Item {index} unexpected error: {str(e)}")
+        item_result.update(status="failed", error=f"An unexpected error occurred during RFMS export: {str(e)}")
+    return item_result
+
+@app.route("/api/export-to-rfms/batch", methods=["POST"])
+def export_to_rfms_batch_api():
+    """Export many reviewed POs to RFMS with a bounded worker pool and per-item status."""
+    api_client = ensure_rfms_api()
+    batch_request = request.json
+    items = batch_request.get("items") if isinstance(batch_request, dict) else batch_request
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of export payloads"}), 400
+
+    max_items = int(os.getenv("RFMS_EXPORT_BATCH_MAX_ITEMS", "100"))
+    if len(items) > max_items:
+        return jsonify({"error": f"Batch too large: {len(items)} items (max {max_items})"}), 400
+
+    logger.info(f"[BATCH_EXPORT] Starting batch export of {len(items)} items")
+    results = [None] * len(items)
+    runnable = []
+    for index, item in enumerate(items):
+        validation_error = validate_export_request(item) if isinstance(item, dict) else "Export payload must be an object"
+        if validation_error:
+            results[index] = {"index": index, "status": "invalid", "error": validation_error}
+        else:
+            runnable.append((index, item))
+
+    if runnable:
+        # create_job relies on an existing session token, so establish it once up front
+        if not api_client.ensure_session():
+            return jsonify({"error": "Could not establish RFMS session. Please try again."}), 500
+
+        max_workers = int(os.getenv("RFMS_EXPORT_BATCH_WORKERS", "4"))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rfms-export") as pool:
+            # Outbox rows live in the DB, so each worker needs its own app context
+            def run_item(index, item):
+                with app.app_context():
+                    return _export_batch_item(index, item)
+            futures = [pool.submit(run_item, index, item) for index, item in runnable]
+            for future in futures:
+                item_result = future.result()
+                results[item_result["index"]] = item_result
+
+    # PdfData.processed is flipped by the outbox as each item is delivered
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    queued = sum(1 for r in results if r["status"] == "queued")
+    response = {
+        "success": succeeded == len(results),
+        "total": len(results),
+        "succeeded": succeeded,
+        "queued": queued,
+        "failed": len(results) - succeeded - queued,
+        "results": results,
+    }
+    logger.info(f"[BATCH_EXPORT] Finished: {succeeded}/{len(results)} exported")
+    # 207 Multi-Status signals partial failure without hiding the per-item results
+    if response["success"]:
+        status_code = 200
+    elif succeeded or queued:
+        status_code = 207
+    else:
+        status_code = 502 if runnable else 400
+    return jsonify(response), status_code
+
 
 @app.route("/api/check_status")
+@revalidated()
 def check_api_status():
     try:
         api_client = ensure_rfms_api()
         status = api_client.check_status() # Assuming check_status exists in RfmsApi
-        return jsonify({"status": status})
+        return jsonify({
+            "status": status,
+            "circuits": api_client.circuit_status(),
+            "worker_memory": memory_guard.metrics(),
+            "write_behind": write_behind.metrics(),
+            "customer_search": customer_search.metrics(),
+        })
     except Exception as e:
         logger.error(f"API status check failed: {str(e)}")
         return jsonify({"status": "offline", "error": str(e)}), 500
 
 @app.route("/api/salesperson_values")
+@revalidated(max_age=300)
 def get_salesperson_values():
     api_client = ensure_rfms_api()
     try:
@@ -553,6 +933,7 @@ def get_salesperson_values():
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/get_default_salesperson")
+@revalidated(max_age=3600)
 def get_default_salesperson():
     # This can be expanded to fetch from a config or a dedicated RFMS endpoint if available
     default_salesperson = "ZORAN VEKIC" 
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Move uploads older than the retention window into compressed monthly archives.
+
+Archived rows disappear from the live pdf_data table (and so from the home
+page and /api/pdfs) but stay searchable with /api/pdfs?archived=true, and
+/api/pdfs/<id> still returns the full row. Run it from cron, e.g. nightly:
+
+    python archive_pdfs.py                   # PDF_ARCHIVE_RETENTION_DAYS (365)
+    python archive_pdfs.py --retention-days 180 --vacuum
+"""
+import argparse
+import json
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=".env")
+
+from app import app, db
+from utils.pdf_history import PDF_ARCHIVE_RETENTION_DAYS, archive_old_pdfs, ensure_history_indexes
+
+logger = logging.getLogger("archive_pdfs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old uploads into compressed monthly archives")
+    parser.add_argument("--retention-days", type=int, default=PDF_ARCHIVE_RETENTION_DAYS,
+                        help="Keep uploads created within this many days in the live table")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows moved per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="On SQLite, give the freed pages back to the filesystem")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        ensure_history_indexes()
+        summary = archive_old_pdfs(retention_days=args.retention_days, batch_size=max(args.batch_size, 1))
+        if args.vacuum and db.engine.dialect.name == "sqlite" and summary["archived"]:
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql("VACUUM")
+            logger.info("[ARCHIVE] Vacuumed the database")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Database contention benchmark: N worker processes writing at once.
+
+Each worker process plays a gunicorn worker with a few threads and runs the
+app's real write patterns against one shared database: upload inserts
+(PdfData with an extracted-data blob), RFMS session token upserts, processed
+flips and history reads. The same load is run under three settings:
+
+  legacy        rollback journal, synchronous=FULL, the driver's 5s lock wait
+  tuned         utils.db_engine defaults (WAL, synchronous=NORMAL, larger cache, busy timeout)
+  write_behind  tuned, with session upserts coalesced by utils.write_behind
+
+Reported per mode and operation: throughput, latency percentiles and how
+many operations failed with "database is locked".
+
+    python db_benchmark.py --workers 4 --threads 4 --duration 10
+    python db_benchmark.py --modes tuned --database-url postgresql://localhost/rfms_bench
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODES = {
+    "legacy": {
+        "DB_SQLITE_JOURNAL_MODE": "DELETE",
+        "DB_SQLITE_SYNCHRONOUS": "FULL",
+        "DB_SQLITE_CACHE_MB": "0",
+        "DB_BUSY_TIMEOUT_SECONDS": "5",
+        "DB_WRITE_BEHIND_ENABLED": "false",
+    },
+    "tuned": {"DB_WRITE_BEHIND_ENABLED": "false"},
+    "write_behind": {"DB_WRITE_BEHIND_ENABLED": "true"},
+}
+
+BENCH_FILENAME = "db-benchmark.pdf"
+SEED_ROWS = 200
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _bench_blob(index):
+    return {
+        "customer_name": f"Bench Customer {index}",
+        "po_number": f"BENCH-{index}",
+        "raw_text": "Purchase order line item " * 160,
+        "alternate_contacts": [{"type": "Site", "name": "Bench Contact", "phone": "0400 000 000"}],
+    }
+
+
+def worker_main(mode_env, database_url, threads, duration, mix, start_barrier, results):
+    """One simulated gunicorn worker; runs in its own process."""
+    os.environ.update(mode_env)
+    sys.path.insert(0, REPO_DIR)
+    import logging
+    import threading
+
+    from flask import Flask
+    from sqlalchemy.exc import OperationalError
+
+    logging.basicConfig(level=logging.WARNING)
+    from models import PdfData, db
+    from utils.db_engine import configure_database
+    from utils.rfms_api import RfmsApi
+    from utils.write_behind import WriteBehindQueue
+
+    app = Flask("db_benchmark")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    configure_database(app)
+    db.init_app(app)
+    write_behind = WriteBehindQueue(app)
+
+    with app.app_context():
+        seed_ids = [row.id for row in db.session.query(PdfData.id).filter(PdfData.filename == BENCH_FILENAME)]
+
+    ops = list(mix)
+    weights = [mix[op] for op in ops]
+    samples = []
+    samples_lock = threading.Lock()
+
+    def upload(rng):
+        index = rng.randrange(1_000_000)
+        row = PdfData(filename=BENCH_FILENAME, po_number=f"BENCH-{index}", customer_name=f"Bench Customer {index}",
+                      dollar_value=rng.random() * 10000, created_at=datetime.now())
+        row.extracted_data = _bench_blob(index)
+        db.session.add(row)
+        db.session.commit()
+
+    def session(rng):
+        token = f"bench-{os.getpid()}-{rng.randrange(1_000_000)}"
+        write_behind.submit("rfms_session", RfmsApi._save_session_row, token, datetime.utcnow() + timedelta(minutes=15))
+
+    def flip(rng):
+        PdfData.query.filter(PdfData.id == rng.choice(seed_ids)).update(
+            {"processed": True}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def history(rng):
+        db.session.query(PdfData.id, PdfData.po_number, PdfData.created_at).order_by(
+            PdfData.created_at.desc(), PdfData.id.desc()
+        ).limit(50).all()
+        db.session.commit()
+
+    handlers = {"upload": upload, "session": session, "flip": flip, "history": history}
+
+    def run_thread(seed):
+        rng = random.Random(seed)
+        local = []
+        with app.app_context():
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                op = rng.choices(ops, weights)[0]
+                started = time.perf_counter()
+                try:
+                    handlers[op](rng)
+                    outcome = "ok"
+                except OperationalError as e:
+                    db.session.rollback()
+                    outcome = "locked" if "locked" in str(e).lower() else "error"
+                local.append((op, time.perf_counter() - started, outcome))
+        with samples_lock:
+            samples.extend(local)
+
+    start_barrier.wait()
+    pool = [threading.Thread(target=run_thread, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    write_behind.flush()
+    results.put({"samples": samples, "write_behind": write_behind.metrics()})
+
+
+def prepare_database(database_url):
+    """Create the tables and the rows that processed flips update."""
+    sys.path.insert(0, REPO_DIR)
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from models import PdfData, db
+
+    engine = create_engine(database_url)
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.query(PdfData).filter(PdfData.filename == BENCH_FILENAME).delete()
+        for index in range(SEED_ROWS):
+            row = PdfData(filename=BENCH_FILENAME, po_number=f"BENCH-SEED-{index}", created_at=datetime.now())
+            row.extracted_data = _bench_blob(index)
+            session.add(row)
+        session.commit()
+    engine.dispose()
+
+
+def cleanup_database(database_url):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from models import PdfData
+
+    engine = create_engine(database_url)
+    with Session(engine) as session:
+        session.query(PdfData).filter(PdfData.filename == BENCH_FILENAME).delete()
+        session.commit()
+    engine.dispose()
+
+
+def run_mode(name, database_url, args, mix):
+    context = multiprocessing.get_context("spawn")
+    start_barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    mode_env = {"DATABASE_URL": database_url, **MODES[name]}
+    processes = [
+        context.Process(
+            target=worker_main,
+            args=(mode_env, database_url, args.threads, args.duration, mix, start_barrier, results),
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    outputs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    by_op = defaultdict(list)
+    for output in outputs:
+        for op, seconds, outcome in output["samples"]:
+            by_op[op].append((seconds, outcome))
+    report = {"mode": name, "operations": {}, "write_behind": {}}
+    total_ok = 0
+    for op, samples in sorted(by_op.items()):
+        latencies = sorted(seconds for seconds, outcome in samples if outcome == "ok")
+        locked = sum(1 for _, outcome in samples if outcome == "locked")
+        errors = sum(1 for _, outcome in samples if outcome == "error")
+        total_ok += len(latencies)
+        report["operations"][op] = {
+            "ok": len(latencies),
+            "locked": locked,
+            "errors": errors,
+            "per_second": round(len(latencies) / args.duration, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        }
+    for output in outputs:
+        for key, value in output["write_behind"].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                report["write_behind"][key] = report["write_behind"].get(key, 0) + value
+    report["ok_per_second"] = round(total_ok / args.duration, 1)
+    return report
+
+
+def print_report(reports):
+    print(f"{'mode':<13} {'op':<8} {'ok/s':>8} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>9}")
+    for report in reports:
+        for op, stats in report["operations"].items():
+            print(
+                f"{report['mode']:<13} {op:<8} {stats['per_second']:>8} {stats['locked']:>7} "
+                f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['max_ms']:>9}"
+            )
+        wb = report["write_behind"]
+        extra = f" (session writes: {wb.get('submitted', 0)} submitted, {wb.get('committed', 0)} committed)" if wb.get("submitted") else ""
+        print(f"{report['mode']:<13} total    {report['ok_per_second']:>8}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure write contention with concurrent worker processes")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per worker process")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per mode")
+    parser.add_argument("--mix", default="upload=2,session=3,flip=1,history=4", help="Operation weights")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes to run")
+    parser.add_argument("--database-url", help="Run against this database instead of a fresh SQLite file per mode")
+    parser.add_argument("--json", dest="json_out", help="Write the report to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - {"upload", "session", "flip", "history"}
+    if unknown:
+        parser.error(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+
+    reports = []
+    workdir = tempfile.mkdtemp(prefix="db-bench-")
+    try:
+        for name in args.modes.split(","):
+            name = name.strip()
+            if name not in MODES:
+                parser.error(f"Unknown mode {name!r}; choose from {', '.join(MODES)}")
+            database_url = args.database_url or f"sqlite:///{os.path.join(workdir, name + '.db')}"
+            prepare_database(database_url)
+            print(f"Running {name}: {args.workers} workers x {args.threads} threads for {args.duration}s", flush=True)
+            reports.append(run_mode(name, database_url, args, mix))
+            if args.database_url:
+                cleanup_database(database_url)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(reports)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn runs from the repo root
+(the Procfile's "gunicorn app:app").
+
+The app is imported once in the master and workers are forked from it, so a new
+or respawned worker skips the Flask/SQLAlchemy/PDF backend imports entirely.
+app.reset_after_fork() gives every worker its own DB pool and log file handle.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Every worker has its own RFMS rate limiter; split the configured rate between them
+os.environ.setdefault("RFMS_RATE_LIMIT_PROCESSES", str(workers))
+
+
+def when_ready(server):
+    # Runs in the master before the first fork; with preload the PDF backends
+    # are then shared copy-on-write instead of imported by each worker
+    if preload_app:
+        from utils.pdf_extractor import preload_pdf_backends
+
+        preload_pdf_backends()
+        server.log.info("PDF backends preloaded in master")
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Hot-folder ingestion service: extracts PDFs dropped into a directory.
+
+Scanners and mail rules drop POs into HOT_FOLDER_DIR. A file is picked up
+once it is complete: on Linux, inotify reports it closed after writing or
+moved in; elsewhere (or with --polling) its size and mtime must stay
+unchanged for the settle time and it must end with a %%EOF trailer. It is
+then claimed by an atomic rename into .processing/, so a half-written file
+or a second service instance never reads it. Claimed files go through the
+same extraction as /upload, including multi-PO splitting, on a bounded pool
+of processes. The file moves to processed/ and each PO becomes a PdfData row
+ready for review (a file whose content is already stored adds no rows), or it
+moves to failed/ with a .error.txt note.
+
+Throughput, backlog depth and per-file latency are logged every
+--stats-interval seconds and written to <dir>/.status.json.
+
+    python hot_folder.py --dir /srv/po-inbox --workers 4
+    python hot_folder.py --once     # drain what is already there, then exit
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import statistics
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=".env")
+
+from utils.upload_stream import PDF_HEADER, PDF_HEADER_WINDOW
+
+logger = logging.getLogger("hot_folder")
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Even with inotify, rescan now and then in case an event was missed
+RESCAN_SECONDS = 60
+
+# A complete PDF ends with %%EOF (some writers append a few bytes after it)
+PDF_TRAILER = b"%%EOF"
+PDF_TRAILER_WINDOW = 2048
+# A file that never gets a trailer is handed on (and failed) after this many settle periods
+UNTERMINATED_SETTLE_FACTOR = 10
+
+
+def _is_candidate(name):
+    return name.lower().endswith(".pdf") and not name.startswith(".")
+
+
+def has_pdf_trailer(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(os.path.getsize(path) - PDF_TRAILER_WINDOW, 0))
+            return PDF_TRAILER in f.read()
+    except OSError:
+        return False
+
+
+def watch_inotify(directory, on_ready, stop_event):
+    """
+    Report files closed after writing or moved into directory.
+
+    Raises:
+        OSError: If inotify is unavailable (the caller falls back to polling)
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify is not available on this platform")
+    fd = libc.inotify_init1(IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    try:
+        if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        logger.info(f"[HOT_FOLDER] Watching {directory} with inotify")
+        last_scan = time.monotonic()
+        while not stop_event.is_set():
+            readable, _, _ = select.select([fd], [], [], 1.0)
+            if readable:
+                data = os.read(fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="replace")
+                    offset += name_len
+                    if mask & IN_Q_OVERFLOW:
+                        logger.warning("[HOT_FOLDER] inotify queue overflowed; rescanning")
+                        last_scan = 0
+                    elif _is_candidate(name):
+                        on_ready(os.path.join(directory, name))
+            if time.monotonic() - last_scan >= RESCAN_SECONDS:
+                scan_directory(directory, on_ready, settle_seconds=RESCAN_SECONDS)
+                last_scan = time.monotonic()
+    finally:
+        os.close(fd)
+
+
+def scan_directory(directory, on_ready, settle_seconds):
+    """Report PDFs whose mtime is at least settle_seconds old and that end with a PDF trailer."""
+    now = time.time()
+    for entry in os.scandir(directory):
+        if not (entry.is_file() and _is_candidate(entry.name)):
+            continue
+        age = now - entry.stat().st_mtime
+        if age >= settle_seconds and (
+            has_pdf_trailer(entry.path) or age >= settle_seconds * UNTERMINATED_SETTLE_FACTOR
+        ):
+            on_ready(entry.path)
+
+
+def watch_polling(directory, on_ready, stop_event, interval, settle_seconds):
+    """
+    Report PDFs once their size and mtime have not changed for settle_seconds
+    and they end with a PDF trailer, so a writer that pauses is not read mid-file.
+    """
+    logger.info(f"[HOT_FOLDER] Polling {directory} every {interval}s")
+    seen = {}  # path -> ((size, mtime), first seen with that signature)
+    while not stop_event.is_set():
+        now = time.monotonic()
+        current = {}
+        for entry in os.scandir(directory):
+            if not (entry.is_file() and _is_candidate(entry.name)):
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime)
+            previous = seen.get(entry.path)
+            since = previous[1] if previous and previous[0] == signature else now
+            current[entry.path] = (signature, since)
+            stable = min(now - since, time.time() - stat.st_mtime)
+            if stable >= settle_seconds and (
+                has_pdf_trailer(entry.path) or stable >= settle_seconds * UNTERMINATED_SETTLE_FACTOR
+            ):
+                on_ready(entry.path)
+        seen = current
+        stop_event.wait(interval)
+
+
+def _init_extraction_worker():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from utils import po_splitter
+
+    # The service pool already bounds concurrency; extract a bundle's POs in-process
+    po_splitter.PO_SPLIT_WORKERS = 1
+
+
+def _extract_file(path, builder_name):
+    """
+    Runs in a pool process.
+
+    Returns:
+        tuple: (sha256 hex digest, list of per-PO results, extraction seconds)
+    """
+    from utils.po_splitter import extract_purchase_orders
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(PDF_HEADER_WINDOW)
+        digest.update(head)
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    if PDF_HEADER not in head:
+        raise ValueError("File does not start like a PDF")
+    started = time.perf_counter()
+    purchase_orders = extract_purchase_orders(path, builder_name=builder_name)
+    return digest.hexdigest(), purchase_orders, time.perf_counter() - started
+
+
+class IngestStats:
+    """Counters and recent latencies for the status report."""
+
+    def __init__(self, window=500):
+        self.started_at = time.time()
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.purchase_orders = 0
+        self.latencies = deque(maxlen=window)
+        self.extract_times = deque(maxlen=window)
+        self.finished_at = deque(maxlen=window)
+
+    def record(self, ok, latency, extract_seconds=None, purchase_orders=0):
+        if ok:
+            self.processed += 1
+            self.purchase_orders += purchase_orders
+        else:
+            self.failed += 1
+        self.latencies.append(latency)
+        if extract_seconds is not None:
+            self.extract_times.append(extract_seconds)
+        self.finished_at.append(time.monotonic())
+
+    @staticmethod
+    def _ms(samples, q):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+
+    def snapshot(self, backlog, in_flight):
+        recent = [t for t in self.finished_at if time.monotonic() - t <= 300]
+        return {
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "purchase_orders": self.purchase_orders,
+            "backlog": backlog,
+            "in_flight": in_flight,
+            "files_per_minute": round(len(recent) / 5.0, 2),
+            "latency_ms": {
+                "p50": self._ms(self.latencies, 0.5),
+                "p95": self._ms(self.latencies, 0.95),
+                "max": round(max(self.latencies) * 1000, 1) if self.latencies else None,
+            },
+            "extract_ms_median": round(statistics.median(self.extract_times) * 1000, 1) if self.extract_times else None,
+        }
+
+
+class HotFolderService:
+    """
+    Watches a directory and feeds complete PDFs through extraction with bounded concurrency.
+    """
+
+    def __init__(self, app, directory, workers=2, poll_interval=2.0, settle_seconds=2.0,
+                 builder_name="", use_inotify=True, stats_interval=30.0):
+        """
+        Args:
+            app (Flask): The app, for database access
+            directory (str): Folder scanners and mail rules drop PDFs into
+            workers (int): Files extracted at the same time
+            poll_interval (float): Seconds between directory scans when polling
+            settle_seconds (float): How long a polled file must stay unchanged
+            builder_name (str): Builder passed to template detection, if the folder is builder-specific
+            use_inotify (bool): Try inotify before falling back to polling
+            stats_interval (float): Seconds between status reports
+        """
+        self.app = app
+        self.directory = os.path.abspath(directory)
+        self.work_dir = os.path.join(self.directory, ".processing")
+        self.processed_dir = os.getenv("HOT_FOLDER_PROCESSED_DIR") or os.path.join(self.directory, "processed")
+        self.failed_dir = os.getenv("HOT_FOLDER_FAILED_DIR") or os.path.join(self.directory, "failed")
+        self.status_path = os.path.join(self.directory, ".status.json")
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.builder_name = builder_name
+        self.use_inotify = use_inotify
+        self.stats_interval = stats_interval
+        self.stats = IngestStats()
+        self.stop_event = threading.Event()
+        self._pending = deque()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def _on_ready(self, path):
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+            self._pending.append((path, time.monotonic()))
+        self._wakeup.set()
+
+    def _claim(self, path):
+        """Atomically move a ready file into .processing/; None if it is gone (claimed elsewhere)."""
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{os.path.basename(path)}"
+        claimed = os.path.join(self.work_dir, name)
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        self.stats.received += 1
+        return claimed
+
+    def _move(self, claimed, directory):
+        os.makedirs(directory, exist_ok=True)
+        destination = os.path.join(directory, os.path.basename(claimed))
+        os.replace(claimed, destination)
+        return destination
+
+    def _fail(self, claimed, error, queued_at):
+        logger.error(f"[HOT_FOLDER] Failed {os.path.basename(claimed)}: {error}")
+        self.stats.record(False, time.monotonic() - queued_at)
+        try:
+            destination = self._move(claimed, self.failed_dir)
+            with open(destination + ".error.txt", "w") as f:
+                f.write(f"{datetime.now().isoformat(timespec='seconds')}\n{error}\n")
+        except Exception as e:
+            # Left in .processing/ (if still there), it is retried on the next start
+            logger.error(f"[HOT_FOLDER] Could not move {os.path.basename(claimed)} to {self.failed_dir}: {str(e)}")
+
+    def _store(self, claimed, digest, purchase_orders):
+        """
+        Move the file to processed/ and write one PdfData row per PO pointing at it.
+
+        The file moves first, so a committed row never points into .processing/;
+        if the commit fails it is moved back for _fail. A file whose content is
+        already stored (a run that stopped between commit and move, or the same
+        PDF dropped twice) is moved without adding rows.
+
+        Returns:
+            int: Rows added
+        """
+        from models import PdfData, db
+
+        filename = os.path.basename(claimed).split("-", 2)[-1]
+        with self.app.app_context():
+            # content_sha256 lives in the JSON column; rows are written with json.dumps defaults
+            already_stored = db.session.query(
+                PdfData.query.filter(
+                    PdfData.extracted_data_json.contains(f'"content_sha256": "{digest}"')
+                ).exists()
+            ).scalar()
+            destination = self._move(claimed, self.processed_dir)
+            if already_stored:
+                logger.info(f"[HOT_FOLDER] {os.path.basename(claimed)} is already stored; not adding rows")
+                return 0
+            try:
+                for extracted_data in purchase_orders:
+                    extracted_data["content_sha256"] = digest
+                    extracted_data["intake"] = "hot_folder"
+                    db.session.add(PdfData(
+                        filename=filename,
+                        file_path=destination,
+                        customer_name=extracted_data.get("customer_name", ""),
+                        business_name=extracted_data.get("business_name", ""),
+                        po_number=extracted_data.get("po_number", ""),
+                        scope_of_work=extracted_data.get("scope_of_work", ""),
+                        dollar_value=extracted_data.get("dollar_value", 0),
+                        extracted_data=extracted_data,
+                        created_at=datetime.now(),
+                    ))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                os.replace(destination, claimed)
+                raise
+        return len(purchase_orders)
+
+    def _finish(self, claimed, future, queued_at):
+        try:
+            digest, purchase_orders, extract_seconds = future.result()
+            errors = [po["error"] for po in purchase_orders if po.get("error")]
+            if errors:
+                raise ValueError("; ".join(errors))
+            stored = self._store(claimed, digest, purchase_orders)
+        except Exception as e:
+            self._fail(claimed, str(e), queued_at)
+            return
+        latency = time.monotonic() - queued_at
+        self.stats.record(True, latency, extract_seconds, stored)
+        logger.info(
+            f"[HOT_FOLDER] {os.path.basename(claimed)}: {len(purchase_orders)} PO(s) "
+            f"({', '.join(po.get('po_number') or '?' for po in purchase_orders)}) in {latency * 1000:.0f} ms"
+        )
+
+    def report(self, in_flight=0):
+        snapshot = self.stats.snapshot(backlog=len(self._pending), in_flight=in_flight)
+        logger.info(
+            f"[HOT_FOLDER] processed={snapshot['processed']} failed={snapshot['failed']} "
+            f"backlog={snapshot['backlog']} in_flight={snapshot['in_flight']} "
+            f"rate={snapshot['files_per_minute']}/min p50={snapshot['latency_ms']['p50']}ms "
+            f"p95={snapshot['latency_ms']['p95']}ms"
+        )
+        tmp_path = self.status_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, self.status_path)
+        return snapshot
+
+    def _start_watcher(self):
+        def run():
+            if self.use_inotify:
+                try:
+                    watch_inotify(self.directory, self._on_ready, self.stop_event)
+                    return
+                except OSError as e:
+                    logger.warning(f"[HOT_FOLDER] inotify unavailable ({e}); falling back to polling")
+            watch_polling(self.directory, self._on_ready, self.stop_event, self.poll_interval, self.settle_seconds)
+
+        watcher = threading.Thread(target=run, name="hot-folder-watch", daemon=True)
+        watcher.start()
+        return watcher
+
+    def run(self, once=False):
+        """
+        Process files until stopped (SIGINT/SIGTERM), or until the folder is drained with once=True.
+        """
+        for directory in (self.directory, self.work_dir, self.processed_dir, self.failed_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        # Files claimed by a previous run that stopped mid-extraction go first
+        in_flight_recovery = sorted(
+            os.path.join(self.work_dir, name) for name in os.listdir(self.work_dir) if _is_candidate(name)
+        )
+        scan_directory(self.directory, self._on_ready, settle_seconds=0 if once else self.settle_seconds)
+        if not once:
+            self._start_watcher()
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["utils.po_splitter"])
+        else:
+            context = multiprocessing.get_context("spawn")
+        in_flight = {}
+        last_report = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_init_extraction_worker) as pool:
+            def submit(claimed, queued_at):
+                future = pool.submit(_extract_file, claimed, self.builder_name)
+                in_flight[future] = (claimed, queued_at)
+
+            for claimed in in_flight_recovery:
+                logger.info(f"[HOT_FOLDER] Resuming {os.path.basename(claimed)} from a previous run")
+                self.stats.received += 1
+                submit(claimed, time.monotonic())
+
+            while True:
+                while len(in_flight) < self.workers and not self.stop_event.is_set():
+                    with self._lock:
+                        if not self._pending:
+                            break
+                        path, queued_at = self._pending.popleft()
+                        self._queued.discard(path)
+                    claimed = self._claim(path)
+                    if claimed:
+                        submit(claimed, queued_at)
+
+                if in_flight:
+                    done, _ = wait(list(in_flight), timeout=1.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        claimed, queued_at = in_flight.pop(future)
+                        self._finish(claimed, future, queued_at)
+                elif once or self.stop_event.is_set():
+                    break
+                else:
+                    self._wakeup.wait(1.0)
+                    self._wakeup.clear()
+
+                if time.monotonic() - last_report >= self.stats_interval:
+                    self.report(len(in_flight))
+                    last_report = time.monotonic()
+        self.stop_event.set()
+        return self.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract PDFs dropped into a hot folder")
+    parser.add_argument("--dir", default=os.getenv("HOT_FOLDER_DIR", "hot_folder"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HOT_FOLDER_WORKERS", "2")))
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv("HOT_FOLDER_POLL_SECONDS", "2")))
+    parser.add_argument("--settle", type=float, default=float(os.getenv("HOT_FOLDER_SETTLE_SECONDS", "2")),
+                        help="Seconds a polled file must stay unchanged before it is picked up")
+    parser.add_argument("--builder-name", default=os.getenv("HOT_FOLDER_BUILDER_NAME", ""))
+    parser.add_argument("--polling", action="store_true", help="Poll even where inotify is available")
+    parser.add_argument("--stats-interval", type=float, default=float(os.getenv("HOT_FOLDER_STATS_SECONDS", "30")))
+    parser.add_argument("--once", action="store_true", help="Process the files already present, then exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from app import app
+
+    service = HotFolderService(
+        app,
+        args.dir,
+        workers=max(args.workers, 1),
+        poll_interval=args.poll_interval,
+        settle_seconds=args.settle,
+        builder_name=args.builder_name,
+        use_inotify=not args.polling,
+        stats_interval=args.stats_interval,
+    )
+
+    def stop(signum, frame):
+        logger.info("[HOT_FOLDER] Stopping after the files in progress")
+        service.stop_event.set()
+        service._wakeup.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    snapshot = service.run(once=args.once)
+    print(json.dumps(snapshot, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from app import app, db
+from utils.pdf_history import ensure_history_indexes
  
 if __name__ == "__main__":
     with app.app_context():
         db.create_all()
+        ensure_history_indexes()
         print("Database initialized successfully.") 
\ No newline at end of file
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the upload, customer search and RFMS export routes.
+
+By default it starts the RFMS simulator and a gunicorn server (with its own
+scratch database and working directory), then drives a weighted mix of
+/upload-pdf, /api/customers/search and /api/export-to-rfms at each
+concurrency step and reports throughput, p50/p95/p99 latency and error rate
+per route.
+
+    python load_test.py --workers 2 --threads 4 --steps 1,4,8,16 --duration 30
+    python load_test.py --target http://127.0.0.1:5000 --mix upload=1,search=6,export=1
+
+Simulator options (latency, error rates) are passed through with --sim-arg,
+e.g. --sim-arg=--latency --sim-arg="*=lognormal:120:0.5".
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(REPO_DIR, "testing pdfs")
+
+# Builder names from the extractor templates, used to pick builder_name for
+# uploads and search terms that the simulator's seeded customers will match
+BUILDERS = [
+    "Ambrose Construct Group",
+    "Profile Build Group",
+    "Campbell Construction",
+    "Rizon Group",
+    "Australian Restoration Company",
+    "Townsend Building Services",
+    "One Solutions",
+    "Johns Lyng Group",
+]
+SEARCH_TERMS = ["rizon", "profile", "campbell", "townsend", "ambrose", "group", "builder", "1003"]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def builder_for_pdf(filename):
+    lowered = filename.lower()
+    for builder in BUILDERS:
+        if builder.split()[0].lower() in lowered:
+            return builder
+    return ""
+
+
+class Scenario:
+    """Builds requests for each route; shared by all load threads."""
+
+    def __init__(self, base_url, pdf_dir, customer_ids):
+        self.base_url = base_url.rstrip("/")
+        self.pdfs = []
+        for name in sorted(os.listdir(pdf_dir)):
+            if name.lower().endswith(".pdf"):
+                with open(os.path.join(pdf_dir, name), "rb") as f:
+                    self.pdfs.append((name, f.read(), builder_for_pdf(name)))
+        if not self.pdfs:
+            raise SystemExit(f"No PDFs found in {pdf_dir}")
+        self.customer_ids = customer_ids
+        self.po_counter = itertools.count(1)
+        self.run_id = time.strftime("%H%M%S")
+
+    def upload(self, http):
+        name, content, builder = random.choice(self.pdfs)
+        return http.post(
+            f"{self.base_url}/upload-pdf",
+            files={"pdf_file": (name, content, "application/pdf")},
+            data={"builder_name": builder},
+            timeout=120,
+        )
+
+    def search(self, http):
+        return http.post(
+            f"{self.base_url}/api/customers/search",
+            json={"term": random.choice(SEARCH_TERMS), "start_index": 0},
+            timeout=60,
+        )
+
+    def export(self, http):
+        customer_id = random.choice(self.customer_ids)
+        po_number = f"LT{self.run_id}-{next(self.po_counter):06d}"
+        payload = {
+            "sold_to": {"id": customer_id, "customer_source_id": customer_id, "name": "LOAD TEST BUILDER"},
+            "ship_to": {
+                "name": "Load Test Site",
+                "first_name": "Load",
+                "last_name": "Test",
+                "address1": "1 Example Street",
+                "city": "Brisbane City",
+                "state": "QLD",
+                "zip_code": "4000",
+            },
+            "job_details": {
+                "po_number": po_number,
+                "description_of_works": "Supply and install carpet to bedrooms for load test",
+                "dollar_value": round(random.uniform(500, 5000), 2),
+                "supervisor_name": "Load Tester",
+                "supervisor_phone": "0400 000 000",
+            },
+            "billing_group": {},
+        }
+        return http.post(f"{self.base_url}/api/export-to-rfms", json=payload, timeout=60)
+
+
+def run_step(scenario, concurrency, duration, mix):
+    """
+    Run one concurrency level for a fixed duration.
+
+    Returns:
+        dict: {route: [(latency_seconds, ok, status)]}
+    """
+    routes, weights = zip(*mix.items())
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        http = requests.Session()
+        while time.monotonic() < deadline:
+            route = random.choices(routes, weights)[0]
+            start = time.monotonic()
+            try:
+                response = getattr(scenario, route)(http)
+                status = response.status_code
+                ok = status < 400
+            except requests.RequestException as e:
+                status, ok = type(e).__name__, False
+            elapsed = time.monotonic() - start
+            with lock:
+                samples[route].append((elapsed, ok, status))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    summary = {}
+    for route, rows in sorted(samples.items()):
+        latencies = sorted(r[0] for r in rows)
+        errors = [r for r in rows if not r[1]]
+        status_counts = defaultdict(int)
+        for r in rows:
+            status_counts[str(r[2])] += 1
+        summary[route] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / duration, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "error_rate": round(len(errors) / len(rows), 4) if rows else 0.0,
+            "statuses": dict(status_counts),
+        }
+    return summary
+
+
+def print_report(results):
+    header = f"{'conc':>5} {'route':<8} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for step in results:
+        for route, row in step["routes"].items():
+            print(
+                f"{step['concurrency']:>5} {route:<8} {row['requests']:>6} {row['throughput_rps']:>8.2f} "
+                f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['error_rate']:>7.1%}"
+            )
+
+
+def wait_for(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.3)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+
+def start_stack(args, workdir):
+    """Start the simulator and gunicorn; returns (base_url, processes, sim_url)."""
+    processes = []
+    log = open(os.path.join(workdir, "stack.log"), "ab")
+    sim_url = f"http://127.0.0.1:{args.sim_port}"
+    processes.append(subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "rfms_simulator.py"), "--port", str(args.sim_port)] + (args.sim_arg or []),
+        cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+    ))
+    wait_for(f"{sim_url}/_sim/stats")
+
+    env = dict(os.environ)
+    env.update({
+        "RFMS_BASE_URL": sim_url,
+        "RFMS_STORE_CODE": env.get("RFMS_STORE_CODE", "LOADTEST"),
+        "RFMS_USERNAME": env.get("RFMS_USERNAME", "loadtest"),
+        "RFMS_API_KEY": env.get("RFMS_API_KEY", "loadtest-key"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "FLASK_DEBUG": "False",
+    })
+    # The app logs to app.log in its working directory, so keep it in the scratch dir
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, "init_db.py")], cwd=workdir, env=env,
+                   stdout=log, stderr=subprocess.STDOUT, check=True)
+    base_url = f"http://127.0.0.1:{args.port}"
+    processes.append(subprocess.Popen(
+        ["gunicorn", "--pythonpath", REPO_DIR, "-b", f"127.0.0.1:{args.port}",
+         "-w", str(args.workers), "--threads", str(args.threads), "-k", args.worker_class,
+         "--timeout", "180", "app:app"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    ))
+    wait_for(f"{base_url}/api/check_status")
+    return base_url, processes, sim_url
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ("upload", "search", "export"):
+            raise SystemExit(f"Unknown route in --mix: {route}")
+        mix[route] = float(weight or 1)
+    return {route: weight for route, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for upload, search and export")
+    parser.add_argument("--target", help="Base URL of an already running app (skips starting the stack)")
+    parser.add_argument("--mix", default="upload=1,search=4,export=1", help="Route weights")
+    parser.add_argument("--steps", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per step")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of untimed load before the first step")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--worker-class", default="gthread", help="gunicorn worker class")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--sim-port", type=int, default=5098)
+    parser.add_argument("--sim-arg", action="append", help="Extra argument for rfms_simulator.py (repeatable)")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--json", dest="json_out", help="Write the full report to this file")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the scratch directory (logs, DB)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    steps = [int(s) for s in args.steps.split(",") if s.strip()]
+    workdir = tempfile.mkdtemp(prefix="rfms-loadtest-")
+    processes, sim_url = [], None
+    try:
+        if args.target:
+            base_url = args.target
+        else:
+            base_url, processes, sim_url = start_stack(args, workdir)
+        # Seeded simulator customer IDs start at 1000
+        scenario = Scenario(base_url, args.pdf_dir, customer_ids=[str(1000 + i) for i in range(9)])
+
+        if args.warmup:
+            run_step(scenario, steps[0], args.warmup, mix)
+
+        results = []
+        for concurrency in steps:
+            print(f"Running {concurrency} concurrent clients for {args.duration:.0f}s...", flush=True)
+            samples = run_step(scenario, concurrency, args.duration, mix)
+            results.append({"concurrency": concurrency, "routes": summarize(samples, args.duration)})
+
+        print()
+        print_report(results)
+        report = {
+            "target": base_url,
+            "mix": mix,
+            "duration": args.duration,
+            "gunicorn": None if args.target else {
+                "workers": args.workers, "threads": args.threads, "worker_class": args.worker_class,
+            },
+            "steps": results,
+        }
+        if sim_url:
+            report["simulator"] = requests.get(f"{sim_url}/_sim/stats", timeout=5).json()
+            duplicates = report["simulator"].get("duplicate_po_numbers")
+            if duplicates:
+                print(f"\nWARNING: RFMS simulator saw duplicate orders for {len(duplicates)} PO numbers")
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to {args.json_out}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.keep_workdir:
+            print(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
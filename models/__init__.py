@@ -9,4 +9,6 @@ from models.customer import Customer, ApprovedCustomer
 from models.quote import Quote
 from models.job import Job
 from models.pdf_data import PdfData
+from models.pdf_archive import PdfArchiveMonth, PdfArchiveEntry
 from models.rfms_session import RFMSSession
+from models.rfms_outbox import RfmsOutbox
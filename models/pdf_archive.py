@@ -0,0 +1,73 @@
+from models import db
+from datetime import datetime
+import gzip
+import io
+import json
+
+
+class PdfArchiveMonth(db.Model):
+    """
+    Archived PdfData rows of one calendar month, gzip-compressed.
+
+    The payload is JSON lines, one full row (columns plus extracted data) per
+    line. Each archiving run appends its rows as a new gzip member, so adding
+    to a month never rewrites what is already there.
+    """
+
+    __tablename__ = "pdf_archive_month"
+
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM of created_at
+    row_count = db.Column(db.Integer, default=0, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False, default=b"")
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<PdfArchiveMonth {self.month} ({self.row_count} rows)>"
+
+    def append(self, records):
+        """
+        Add rows to the month's payload.
+        """
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        self.payload = (self.payload or b"") + gzip.compress(lines.encode("utf-8"))
+        self.row_count = (self.row_count or 0) + len(records)
+
+    def iter_records(self):
+        """
+        Yield the archived rows one at a time without decompressing the whole month.
+        """
+        with gzip.GzipFile(fileobj=io.BytesIO(self.payload or b"")) as f:
+            for line in f:
+                yield json.loads(line)
+
+
+class PdfArchiveEntry(db.Model):
+    """
+    Summary of one archived PdfData row, kept uncompressed so archives stay searchable.
+
+    The id is the original PdfData id, which is never reused (see PdfData's
+    sqlite_autoincrement and archive_old_pdfs); the full row is in the month's payload.
+    """
+
+    __tablename__ = "pdf_archive_entry"
+    __table_args__ = (db.Index("ix_pdf_archive_entry_created_at_id", "created_at", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.String(7), db.ForeignKey("pdf_archive_month.month"), nullable=False, index=True)
+
+    # Summary columns, as on PdfData
+    filename = db.Column(db.String(255))
+    customer_name = db.Column(db.String(100))
+    business_name = db.Column(db.String(100))
+    po_number = db.Column(db.String(50), index=True)
+    template = db.Column(db.String(100))
+    dollar_value = db.Column(db.Float, default=0.0)
+    processed = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<PdfArchiveEntry {self.id} {self.month} - PO:{self.po_number}>"
@@ -8,6 +8,13 @@ class PdfData(db.Model):
     Model for storing extracted data from PDF files.
     """
 
+    # Listing pages walk (created_at, id) newest first. Archived rows keep their id
+    # in pdf_archive_entry, so SQLite must never hand a deleted id out again
+    __table_args__ = (
+        db.Index("ix_pdf_data_created_at_id", "created_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # PDF file information
@@ -0,0 +1,98 @@
+from models import db
+from datetime import datetime
+import json
+
+
+class RfmsOutbox(db.Model):
+    """
+    Durable outbox of RFMS order exports.
+
+    Each row holds one export request keyed by an idempotency key derived from
+    the PO number and a hash of the payload, so browser retries and dispatcher
+    retries never create the same order twice.
+    """
+
+    __tablename__ = "rfms_outbox"
+
+    STATUS_PENDING = "pending"
+    STATUS_IN_PROGRESS = "in_progress"
+    STATUS_DELIVERED = "delivered"
+    STATUS_FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(128), unique=True, nullable=False, index=True)
+    po_number = db.Column(db.String(50), index=True)
+    pdf_id = db.Column(db.Integer, db.ForeignKey("pdf_data.id"), nullable=True)
+
+    # The export request exactly as payload_service.export_data_to_rfms takes it
+    payload_json = db.Column(db.Text, nullable=False)
+
+    # Delivery state
+    status = db.Column(db.String(20), default=STATUS_PENDING, nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    # RFMS outcome
+    rfms_order_id = db.Column(db.String(50), nullable=True)
+    result_json = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<RfmsOutbox {self.id} PO:{self.po_number} {self.status}>"
+
+    @property
+    def payload(self):
+        """
+        Get the export payload as a dictionary.
+        """
+        if self.payload_json:
+            return json.loads(self.payload_json)
+        return {}
+
+    @payload.setter
+    def payload(self, data):
+        """
+        Set the export payload from a dictionary.
+        """
+        self.payload_json = json.dumps(data)
+
+    @property
+    def result(self):
+        """
+        Get the RFMS export result as a dictionary.
+        """
+        if self.result_json:
+            return json.loads(self.result_json)
+        return {}
+
+    @result.setter
+    def result(self, data):
+        """
+        Set the RFMS export result from a dictionary.
+        """
+        if data:
+            self.result_json = json.dumps(data)
+
+    def to_dict(self):
+        """
+        Convert the model instance to a dictionary.
+        """
+        return {
+            "id": self.id,
+            "idempotency_key": self.idempotency_key,
+            "po_number": self.po_number,
+            "pdf_id": self.pdf_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "rfms_order_id": self.rfms_order_id,
+            "result": self.result,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "delivered_at": self.delivered_at.strftime("%Y-%m-%d %H:%M:%S") if self.delivered_at else None,
+        }
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Re-parse past uploads from their stored text to see what a template change does.
+
+Every PdfData row keeps the text read from its PDF in extracted_data["raw_text"].
+This job reads that text back in batches, runs builder/template detection and
+parse_extracted_text on it across a pool of processes, and compares the result
+with what is stored. No PDF is opened, so thousands of POs take seconds.
+
+The report (JSON) lists, per changed row, each field whose value differs as
+[stored, re-parsed], plus counts of changes by field and by template. With
+--apply the changed fields are written back to the rows and the report lists
+only those; values the parser does not produce (PO status, phone3/phone4
+edits, intake details), fields a fallback backend filled and values the
+re-parse would blank are kept, and rows already processed into RFMS are left
+alone unless --include-processed is given.
+
+    python reparse_history.py                          # dry run, report only
+    python reparse_history.py --since 2025-01-01 --template Ambrose
+    python reparse_history.py --ids 12,40-45 --apply
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=".env")
+
+logger = logging.getLogger("reparse_history")
+
+# Columns on PdfData that mirror a parsed field
+COLUMN_FIELDS = ("customer_name", "business_name", "po_number", "scope_of_work", "dollar_value")
+
+
+def _init_worker():
+    # The parser logs every step at INFO; at thousands of rows that is most of the runtime
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def _reparse(job):
+    """
+    Runs in a pool process.
+
+    Returns:
+        tuple: (row id, re-parsed result without raw_text, or None, error message)
+    """
+    from utils.pdf_extractor import extract_data_from_text
+
+    row_id, text, builder_name = job
+    try:
+        result = extract_data_from_text(text, builder_name=builder_name)
+    except Exception as e:
+        return row_id, None, str(e)
+    result.pop("raw_text", None)
+    # Compare in the form the row stores it
+    return row_id, json.loads(json.dumps(result)), None
+
+
+def parse_id_list(value):
+    """Parse "3,7,10-12" into a sorted list of ids."""
+    ids = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            ids.update(range(int(first), int(last) + 1))
+        else:
+            ids.add(int(part))
+    return sorted(ids)
+
+
+def diff_fields(stored, reparsed):
+    """
+    Fields whose re-parsed value differs from the stored one.
+
+    Returns:
+        dict: field -> [stored value, re-parsed value]
+    """
+    from utils.pdf_extractor import NON_FIELD_KEYS
+
+    changes = {}
+    for field, value in reparsed.items():
+        if field in NON_FIELD_KEYS:
+            continue
+        old = stored.get(field)
+        if old == value or (old in (None, "", [], 0) and value in ("", [], 0)):
+            continue
+        changes[field] = [old, value]
+    return changes
+
+
+def apply_reparse(row, stored, reparsed, changes):
+    """
+    Write the re-parsed fields onto a PdfData row, keeping keys the parser does not produce.
+
+    Only changed fields are written. A field is kept as stored when a fallback backend
+    filled it (the stored text is PyMuPDF's, so the re-parse cannot see what it read)
+    or when the re-parse would leave it empty.
+
+    Returns:
+        dict: The subset of changes that was applied
+    """
+    from utils.pdf_extractor import ESSENTIAL_FIELDS, FALLBACK_SOURCES, low_confidence_fields
+
+    sources = stored.get("field_sources", {})
+    applied = {
+        field: change for field, change in changes.items()
+        if sources.get(field) not in FALLBACK_SOURCES and change[1] not in (None, "", [], 0)
+    }
+    if not applied:
+        return applied
+
+    updated = dict(stored)
+    updated.update({field: reparsed[field] for field in applied})
+    updated["template"] = reparsed.get("template", stored.get("template"))
+    updated["field_sources"] = {**sources, **{field: "reparse" for field in applied}}
+    reparsed_confidence = reparsed.get("field_confidence", {})
+    updated["field_confidence"] = {
+        **stored.get("field_confidence", {}),
+        **{field: reparsed_confidence[field] for field in applied if field in reparsed_confidence},
+    }
+    updated["low_confidence_fields"] = low_confidence_fields(
+        updated, fields=list(updated["field_confidence"]) or ESSENTIAL_FIELDS
+    )
+    updated["reparsed_at"] = datetime.now().isoformat(timespec="seconds")
+    for column in COLUMN_FIELDS:
+        setattr(row, column, updated.get(column, 0 if column == "dollar_value" else ""))
+    row.extracted_data = updated
+    return applied
+
+
+def _pool(workers):
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["utils.pdf_extractor"])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker)
+
+
+class ReparseJob:
+    """Reads PdfData rows in id order, re-parses them on a process pool and collects the differences."""
+
+    def __init__(self, app, workers=2, batch_size=500, builder_name="", template_filter="",
+                 apply=False, include_processed=False):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.builder_name = builder_name
+        self.template_filter = template_filter.lower()
+        self.apply = apply
+        self.include_processed = include_processed
+
+    def _query(self, ids=None, since=None):
+        from models import PdfData
+
+        query = PdfData.query
+        if ids:
+            query = query.filter(PdfData.id.in_(ids))
+        if since:
+            query = query.filter(PdfData.created_at >= since)
+        return query
+
+    def _batches(self, query, limit=None):
+        """Yield lists of rows in id order, keyed on id so each batch is a cheap indexed query."""
+        from models import PdfData
+
+        last_id = 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            rows = query.filter(PdfData.id > last_id).order_by(PdfData.id).limit(size).all()
+            if not rows:
+                return
+            # Read before yielding: the caller commits and expunges the batch
+            last_id = rows[-1].id
+            yield rows
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def run(self, ids=None, since=None, limit=None):
+        """
+        Re-parse the selected rows.
+
+        Returns:
+            dict: The report
+        """
+        from models import db
+
+        report = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "applied": self.apply,
+            "rows": 0,
+            "changed_rows": 0,
+            "skipped": Counter(),
+            "errors": [],
+            "field_changes": Counter(),
+            "template_changes": Counter(),
+            "changes": [],
+        }
+        started = time.monotonic()
+        parse_seconds = 0.0
+        with self.app.app_context(), _pool(self.workers) as pool:
+            for rows in self._batches(self._query(ids, since), limit):
+                stored_by_id = {}
+                jobs = []
+                for row in rows:
+                    stored = row.extracted_data
+                    if not stored.get("raw_text"):
+                        report["skipped"]["no_stored_text"] += 1
+                        continue
+                    stored_by_id[row.id] = (row, stored)
+                    jobs.append((row.id, stored["raw_text"], self.builder_name))
+
+                batch_started = time.monotonic()
+                chunksize = max(1, len(jobs) // (self.workers * 4))
+                results = list(pool.map(_reparse, jobs, chunksize=chunksize))
+                parse_seconds += time.monotonic() - batch_started
+
+                for row_id, reparsed, error in results:
+                    row, stored = stored_by_id[row_id]
+                    if error:
+                        report["errors"].append({"id": row_id, "error": error})
+                        continue
+                    if self.template_filter and self.template_filter not in reparsed["template"].lower():
+                        report["skipped"]["other_template"] += 1
+                        continue
+                    report["rows"] += 1
+                    changes = diff_fields(stored, reparsed)
+                    applied = None
+                    if changes and self.apply:
+                        if row.processed and not self.include_processed:
+                            report["skipped"]["processed"] += 1
+                        else:
+                            applied = apply_reparse(row, stored, reparsed, changes)
+                            if not applied:
+                                report["skipped"]["fallback_or_empty_only"] += 1
+                            # Report what was written, not what the re-parse differed on
+                            changes = applied
+                    if not changes:
+                        continue
+                    report["changed_rows"] += 1
+                    report["field_changes"].update(changes.keys())
+                    report["template_changes"][reparsed["template"]] += 1
+                    entry = {
+                        "id": row_id,
+                        "filename": row.filename,
+                        "po_number": row.po_number,
+                        "template": reparsed["template"],
+                        "processed": bool(row.processed),
+                        "fields": changes,
+                    }
+                    if self.apply:
+                        entry["applied"] = applied is not None
+                    report["changes"].append(entry)
+
+                if self.apply:
+                    db.session.commit()
+                # Drop the batch's rows (and their text) before loading the next one
+                db.session.expunge_all()
+                logger.info(f"[REPARSE] {report['rows']} rows re-parsed, {report['changed_rows']} changed")
+
+        report["seconds"] = round(time.monotonic() - started, 2)
+        report["parse_seconds"] = round(parse_seconds, 2)
+        report["rows_per_second"] = round(report["rows"] / parse_seconds, 1) if parse_seconds else None
+        for key in ("skipped", "field_changes", "template_changes"):
+            report[key] = dict(report[key].most_common())
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse stored PO text and report changed fields")
+    parser.add_argument("--ids", type=parse_id_list, help="Row ids, e.g. 3,7,10-12")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only rows created on or after this date")
+    parser.add_argument("--limit", type=int, help="At most this many rows")
+    parser.add_argument("--template", default="", help="Only report rows whose template name contains this")
+    parser.add_argument("--builder-name", default="", help="Builder name to pass to template detection")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("REPARSE_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("REPARSE_BATCH_SIZE", "500")))
+    parser.add_argument("--report", default=f"reparse_report_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument("--apply", action="store_true", help="Write the re-parsed fields back to the rows")
+    parser.add_argument("--include-processed", action="store_true",
+                        help="With --apply, also update rows already processed into RFMS")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from app import app
+
+    # Keep the app's per-field logging out of the parent too
+    logging.getLogger("utils.pdf_extractor").setLevel(logging.WARNING)
+
+    job = ReparseJob(
+        app,
+        workers=max(args.workers, 1),
+        batch_size=max(args.batch_size, 1),
+        builder_name=args.builder_name,
+        template_filter=args.template,
+        apply=args.apply,
+        include_processed=args.include_processed,
+    )
+    report = job.run(ids=args.ids, since=args.since, limit=args.limit)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print(
+        f"Re-parsed {report['rows']} rows in {report['parse_seconds']}s "
+        f"({report['rows_per_second']} rows/s); {report['changed_rows']} changed"
+        + (" and updated" if args.apply else "")
+    )
+    for field, count in report["field_changes"].items():
+        print(f"  {field}: {count}")
+    if report["skipped"]:
+        print(f"Skipped: {report['skipped']}")
+    if report["errors"]:
+        print(f"Errors: {len(report['errors'])} (see report)")
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Local RFMS API simulator for load tests and integration tests.
+
+Implements the endpoints RfmsApi calls (Session/Begin, customers/find,
+customer/<id>, customer/values, order/create, order/find, BillingGroup and
+Quote) against in-memory state, with configurable latency distributions,
+error rates and session expiry. It can also proxy a real RFMS while recording
+request/response pairs, and replay such a recording later.
+
+Point the app at it with RFMS_BASE_URL, e.g.:
+
+    python rfms_simulator.py --port 5055 --latency "*=lognormal:80:0.6" --latency "orders=uniform:300:900"
+    RFMS_BASE_URL=http://127.0.0.1:5055 python app.py
+
+Latency specs are family=distribution:params with times in milliseconds:
+    fixed:MS | uniform:LOW:HIGH | normal:MEAN:SD | lognormal:MEDIAN:SIGMA | exp:MEAN
+Families: session, customers, orders, billing_groups (or * for all).
+
+Runtime control (no auth):
+    GET  /_sim/stats   request counts, orders, live sessions
+    POST /_sim/faults  {"latency": {...}, "error_rates": {...}, "expire_rate": 0.1}
+    POST /_sim/reset   clear orders, sessions and counters
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import random
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import requests
+from flask import Flask, Response, jsonify, request
+
+logger = logging.getLogger("rfms_simulator")
+
+FAMILIES = ("session", "customers", "orders", "billing_groups")
+
+SEED_BUILDERS = [
+    "Ambrose Construct Group",
+    "Profile Build Group",
+    "Campbell Construction",
+    "Rizon Group",
+    "Australian Restoration Company",
+    "Townsend Building Services",
+    "One Solutions",
+    "Johns Lyng Group",
+    "Advance Builders",
+]
+SUBURBS = [
+    ("Brisbane City", "QLD", "4000"),
+    ("Southport", "QLD", "4215"),
+    ("Ipswich", "QLD", "4305"),
+    ("Toowoomba", "QLD", "4350"),
+    ("Caboolture", "QLD", "4510"),
+]
+SALESPEOPLE = ["ZORAN VEKIC", "JASON SMITH", "MICHELLE BROWN"]
+
+
+def parse_latency(spec):
+    """
+    Turn a distribution spec into a function returning a delay in seconds.
+
+    Args:
+        spec (str): e.g. "fixed:20", "uniform:50:200", "normal:100:30",
+                    "lognormal:80:0.6", "exp:100" (milliseconds)
+
+    Returns:
+        callable: Zero-argument sampler
+    """
+    kind, _, rest = spec.partition(":")
+    params = [float(p) for p in rest.split(":") if p]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda: params[0] / 1000.0
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1]) / 1000.0
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(params[0], params[1])) / 1000.0
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(params[0]), params[1]) / 1000.0
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / params[0]) / 1000.0
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _family_assignments(values, parse):
+    """Expand ["*=x", "orders=y"] into {family: parse(value)}."""
+    result = {}
+    for item in values or []:
+        family, _, value = item.partition("=")
+        family = family.strip()
+        targets = FAMILIES if family == "*" else (family,)
+        for target in targets:
+            if target not in FAMILIES:
+                raise ValueError(f"Unknown endpoint family: {target}")
+            result[target] = parse(value)
+    return result
+
+
+def _http_date(dt):
+    return dt.strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+
+class SimulatorState:
+    """In-memory RFMS: customers, orders, billing groups and session tokens."""
+
+    def __init__(self, customer_count=200, session_ttl=900, seed=1234):
+        self.session_ttl = session_ttl
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.customers = {}
+        self._seed_customers(customer_count)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.sessions = {}
+            self.orders = {}
+            self.orders_by_po = defaultdict(list)
+            self.billing_groups = []
+            self.order_seq = itertools.count(1)
+            self.counts = Counter()
+
+    def _seed_customers(self, count):
+        names = list(SEED_BUILDERS)
+        while len(names) < count:
+            names.append(f"Test Builder {len(names) + 1:04d}")
+        for index, name in enumerate(names[:count]):
+            customer_id = str(1000 + index)
+            suburb, state, postcode = SUBURBS[index % len(SUBURBS)]
+            self.customers[customer_id] = {
+                "customerSourceId": customer_id,
+                "customerId": customer_id,
+                "customerName": name.upper(),
+                "customerBusinessName": name.upper(),
+                "customerFirstName": "",
+                "customerLastName": name.upper(),
+                "customerAddress": f"{10 + index} Example Street",
+                "customerAddress2": "",
+                "customerCity": suburb,
+                "customerState": state,
+                "customerZIP": postcode,
+                "customerCountry": "Australia",
+                "customerPhone": f"07 3{index % 1000:03d} {self.random.randint(1000, 9999)}",
+                "customerEmail": f"accounts{index}@example.com",
+                "customerType": "BUILDERS",
+                "preferredSalesperson1": SALESPEOPLE[index % len(SALESPEOPLE)],
+                "preferredSalesperson2": "",
+                "storeNumber": 1,
+            }
+
+    # Sessions
+    def begin_session(self):
+        token = secrets.token_hex(16)
+        expiry = datetime.utcnow() + timedelta(seconds=self.session_ttl)
+        with self.lock:
+            self.sessions[token] = expiry
+        return token, expiry
+
+    def session_valid(self, token):
+        with self.lock:
+            expiry = self.sessions.get(token)
+            if expiry is None:
+                return False
+            if expiry <= datetime.utcnow():
+                del self.sessions[token]
+                return False
+            return True
+
+    def expire_session(self, token):
+        with self.lock:
+            self.sessions.pop(token, None)
+
+    # Customers
+    def find_customers(self, text, start_index=0, page_size=10):
+        needle = (text or "").strip().lower()
+        matches = [
+            c for c in self.customers.values()
+            if not needle or needle in c["customerName"].lower() or needle in c["customerBusinessName"].lower()
+        ]
+        return matches[start_index:start_index + page_size]
+
+    # Orders
+    def create_order(self, payload):
+        with self.lock:
+            order_id = f"AZ9{next(self.order_seq):05d}"
+            po_number = payload.get("poNumber", "")
+            order = {"id": order_id, "poNumber": po_number, "createdAt": datetime.utcnow().isoformat(), "payload": payload}
+            self.orders[order_id] = order
+            self.orders_by_po[po_number].append(order_id)
+            parent = (payload.get("billingGroup") or {}).get("parentOrder")
+            if parent:
+                self.billing_groups.append({"parentOrder": parent, "childOrder": order_id})
+            return order_id
+
+    def find_orders(self, po_number):
+        with self.lock:
+            return [
+                {"id": oid, "documentNumber": oid, "poNumber": self.orders[oid]["poNumber"]}
+                for oid in self.orders_by_po.get(po_number, [])
+            ]
+
+    def stats(self):
+        with self.lock:
+            duplicate_pos = {po: ids for po, ids in self.orders_by_po.items() if len(ids) > 1}
+            return {
+                "requests": dict(self.counts),
+                "orders": len(self.orders),
+                "duplicate_po_numbers": duplicate_pos,
+                "billing_groups": len(self.billing_groups),
+                "live_sessions": len(self.sessions),
+            }
+
+
+class Recorder:
+    """Appends request/response pairs to a JSON-lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+class Replayer:
+    """Serves recorded responses by (method, path, request body), cycling repeats."""
+
+    def __init__(self, path):
+        self.responses = defaultdict(list)
+        self.cursors = Counter()
+        self.lock = threading.Lock()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.responses[self.key(record["method"], record["path"], record.get("request"))].append(record)
+
+    @staticmethod
+    def key(method, path, body):
+        return method.upper(), path.lower(), json.dumps(body, sort_keys=True) if body is not None else ""
+
+    def lookup(self, method, path, body):
+        key = self.key(method, path, body)
+        with self.lock:
+            records = self.responses.get(key)
+            if not records:
+                return None
+            record = records[self.cursors[key] % len(records)]
+            self.cursors[key] += 1
+            return record
+
+
+def create_simulator_app(state=None, latency=None, error_rates=None, expire_rate=0.0,
+                         store_code=None, api_key=None, recorder=None, upstream=None, replayer=None):
+    """
+    Build the simulator Flask app.
+
+    Args:
+        state (SimulatorState): Shared in-memory state
+        latency (dict): {family: sampler} from parse_latency
+        error_rates (dict): {family: probability of answering 500}
+        expire_rate (float): Probability an authenticated call gets 401 and its token revoked
+        store_code (str): Required Basic-auth username; None accepts any
+        api_key (str): Required handshake password; None accepts any
+        recorder (Recorder): Record proxied traffic (requires upstream)
+        upstream (str): Real RFMS base URL to proxy to in record mode
+        replayer (Replayer): Serve recorded responses before simulating
+
+    Returns:
+        Flask: The simulator app
+    """
+    state = state or SimulatorState()
+    faults = {
+        "latency": dict(latency or {}),
+        "error_rates": dict(error_rates or {}),
+        "expire_rate": expire_rate,
+    }
+    sim = Flask("rfms_simulator")
+
+    def basic_auth():
+        auth = request.authorization
+        if not auth:
+            return None, None
+        return auth.username, auth.password
+
+    def simulate(family, authenticated=True):
+        """Apply latency, fault injection and auth; returns an error response or None."""
+        state.counts[f"{family}:{request.method} {request.path}"] += 1
+        sampler = faults["latency"].get(family)
+        if sampler:
+            time.sleep(sampler())
+        if random.random() < faults["error_rates"].get(family, 0.0):
+            return jsonify({"status": "failed", "error": "Simulated RFMS server error"}), 500
+        username, password = basic_auth()
+        if store_code and username != store_code:
+            return jsonify({"status": "failed", "error": "Unknown store"}), 401
+        if authenticated:
+            if not password or not state.session_valid(password):
+                return jsonify({"status": "failed", "error": "Session expired"}), 401
+            if random.random() < faults["expire_rate"]:
+                state.expire_session(password)
+                return jsonify({"status": "failed", "error": "Session expired"}), 401
+        return None
+
+    @sim.before_request
+    def record_or_replay():
+        if request.path.startswith("/_sim/"):
+            return None
+        body = request.get_json(silent=True)
+        if upstream:
+            forwarded = requests.request(
+                request.method,
+                upstream.rstrip("/") + request.full_path.rstrip("?"),
+                headers={k: v for k, v in request.headers if k.lower() in ("authorization", "content-type", "accept")},
+                data=request.get_data(),
+                timeout=60,
+            )
+            if recorder:
+                try:
+                    response_body = forwarded.json()
+                except ValueError:
+                    response_body = forwarded.text
+                recorder.write({
+                    "method": request.method,
+                    "path": request.path,
+                    "request": body,
+                    "status": forwarded.status_code,
+                    "response": response_body,
+                    "elapsed_ms": round(forwarded.elapsed.total_seconds() * 1000, 1),
+                })
+            return Response(forwarded.content, status=forwarded.status_code,
+                            content_type=forwarded.headers.get("Content-Type", "application/json"))
+        if replayer:
+            record = replayer.lookup(request.method, request.path, body)
+            if record:
+                if record.get("elapsed_ms"):
+                    time.sleep(record["elapsed_ms"] / 1000.0)
+                payload = record["response"]
+                if isinstance(payload, (dict, list)):
+                    return jsonify(payload), record["status"]
+                return Response(payload, status=record["status"])
+        return None
+
+    @sim.route("/v2/Session/Begin", methods=["POST"])
+    def session_begin():
+        error = simulate("session", authenticated=False)
+        if error:
+            return error
+        _, password = basic_auth()
+        if api_key and password != api_key:
+            return jsonify({"authorized": False, "error": "Invalid API key"}), 401
+        token, expiry = state.begin_session()
+        return jsonify({"authorized": True, "sessionToken": token, "sessionExpires": _http_date(expiry)})
+
+    @sim.route("/v2/customers/find", methods=["POST"])
+    def customers_find():
+        error = simulate("customers")
+        if error:
+            return error
+        data = request.get_json(silent=True) or {}
+        customers = state.find_customers(data.get("searchText", ""), int(data.get("startIndex", 0) or 0))
+        return jsonify({"status": "success", "result": customers, "detail": customers})
+
+    @sim.route("/v2/customer/values", methods=["GET"])
+    def customer_values():
+        error = simulate("customers")
+        if error:
+            return error
+        return jsonify({"status": "success", "result": {
+            "customerType": ["BUILDERS", "INSURANCE", "RETAIL"],
+            "salesperson": SALESPEOPLE,
+            "stores": [{"storeNumber": 1, "name": "Main Store"}],
+        }})
+
+    @sim.route("/v2/customer/<customer_id>", methods=["GET"])
+    def customer_get(customer_id):
+        error = simulate("customers")
+        if error:
+            return error
+        customer = state.customers.get(customer_id)
+        if not customer:
+            return jsonify({"status": "failed", "result": None}), 404
+        return jsonify({
+            "status": "success",
+            "result": {
+                "customerId": customer["customerId"],
+                "customerType": customer["customerType"],
+                "preferredSalesperson1": customer["preferredSalesperson1"],
+                "preferredSalesperson2": customer["preferredSalesperson2"],
+                "storeNumber": customer["storeNumber"],
+                "customerAddress": {
+                    "businessName": customer["customerBusinessName"],
+                    "lastName": customer["customerLastName"],
+                    "address1": customer["customerAddress"],
+                    "address2": customer["customerAddress2"],
+                    "city": customer["customerCity"],
+                    "state": customer["customerState"],
+                    "postalCode": customer["customerZIP"],
+                },
+            },
+            "detail": {
+                "customerSourceId": customer["customerSourceId"],
+                "customerName": customer["customerName"],
+                "customerPhone": customer["customerPhone"],
+                "customerEmail": customer["customerEmail"],
+            },
+        })
+
+    @sim.route("/v2/order/create", methods=["POST"])
+    def order_create():
+        error = simulate("orders")
+        if error:
+            return error
+        payload = request.get_json(silent=True) or {}
+        if not (payload.get("soldTo") or {}).get("customerId"):
+            return jsonify({"status": "failed", "result": "soldTo.customerId is required"})
+        return jsonify({"status": "success", "result": state.create_order(payload)})
+
+    @sim.route("/v2/order/find", methods=["POST"])
+    def order_find():
+        error = simulate("orders")
+        if error:
+            return error
+        data = request.get_json(silent=True) or {}
+        return jsonify({"status": "success", "result": state.find_orders(data.get("poNumber", ""))})
+
+    @sim.route("/api/v2/Quote", methods=["POST"])
+    def quote_create():
+        error = simulate("orders")
+        if error:
+            return error
+        return jsonify({"status": "success", "result": {"quote": {"id": f"QT{next(state.order_seq):05d}"}}})
+
+    @sim.route("/api/v2/BillingGroup", methods=["POST"])
+    def billing_group():
+        error = simulate("billing_groups")
+        if error:
+            return error
+        order_ids = (request.get_json(silent=True) or {}).get("orderIds") or []
+        with state.lock:
+            state.billing_groups.append({"orderIds": order_ids})
+            group_id = len(state.billing_groups)
+        return jsonify({"status": "success", "result": {"billingGroupId": group_id, "orderIds": order_ids}})
+
+    @sim.route("/_sim/stats", methods=["GET"])
+    def sim_stats():
+        return jsonify(state.stats())
+
+    @sim.route("/_sim/reset", methods=["POST"])
+    def sim_reset():
+        state.reset()
+        return jsonify({"reset": True})
+
+    @sim.route("/_sim/faults", methods=["POST"])
+    def sim_faults():
+        data = request.get_json(silent=True) or {}
+        if "latency" in data:
+            faults["latency"].update(_family_assignments(
+                [f"{k}={v}" for k, v in data["latency"].items()], parse_latency))
+        if "error_rates" in data:
+            faults["error_rates"].update(_family_assignments(
+                [f"{k}={v}" for k, v in data["error_rates"].items()], float))
+        if "expire_rate" in data:
+            faults["expire_rate"] = float(data["expire_rate"])
+        return jsonify({
+            "error_rates": faults["error_rates"],
+            "expire_rate": faults["expire_rate"],
+            "latency_families": sorted(faults["latency"]),
+        })
+
+    sim.simulator_state = state
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local RFMS API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency", action="append", metavar="FAMILY=DIST:PARAMS",
+                        help="Latency distribution per endpoint family (repeatable)")
+    parser.add_argument("--error-rate", action="append", metavar="FAMILY=P",
+                        help="Probability of a 500 per endpoint family (repeatable)")
+    parser.add_argument("--expire-rate", type=float, default=0.0,
+                        help="Probability an authenticated call revokes its session with a 401")
+    parser.add_argument("--session-ttl", type=int, default=900, help="Session lifetime in seconds")
+    parser.add_argument("--customers", type=int, default=200, help="Number of seeded customers")
+    parser.add_argument("--store-code", help="Require this store code (default: accept any)")
+    parser.add_argument("--api-key", help="Require this API key for Session/Begin (default: accept any)")
+    parser.add_argument("--record", metavar="FILE", help="Proxy to --upstream and append traffic to FILE")
+    parser.add_argument("--upstream", help="Real RFMS base URL for --record")
+    parser.add_argument("--replay", metavar="FILE", help="Serve responses recorded with --record")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    if args.record and not args.upstream:
+        parser.error("--record requires --upstream")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    random.seed(args.seed)
+    sim = create_simulator_app(
+        state=SimulatorState(customer_count=args.customers, session_ttl=args.session_ttl, seed=args.seed),
+        latency=_family_assignments(args.latency, parse_latency),
+        error_rates=_family_assignments(args.error_rate, float),
+        expire_rate=args.expire_rate,
+        store_code=args.store_code,
+        api_key=args.api_key,
+        recorder=Recorder(args.record) if args.record else None,
+        upstream=args.upstream if args.record else None,
+        replayer=Replayer(args.replay) if args.replay else None,
+    )
+    logger.info(f"RFMS simulator listening on http://{args.host}:{args.port}")
+    sim.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the app and its gunicorn workers.
+
+Measures, each in a fresh interpreter or server:
+  import      - time to "import app" (what every non-preloaded worker pays)
+  first_pdf   - time of the first extract_data_from_pdf call after import,
+                which includes the lazily imported PDF backends
+  cold_start  - gunicorn launch until the first request is served
+  respawn     - a worker is killed; time until a new worker serves a request
+
+The gunicorn timings are taken with and without preload_app.
+
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --runs 3 --json startup.json
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(REPO_DIR, "testing pdfs")
+
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from utils.pdf_extractor import extract_data_from_pdf
+extract_data_from_pdf({pdf!r})
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "first_pdf": done - imported}}))
+"""
+
+
+def worker_pids(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return {int(pid) for pid in f.read().split()}
+    except OSError:
+        return set()
+
+
+def poll_until_ok(url, timeout=60, interval=0.01):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return False
+
+
+def measure_import(env, workdir, pdf_path):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(repo=REPO_DIR, pdf=pdf_path)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_gunicorn(env, workdir, port, preload):
+    """
+    Returns:
+        dict: {"cold_start": seconds, "respawn": seconds}
+    """
+    env = dict(env, GUNICORN_PRELOAD="true" if preload else "false",
+               GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS="1")
+    url = f"http://127.0.0.1:{port}/static/js/main.js"
+    log = open(os.path.join(workdir, "gunicorn.log"), "ab")
+    start = time.monotonic()
+    server = subprocess.Popen(
+        ["gunicorn", "-c", os.path.join(REPO_DIR, "gunicorn.conf.py"), "--pythonpath", REPO_DIR, "app:app"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        if not poll_until_ok(url):
+            raise SystemExit("gunicorn did not start; see gunicorn.log in the scratch directory (--keep-workdir)")
+        cold_start = time.monotonic() - start
+
+        old_workers = worker_pids(server.pid)
+        for pid in old_workers:
+            os.kill(pid, signal.SIGKILL)
+        start = time.monotonic()
+        # Wait for the master to notice and fork a replacement, then for it to serve
+        while not (worker_pids(server.pid) - old_workers) and time.monotonic() - start < 60:
+            time.sleep(0.005)
+        poll_until_ok(url)
+        respawn = time.monotonic() - start
+        return {"cold_start": cold_start, "respawn": respawn}
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def summarize(samples):
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import, first extraction and worker start times")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=5097)
+    parser.add_argument("--pdf", default=None, help="PDF used for the first-extraction timing")
+    parser.add_argument("--skip-gunicorn", action="store_true")
+    parser.add_argument("--json", dest="json_out", help="Write the report to this file")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf or sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf")))[0]
+    workdir = tempfile.mkdtemp(prefix="rfms-startup-")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "FLASK_DEBUG": "False",
+    })
+    try:
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, "init_db.py")], cwd=workdir, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples = {"import": [], "first_pdf": []}
+        for _ in range(args.runs):
+            for key, value in measure_import(env, workdir, pdf_path).items():
+                samples[key].append(value)
+        report = {key: summarize(values) for key, values in samples.items()}
+
+        if not args.skip_gunicorn:
+            for preload in (False, True):
+                runs = [measure_gunicorn(env, workdir, args.port, preload) for _ in range(args.runs)]
+                label = "preload" if preload else "no_preload"
+                report[f"gunicorn_{label}"] = {
+                    key: summarize([run[key] for run in runs]) for key in ("cold_start", "respawn")
+                }
+
+        print(f"{'measurement':<34} {'median ms':>10} {'min ms':>9} {'max ms':>9}")
+        for name, value in report.items():
+            rows = value.items() if "median_ms" not in value else [("", value)]
+            for sub, row in rows:
+                label = f"{name} {sub}".strip()
+                print(f"{label:<34} {row['median_ms']:>10.1f} {row['min_ms']:>9.1f} {row['max_ms']:>9.1f}")
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump({"runs": args.runs, "pdf": os.path.basename(pdf_path), "results": report}, f, indent=2)
+            print(f"\nReport written to {args.json_out}")
+    finally:
+        if args.keep_workdir:
+            print(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
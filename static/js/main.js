@@ -130,6 +130,72 @@ async function loadSalespersonValues() {
     }
 }
 
+/**
+ * Stage timings debug panel
+ * Turn on with ?debug=timings (off again with ?debug=off); the choice is kept in localStorage.
+ * Each request's Server-Timing header is listed with its X-Request-ID, which is the
+ * trace_id of the matching trace record in the server log.
+ */
+const TIMING_PANEL = { MAX_REQUESTS: 8, STORAGE_KEY: 'debugTimings' };
+
+function timingPanelEnabled() {
+    const debug = new URLSearchParams(window.location.search).get('debug');
+    if (debug === 'timings') localStorage.setItem(TIMING_PANEL.STORAGE_KEY, '1');
+    if (debug === 'off') localStorage.removeItem(TIMING_PANEL.STORAGE_KEY);
+    return localStorage.getItem(TIMING_PANEL.STORAGE_KEY) === '1';
+}
+
+function parseServerTiming(header) {
+    return header.split(',').map(entry => {
+        const [name, ...params] = entry.trim().split(';');
+        const timing = { name: name.trim(), dur: 0, desc: '' };
+        params.forEach(param => {
+            const [key, value = ''] = param.trim().split('=');
+            if (key === 'dur') timing.dur = parseFloat(value) || 0;
+            if (key === 'desc') timing.desc = value.replace(/^"|"$/g, '');
+        });
+        return timing;
+    }).filter(timing => timing.name);
+}
+
+function recordServerTiming(label, response) {
+    const header = response.headers.get('Server-Timing');
+    if (!header || !timingPanelEnabled()) return;
+    let panel = document.getElementById('timing-debug-panel');
+    if (!panel) {
+        panel = document.createElement('div');
+        panel.id = 'timing-debug-panel';
+        panel.className = 'fixed bottom-2 right-2 z-50 w-96 max-h-96 overflow-y-auto bg-gray-900 text-gray-100 text-xs font-mono rounded shadow-lg p-2 opacity-90';
+        document.body.appendChild(panel);
+    }
+    const timings = parseServerTiming(header);
+    const total = timings.find(timing => timing.name === 'total');
+    const stages = timings.filter(timing => timing.name !== 'total');
+    const widest = Math.max(1, total ? total.dur : 0, ...stages.map(timing => timing.dur));
+    const entry = document.createElement('div');
+    entry.className = 'border-b border-gray-700 pb-1 mb-1';
+    const title = document.createElement('div');
+    title.className = 'text-atoz-yellow';
+    const traceId = response.headers.get('X-Request-ID') || '';
+    title.textContent = `${label} ${response.status} ${total ? total.dur.toFixed(0) + 'ms' : ''} ${traceId.slice(0, 8)}`;
+    title.title = `trace ${traceId}`;
+    entry.appendChild(title);
+    stages.forEach(timing => {
+        const row = document.createElement('div');
+        row.className = 'flex items-center gap-1';
+        const bar = document.createElement('span');
+        bar.className = 'inline-block h-2 bg-yellow-400';
+        bar.style.width = `${Math.max(1, Math.round(80 * timing.dur / widest))}px`;
+        const text = document.createElement('span');
+        text.textContent = `${timing.name} ${timing.dur.toFixed(1)}ms${timing.desc ? ' ' + timing.desc : ''}`;
+        row.appendChild(bar);
+        row.appendChild(text);
+        entry.appendChild(row);
+    });
+    panel.prepend(entry);
+    while (panel.children.length > TIMING_PANEL.MAX_REQUESTS) panel.lastChild.remove();
+}
+
 /**
  * Fetch with timeout and retry capability
  * @param {string} url - The URL to fetch from
@@ -150,6 +216,7 @@ async function fetchWithRetry(url, options = {}, retryCount = 0) {
         
         // Clear timeout since request completed
         clearTimeout(timeoutId);
+        recordServerTiming(`${options.method || 'GET'} ${url}`, response);
         
         // Handle HTTP errors
         if (!response.ok) {
@@ -462,6 +529,173 @@ function clearFields() {
 /**
  * Set up PDF upload functionality
  */
+/**
+ * Fill the Ship To and Work Details fields from one extracted purchase order.
+ * @param {object} extractedData - One PO's extraction result from /upload-pdf.
+ */
+function populateExtractedFields(extractedData) {
+    markFieldConfidence(extractedData.field_confidence, extractedData.low_confidence_fields);
+    // Populate ship-to fields
+    setValue('ship-to-name', extractedData.customer_name || '');
+        
+        // Split customer name into first and last names for customer creation
+        if (extractedData.customer_name) {
+            const nameParts = extractedData.customer_name.trim().split(/\s+/);
+            if (nameParts.length >= 2) {
+                setValue('ship-to-first-name', nameParts[0]);
+                setValue('ship-to-last-name', nameParts.slice(1).join(' '));
+            } else if (nameParts.length === 1) {
+                setValue('ship-to-first-name', '');
+                setValue('ship-to-last-name', nameParts[0]);
+            }
+        }
+        
+        setValue('ship-to-address1', extractedData.address1 || extractedData.address || '');  // Use parsed address1 first
+    setValue('ship-to-address2', extractedData.address2 || '');
+    setValue('ship-to-city', extractedData.city || '');
+    setValue('ship-to-zip', extractedData.zip_code || '');
+        setValue('ship-to-state', extractedData.state || '');
+    setValue('ship-to-email', extractedData.email || '');
+    
+    // Populate phone fields
+    setValue('ship-to-phone1', extractedData.phone || '');
+    setValue('ship-to-phone2', extractedData.mobile || extractedData.work_phone || '');
+        
+        // Also populate hidden PDF phone fields for customer creation
+        setValue('pdf-phone1', extractedData.phone || '');
+        setValue('pdf-phone2', extractedData.mobile || extractedData.work_phone || '');
+    
+    // Populate work order fields
+    setValue('po-number', extractedData.po_number || '');
+    setValue('dollar-value', extractedData.dollar_value || '');
+    setValue('description-of-works', extractedData.scope_of_work || extractedData.description_of_works || '');
+    
+        // Populate supervisor fields
+        setValue('supervisor-name', extractedData.supervisor_name || '');
+        setValue('supervisor-phone', extractedData.supervisor_mobile || extractedData.supervisor_phone || '');
+    
+    // Populate dates if available - convert from DD/MM/YYYY to YYYY-MM-DD format
+    if (extractedData.commencement_date) {
+        const commencementDate = convertDateFormat(extractedData.commencement_date);
+        if (commencementDate) {
+            setValue('commencement-date', commencementDate);
+            console.log(`[DATE] Set commencement date: ${extractedData.commencement_date} -> ${commencementDate}`);
+        }
+    }
+    if (extractedData.installation_date || extractedData.completion_date) {
+        const completionDate = convertDateFormat(extractedData.installation_date || extractedData.completion_date);
+        if (completionDate) {
+            setValue('completion-date', completionDate);
+            console.log(`[DATE] Set completion date: ${extractedData.installation_date || extractedData.completion_date} -> ${completionDate}`);
+        }
+    }
+    
+    // Handle BEST CONTACT field - use the consolidated summary from backend
+    if (extractedData.best_contact_summary) {
+        setValue('alternate-contact-name', extractedData.best_contact_summary);
+        console.log('[DEBUG] Set best contact summary:', extractedData.best_contact_summary);
+    } else if (extractedData.alternate_contacts && extractedData.alternate_contacts.length > 0) {
+        // Fallback to individual contact if no summary available
+        let bestContact = null;
+        const priorities = ['Decision Maker', 'Best Contact', 'Site Contact', 'Authorised Contact', 'Occupant Contact'];
+        for (const type of priorities) {
+            bestContact = extractedData.alternate_contacts.find(c => c.type && c.type.toLowerCase().includes(type.toLowerCase()));
+            if (bestContact) break;
+        }
+        if (!bestContact && extractedData.alternate_contacts.length > 0) {
+            bestContact = extractedData.alternate_contacts[0];
+        }
+        
+        if (bestContact) {
+            setValue('alternate-contact-name', bestContact.name || '');
+            console.log('[DEBUG] Set best contact name from fallback:', bestContact.name);
+        }
+    }
+    
+    // Handle Phone 3 and Phone 4 from the backend-mapped fields
+    if (extractedData.phone3) {
+        setValue('alternate-contact-phone', extractedData.phone3);  // Phone 3
+        console.log('[DEBUG] Set Phone 3 from phone3:', extractedData.phone3);
+    }
+    if (extractedData.phone4) {
+        setValue('alternate-contact-phone2', extractedData.phone4);  // Phone 4
+        console.log('[DEBUG] Set Phone 4 from phone4:', extractedData.phone4);
+    }
+    
+    // Fallback: Handle Phone 3 and Phone 4 from extra_phones if the above fields are not available
+    if (!extractedData.phone3 && !extractedData.phone4 && extractedData.extra_phones && extractedData.extra_phones.length > 0) {
+        setValue('alternate-contact-phone', extractedData.extra_phones[0] || '');  // Phone 3
+        console.log('[DEBUG] Set Phone 3 from extra_phones fallback:', extractedData.extra_phones[0]);
+        if (extractedData.extra_phones.length > 1) {
+            setValue('alternate-contact-phone2', extractedData.extra_phones[1] || '');  // Phone 4
+            console.log('[DEBUG] Set Phone 4 from extra_phones fallback:', extractedData.extra_phones[1]);
+        }
+    }
+}
+
+// Extracted field -> input it fills, for confidence highlighting
+const CONFIDENCE_FIELD_INPUTS = {
+    po_number: 'po-number',
+    dollar_value: 'dollar-value',
+    customer_name: 'ship-to-name',
+    supervisor_name: 'supervisor-name',
+    phone: 'ship-to-phone1',
+    mobile: 'ship-to-phone2',
+    email: 'ship-to-email',
+    address1: 'ship-to-address1',
+    zip_code: 'ship-to-zip',
+    description_of_works: 'description-of-works',
+};
+
+/**
+ * Outline the inputs whose values the extractor was unsure of and show the score on hover.
+ * @param {object} fieldConfidence - field -> score (0-1) from /upload-pdf.
+ * @param {Array} lowConfidenceFields - Fields the backend scored below its threshold.
+ */
+function markFieldConfidence(fieldConfidence = {}, lowConfidenceFields = []) {
+    Object.entries(CONFIDENCE_FIELD_INPUTS).forEach(([field, inputId]) => {
+        const input = document.getElementById(inputId);
+        if (!input) return;
+        const score = fieldConfidence[field];
+        const isLow = lowConfidenceFields.includes(field);
+        input.classList.toggle('low-confidence', isLow);
+        input.title = score === undefined ? '' : `Extraction confidence: ${Math.round(score * 100)}%${isLow ? ' - please check' : ''}`;
+    });
+}
+
+/**
+ * Show a PO selector when the uploaded PDF held several purchase orders.
+ * @param {Array} purchaseOrders - The purchase_orders list from /upload-pdf (absent for a single PO).
+ */
+function renderPurchaseOrderPicker(purchaseOrders) {
+    let picker = document.getElementById('po-segment-select');
+    if (!purchaseOrders || purchaseOrders.length < 2) {
+        if (picker) picker.remove();
+        window.extractedPurchaseOrders = [];
+        return;
+    }
+    window.extractedPurchaseOrders = purchaseOrders;
+    if (!picker) {
+        picker = document.createElement('select');
+        picker.id = 'po-segment-select';
+        picker.className = 'form-select form-select-sm mt-2';
+        picker.addEventListener('change', () => {
+            const po = window.extractedPurchaseOrders[Number(picker.value)];
+            if (po) populateExtractedFields(po);
+        });
+        document.getElementById('upload-pdf-btn').insertAdjacentElement('afterend', picker);
+    }
+    picker.innerHTML = '';
+    purchaseOrders.forEach((po, index) => {
+        const option = document.createElement('option');
+        option.value = index;
+        const pages = po.po_segment ? ` (pages ${po.po_segment.pages[0]}-${po.po_segment.pages[1]})` : '';
+        option.textContent = `PO ${po.po_number || '?'} - ${po.customer_name || 'unknown'}${pages}`;
+        picker.appendChild(option);
+    });
+    picker.value = '0';
+}
+
 function setupPdfUpload() {
     console.log('[DEBUG] Setting up PDF upload...');
     const uploadBtn = document.getElementById('upload-pdf-btn');
@@ -511,11 +745,13 @@ function setupPdfUpload() {
 
         // Get the selected builder name from the sold-to fields
         const builderName = document.getElementById('sold-to-name')?.value || '';
-            console.log('[DEBUG] Selected builder name:', builderName);
+        const builderId = document.getElementById('sold-to-rfms-id')?.value || '';
+            console.log('[DEBUG] Selected builder name:', builderName, 'ID:', builderId);
 
         const formData = new FormData();
         formData.append('pdf_file', file);
         formData.append('builder_name', builderName);
+        formData.append('builder_id', builderId);
         
         try {
                 console.log('[DEBUG] Disabling upload button');
@@ -529,6 +765,7 @@ function setupPdfUpload() {
             });
             
                 console.log('[DEBUG] Upload response received:', response.status);
+            recordServerTiming('POST /upload-pdf', response);
             if (!response.ok) {
                 let errorMsg = `Upload failed: ${response.statusText}`;
                 try {
@@ -554,6 +791,11 @@ function setupPdfUpload() {
             
             // Extract data into form fields
             if (extractedData) {
+                // Scanned PDFs come back without text; tell the user to key the details in
+                if (extractedData.needs_ocr) {
+                    showNotification(extractedData.extraction_warning || 'This PDF has no readable text. Please enter the details manually.', 'warning', 8000);
+                }
+
                 // Check for builder mismatch warning
                 if (extractedData.builder_mismatch_warning) {
                     const continueWithMismatch = confirm(
@@ -566,101 +808,13 @@ function setupPdfUpload() {
                     }
                 }
                 
-                // Populate ship-to fields
-                setValue('ship-to-name', extractedData.customer_name || '');
-                    
-                    // Split customer name into first and last names for customer creation
-                    if (extractedData.customer_name) {
-                        const nameParts = extractedData.customer_name.trim().split(/\s+/);
-                        if (nameParts.length >= 2) {
-                            setValue('ship-to-first-name', nameParts[0]);
-                            setValue('ship-to-last-name', nameParts.slice(1).join(' '));
-                        } else if (nameParts.length === 1) {
-                            setValue('ship-to-first-name', '');
-                            setValue('ship-to-last-name', nameParts[0]);
-                        }
-                    }
-                    
-                    setValue('ship-to-address1', extractedData.address1 || extractedData.address || '');  // Use parsed address1 first
-                setValue('ship-to-address2', extractedData.address2 || '');
-                setValue('ship-to-city', extractedData.city || '');
-                setValue('ship-to-zip', extractedData.zip_code || '');
-                    setValue('ship-to-state', extractedData.state || '');
-                setValue('ship-to-email', extractedData.email || '');
-                
-                // Populate phone fields
-                setValue('ship-to-phone1', extractedData.phone || '');
-                setValue('ship-to-phone2', extractedData.mobile || extractedData.work_phone || '');
-                    
-                    // Also populate hidden PDF phone fields for customer creation
-                    setValue('pdf-phone1', extractedData.phone || '');
-                    setValue('pdf-phone2', extractedData.mobile || extractedData.work_phone || '');
-                
-                // Populate work order fields
-                setValue('po-number', extractedData.po_number || '');
-                setValue('dollar-value', extractedData.dollar_value || '');
-                setValue('description-of-works', extractedData.scope_of_work || extractedData.description_of_works || '');
-                
-                    // Populate supervisor fields
-                    setValue('supervisor-name', extractedData.supervisor_name || '');
-                    setValue('supervisor-phone', extractedData.supervisor_mobile || extractedData.supervisor_phone || '');
-                
-                // Populate dates if available - convert from DD/MM/YYYY to YYYY-MM-DD format
-                if (extractedData.commencement_date) {
-                    const commencementDate = convertDateFormat(extractedData.commencement_date);
-                    if (commencementDate) {
-                        setValue('commencement-date', commencementDate);
-                        console.log(`[DATE] Set commencement date: ${extractedData.commencement_date} -> ${commencementDate}`);
-                    }
+                populateExtractedFields(extractedData);
+                renderPurchaseOrderPicker(extractedData.purchase_orders);
+                if (extractedData.low_confidence_fields && extractedData.low_confidence_fields.length > 0) {
+                    showNotification('Please check the highlighted fields: the PDF values for them were uncertain.', 'warning', 6000);
                 }
-                if (extractedData.installation_date || extractedData.completion_date) {
-                    const completionDate = convertDateFormat(extractedData.installation_date || extractedData.completion_date);
-                    if (completionDate) {
-                        setValue('completion-date', completionDate);
-                        console.log(`[DATE] Set completion date: ${extractedData.installation_date || extractedData.completion_date} -> ${completionDate}`);
-                    }
-                }
-                
-                // Handle BEST CONTACT field - use the consolidated summary from backend
-                if (extractedData.best_contact_summary) {
-                    setValue('alternate-contact-name', extractedData.best_contact_summary);
-                    console.log('[DEBUG] Set best contact summary:', extractedData.best_contact_summary);
-                } else if (extractedData.alternate_contacts && extractedData.alternate_contacts.length > 0) {
-                    // Fallback to individual contact if no summary available
-                    let bestContact = null;
-                    const priorities = ['Decision Maker', 'Best Contact', 'Site Contact', 'Authorised Contact', 'Occupant Contact'];
-                    for (const type of priorities) {
-                        bestContact = extractedData.alternate_contacts.find(c => c.type && c.type.toLowerCase().includes(type.toLowerCase()));
-                        if (bestContact) break;
-                    }
-                    if (!bestContact && extractedData.alternate_contacts.length > 0) {
-                        bestContact = extractedData.alternate_contacts[0];
-                    }
-                    
-                    if (bestContact) {
-                        setValue('alternate-contact-name', bestContact.name || '');
-                        console.log('[DEBUG] Set best contact name from fallback:', bestContact.name);
-                    }
-                }
-                
-                // Handle Phone 3 and Phone 4 from the backend-mapped fields
-                if (extractedData.phone3) {
-                    setValue('alternate-contact-phone', extractedData.phone3);  // Phone 3
-                    console.log('[DEBUG] Set Phone 3 from phone3:', extractedData.phone3);
-                }
-                if (extractedData.phone4) {
-                    setValue('alternate-contact-phone2', extractedData.phone4);  // Phone 4
-                    console.log('[DEBUG] Set Phone 4 from phone4:', extractedData.phone4);
-                }
-                
-                // Fallback: Handle Phone 3 and Phone 4 from extra_phones if the above fields are not available
-                if (!extractedData.phone3 && !extractedData.phone4 && extractedData.extra_phones && extractedData.extra_phones.length > 0) {
-                    setValue('alternate-contact-phone', extractedData.extra_phones[0] || '');  // Phone 3
-                    console.log('[DEBUG] Set Phone 3 from extra_phones fallback:', extractedData.extra_phones[0]);
-                    if (extractedData.extra_phones.length > 1) {
-                        setValue('alternate-contact-phone2', extractedData.extra_phones[1] || '');  // Phone 4
-                        console.log('[DEBUG] Set Phone 4 from extra_phones fallback:', extractedData.extra_phones[1]);
-                    }
+                if (extractedData.purchase_orders && extractedData.purchase_orders.length > 1) {
+                    showNotification(`This PDF contains ${extractedData.purchase_orders.length} purchase orders. Use the PO selector to review each one.`, 'info', 6000);
                 }
             }
             
@@ -726,6 +880,7 @@ function setupPdfUpload() {
                 
                 // Clear best contacts
                 clearBestContacts();
+                markFieldConfidence();
                 
                 // Clear alternate contacts
                 const altContactsDiv = document.getElementById('alternate-contacts');
@@ -904,72 +1059,108 @@ function setupBuilderSearch() {
         loadingIndicator.innerHTML = '<svg class="animate-spin h-3 w-3 text-yellow-400" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24"><circle class="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" stroke-width="4"></circle><path class="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8v8z"></path></svg>';
         searchBtn.parentNode.appendChild(loadingIndicator);
     }
-    if (searchBtn) {
-        searchBtn.addEventListener('click', async function() {
-            const searchTerm = searchField.value;
-            loadingIndicator.style.display = '';
-            resultsDiv.innerHTML = '';
-            try {
-                const response = await fetchWithRetry('/api/customers/search', {
+    if (!searchBtn) return;
+
+    function renderCustomer(customer) {
+        const item = document.createElement('div');
+        item.className = 'border border-gray-600 rounded p-2 hover:bg-gray-700 cursor-pointer customer-result';
+        item.dataset.id = customer.id || customer.customer_source_id;
+        item.dataset.customer = JSON.stringify(customer);
+        item.innerHTML = `
+            <p class="font-medium">${customer.name || customer.business_name || customer.first_name + ' ' + customer.last_name}</p>
+            <p class="text-sm text-gray-400">${customer.address1 || ''}, ${customer.city || ''}</p>
+            <p class="text-sm text-gray-400">ID: ${customer.id || customer.customer_source_id}</p>
+        `;
+        return item;
+    }
+
+    // One handler for every result, including rows appended by "Load more"
+    resultsDiv.addEventListener('click', function(event) {
+        const item = event.target.closest('.customer-result');
+        if (!item) return;
+        const customerId = item.dataset.id;
+        const customerData = JSON.parse(item.dataset.customer);
+        // Populate sold-to fields
+        document.getElementById('sold-to-rfms-id').value = customerId;
+        document.getElementById('sold-to-name').value = customerData.name ||
+            `${customerData.first_name || ''} ${customerData.last_name || ''}`.trim();
+        document.getElementById('sold-to-business-name').value = customerData.business_name || '';
+        document.getElementById('sold-to-address1').value = customerData.address1 || '';
+        document.getElementById('sold-to-address2').value = customerData.address2 || '';
+        document.getElementById('sold-to-city').value = customerData.city || '';
+        document.getElementById('sold-to-state').value = customerData.state || '';
+        document.getElementById('sold-to-zip').value = customerData.zip_code || '';
+        document.getElementById('sold-to-phone1').value = customerData.phone || '';
+        document.getElementById('sold-to-phone2').value = customerData.phone2 || '';
+        const emailField = document.getElementById('sold-to-email');
+        if (emailField) emailField.value = customerData.email || '';
+        // Clear results
+        resultsDiv.innerHTML = '<p class="text-green-500">Customer selected</p>';
+    });
+
+    // Streams one page of results; rows are shown as each NDJSON line arrives
+    async function runSearch(body, list) {
+        loadingIndicator.style.display = '';
+        const seen = new Set(Array.from(list.children).map(item => item.dataset.id));
+        let nextCursor = null;
+        try {
+            const response = await fetchWithRetry('/api/customers/search', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ term: searchTerm })
+                headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+                body: JSON.stringify(body)
             });
-                const customers = await response.json();
-                if (customers.error) {
-                    resultsDiv.innerHTML = `<p class="text-red-500">Error: ${customers.error}</p>`;
-                    return;
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            const handleLine = line => {
+                if (!line.trim()) return;
+                const message = JSON.parse(line);
+                if (message.error) throw new Error(message.error);
+                if (message.customer) {
+                    const item = renderCustomer(message.customer);
+                    if (seen.has(item.dataset.id)) return;
+                    seen.add(item.dataset.id);
+                    list.appendChild(item);
+                } else if ('next_cursor' in message) {
+                    nextCursor = message.next_cursor;
+                }
+            };
+            while (true) {
+                const { done, value } = await reader.read();
+                buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+                const lines = buffered.split('\n');
+                buffered = lines.pop();
+                lines.forEach(handleLine);
+                if (done) break;
             }
-                if (!customers.length) {
-                    resultsDiv.innerHTML = '<p class="text-gray-500">No customers found</p>';
-                    return;
-        }
-                // Display results
-                let html = '<div class="space-y-2">';
-                customers.forEach(customer => {
-                    html += `
-                        <div class="border border-gray-600 rounded p-2 hover:bg-gray-700 cursor-pointer customer-result" 
-                             data-id="${customer.id || customer.customer_source_id}"
-                             data-customer='${JSON.stringify(customer).replace(/'/g, "&apos;")}' >
-                            <p class="font-medium">${customer.name || customer.business_name || customer.first_name + ' ' + customer.last_name}</p>
-                            <p class="text-sm text-gray-400">${customer.address1 || ''}, ${customer.city || ''}</p>
-                            <p class="text-sm text-gray-400">ID: ${customer.id || customer.customer_source_id}</p>
-                        </div>
-                    `;
-    });
-                html += '</div>';
-                resultsDiv.innerHTML = html;
-                // Add click handlers to results
-                document.querySelectorAll('.customer-result').forEach(item => {
-                    item.addEventListener('click', function() {
-                        const customerId = this.dataset.id;
-                        const customerData = JSON.parse(this.dataset.customer);
-                        // Populate sold-to fields
-                        document.getElementById('sold-to-rfms-id').value = customerId;
-                        document.getElementById('sold-to-name').value = customerData.name || 
-                            `${customerData.first_name || ''} ${customerData.last_name || ''}`.trim();
-                        document.getElementById('sold-to-business-name').value = customerData.business_name || '';
-                        document.getElementById('sold-to-address1').value = customerData.address1 || '';
-                        document.getElementById('sold-to-address2').value = customerData.address2 || '';
-                        document.getElementById('sold-to-city').value = customerData.city || '';
-                        document.getElementById('sold-to-state').value = customerData.state || '';
-                        document.getElementById('sold-to-zip').value = customerData.zip_code || '';
-                        document.getElementById('sold-to-phone1').value = customerData.phone || '';
-                        document.getElementById('sold-to-phone2').value = customerData.phone2 || '';
-                        const emailField = document.getElementById('sold-to-email');
-                        if (emailField) emailField.value = customerData.email || '';
-                        // Clear results
-                        resultsDiv.innerHTML = '<p class="text-green-500">Customer selected</p>';
-                    });
+            handleLine(buffered);
+            if (!list.children.length) {
+                resultsDiv.innerHTML = '<p class="text-gray-500">No customers found</p>';
+                return;
+            }
+            if (nextCursor) {
+                const moreBtn = document.createElement('button');
+                moreBtn.type = 'button';
+                moreBtn.className = 'text-sm text-atoz-yellow hover:underline mt-2';
+                moreBtn.textContent = 'Load more';
+                moreBtn.addEventListener('click', () => {
+                    moreBtn.remove();
+                    runSearch({ cursor: nextCursor }, list);
                 });
-            } catch (error) {
-                console.error('Search error:', error);
-                resultsDiv.innerHTML = '<div class="text-red-500">Search failed: ' + error.message + '</div>';
-            } finally {
-                loadingIndicator.style.display = 'none';
+                resultsDiv.appendChild(moreBtn);
             }
-        });
+        } catch (error) {
+            console.error('Search error:', error);
+            resultsDiv.insertAdjacentHTML('beforeend', '<div class="text-red-500">Search failed: ' + error.message + '</div>');
+        } finally {
+            loadingIndicator.style.display = 'none';
+        }
     }
+
+    searchBtn.addEventListener('click', function() {
+        resultsDiv.innerHTML = '<div class="space-y-2"></div>';
+        runSearch({ term: searchField.value }, resultsDiv.firstElementChild);
+    });
 }
 
 /**
@@ -1197,10 +1388,22 @@ function setupAddCustomerAndCreateJob() {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
             });
-            const result = await response.json();
-            showNotification('Job created in RFMS!', 'success');
-            if (result.job_id) {
-                showNotification(`Job created with ID: ${result.job_id}`, 'success', 5000);
+            let result = await response.json();
+            if (response.status === 202 && result.outbox) {
+                // Export was queued; follow it until the outbox reports an outcome
+                showNotification('Job queued for RFMS...', 'info');
+                result = await waitForOutboxDelivery(result.outbox.id);
+            }
+            if (result.status === 'failed') {
+                showNotification(`RFMS export failed: ${result.last_error || 'unknown error'}`, 'error', 8000);
+            } else if (result.status === 'pending' || result.status === 'in_progress') {
+                showNotification('Job is still queued for RFMS and will be retried automatically', 'info', 5000);
+            } else {
+                showNotification('Job created in RFMS!', 'success');
+                const orderId = result.job_id || result.order_id || result.rfms_order_id;
+                if (orderId) {
+                    showNotification(`Job created with ID: ${orderId}`, 'success', 5000);
+                }
             }
         } catch (error) {
             handleApiError(error, 'creating job in RFMS');
@@ -1215,6 +1418,21 @@ function setupAddCustomerAndCreateJob() {
     });
 }
 
+/**
+ * Poll a queued RFMS export until it is delivered, fails, or polling gives up
+ */
+async function waitForOutboxDelivery(outboxId, attempts = 20, intervalMs = 1500) {
+    let entry = { id: outboxId, status: 'pending' };
+    for (let i = 0; i < attempts; i++) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const response = await fetch(`/api/export-to-rfms/outbox/${outboxId}`);
+        if (!response.ok) continue;
+        entry = await response.json();
+        if (entry.status === 'delivered' || entry.status === 'failed') break;
+    }
+    return entry;
+}
+
 /**
  * Clear best contact fields
  */
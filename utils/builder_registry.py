@@ -0,0 +1,251 @@
+"""
+Builder alias registry: maps RFMS customer IDs and builder names to extraction templates.
+
+Every alias is stored under its normalized form in a dict, so an exact or
+word-sequence match is a handful of hash lookups no matter how many builders
+are registered. Names that match nothing fall back to a character-bigram
+index, which only scores aliases sharing at least one bigram with the name.
+Results are memoized per distinct builder name (least recently used names are
+dropped past MATCH_CACHE_SIZE), and a customer ID is remembered only when its
+name matched an alias exactly, never on a fuzzy guess.
+"""
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Company-form words that say nothing about which builder it is
+_NOISE_WORDS = {"pty", "ltd", "limited", "the", "inc", "co"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+# "CCC55132" -> "ccc 55132", so prefixed job numbers expose the builder code
+_LETTER_DIGIT_BOUNDARY = re.compile(r"(?<=[a-z])(?=[0-9])|(?<=[0-9])(?=[a-z])")
+# Character bigrams tolerate the transpositions and dropped letters of typed names
+NGRAM_SIZE = 2
+# Distinct builder names whose match is memoized
+MATCH_CACHE_SIZE = int(os.getenv("BUILDER_MATCH_CACHE_SIZE", "1024"))
+
+# template -> (display name used for PDF header detection, aliases)
+BUILDER_ALIASES = {
+    "profile_build": ("profile build group", [
+        "profile build", "profile build group", "profile building group", "profilebuildgroup", "pbg",
+    ]),
+    "ambrose": ("ambrose construct group", [
+        "ambrose", "ambrose construct", "ambrose construction", "ambrose group",
+    ]),
+    "campbell": ("campbell construction", [
+        "campbell", "campbell construction", "campbell build", "ccc",
+    ]),
+    "australian_restoration": ("australian restoration company", [
+        "australian restoration", "aust restoration", "restoration company", "arc",
+    ]),
+    "townsend": ("townsend building services", [
+        "townsend", "townsend building", "townsend services", "tbs",
+    ]),
+    "rizon": ("rizon group", [
+        "rizon", "rizon group", "rizon construction",
+    ]),
+    "one_solutions": ("one solutions", [
+        "one solutions", "a to z flooring", "a to z flooring solutions",
+    ]),
+    "johns_lyng": ("johns lyng group", [
+        "johns lyng", "johns lyng group", "jl group",
+    ]),
+    "advance": ("advance builders", [
+        "advance", "advance builders", "advance building", "advance construction",
+    ]),
+}
+
+
+def normalize_builder_name(name):
+    """Lowercase, split on punctuation and letter/digit runs, drop company-form words."""
+    words = _LETTER_DIGIT_BOUNDARY.sub(" ", _NON_ALNUM.sub(" ", str(name or "").lower())).split()
+    return " ".join(word for word in words if word not in _NOISE_WORDS)
+
+
+def _ngrams(value):
+    padded = " " * (NGRAM_SIZE - 1) + value + " "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def _parse_customer_ids(spec):
+    """
+    Parse "template=id,id;template=id" into {customer_id: template}.
+    """
+    mapping = {}
+    for part in (spec or "").split(";"):
+        template, _, ids = part.partition("=")
+        for customer_id in ids.split(","):
+            if template.strip() and customer_id.strip():
+                mapping[customer_id.strip()] = template.strip()
+    return mapping
+
+
+class BuilderRegistry:
+    """
+    Hash-indexed aliases with an n-gram index for fuzzy fallback.
+    """
+
+    def __init__(self, fuzzy_threshold=0.6):
+        """
+        Args:
+            fuzzy_threshold (float): Minimum bigram Dice similarity for a fuzzy match
+        """
+        self.fuzzy_threshold = fuzzy_threshold
+        self._by_alias = {}
+        self._by_customer_id = {}
+        self._display_names = {}
+        self._ngram_index = defaultdict(set)
+        self._alias_ngrams = {}
+        self._max_alias_words = 1
+        self._cache = OrderedDict()  # normalized name -> (template, matched an alias exactly)
+        self._lock = threading.Lock()
+
+    def register(self, template, display_name, aliases=(), customer_ids=()):
+        """
+        Add a builder. Existing aliases or IDs are re-pointed at this template.
+
+        Args:
+            template (str): TEMPLATE_CONFIGS key
+            display_name (str): Builder name reported by detection
+            aliases (iterable): Names and abbreviations the builder goes by
+            customer_ids (iterable): RFMS customer IDs billed as this builder
+        """
+        with self._lock:
+            self._display_names[template] = display_name
+            for alias in list(aliases) + [display_name]:
+                key = normalize_builder_name(alias)
+                if not key:
+                    continue
+                self._by_alias[key] = template
+                self._max_alias_words = max(self._max_alias_words, len(key.split()))
+                grams = _ngrams(key)
+                self._alias_ngrams[key] = grams
+                for gram in grams:
+                    self._ngram_index[gram].add(key)
+            for customer_id in customer_ids:
+                self._by_customer_id[str(customer_id).strip()] = template
+            self._cache.clear()
+
+    def remember_customer_id(self, customer_id, template):
+        """Record which template a customer's POs use, so later lookups skip name matching."""
+        customer_id = str(customer_id or "").strip()
+        if customer_id and template:
+            with self._lock:
+                self._by_customer_id[customer_id] = template
+
+    def display_name(self, template):
+        return self._display_names.get(template, "")
+
+    def _find_alias(self, words):
+        """
+        Earliest registered alias appearing as a word sequence (longest at that position).
+
+        Returns:
+            tuple: (template, alias) or (None, None)
+        """
+        for start in range(len(words)):
+            for size in range(min(self._max_alias_words, len(words) - start), 0, -1):
+                key = " ".join(words[start:start + size])
+                template = self._by_alias.get(key)
+                if template:
+                    return template, key
+        return None, None
+
+    def _fuzzy(self, normalized):
+        grams = _ngrams(normalized)
+        shared = defaultdict(int)
+        for gram in grams:
+            for alias in self._ngram_index.get(gram, ()):
+                shared[alias] += 1
+        best_alias, best_score = None, 0.0
+        for alias, count in shared.items():
+            score = 2.0 * count / (len(grams) + len(self._alias_ngrams[alias]))
+            if score > best_score:
+                best_alias, best_score = alias, score
+        if best_alias and best_score >= self.fuzzy_threshold:
+            return self._by_alias[best_alias], best_score
+        return None, best_score
+
+    def match(self, builder_name="", customer_id=""):
+        """
+        Template for a builder, by RFMS customer ID first and then by name.
+
+        Args:
+            builder_name (str): Builder name as selected in the UI
+            customer_id (str): RFMS customer ID of the sold-to builder
+
+        Returns:
+            str: Template name, or "" if nothing matched
+        """
+        customer_id = str(customer_id or "").strip()
+        if customer_id:
+            template = self._by_customer_id.get(customer_id)
+            if template:
+                logger.info(f"[BUILDER_MATCH] Customer ID match: '{customer_id}' -> '{template}'")
+                return template
+
+        normalized = normalize_builder_name(builder_name)
+        if not normalized:
+            return ""
+        with self._lock:
+            cached = self._cache.get(normalized)
+            if cached is not None:
+                self._cache.move_to_end(normalized)
+        if cached is not None:
+            template, exact = cached
+            if exact:
+                self.remember_customer_id(customer_id, template)
+            return template
+
+        template, alias = self._find_alias(normalized.split())
+        exact = bool(template)
+        if template:
+            logger.info(f"[BUILDER_MATCH] Alias match: '{builder_name}' -> '{template}' (alias '{alias}')")
+        else:
+            template, score = self._fuzzy(normalized)
+            if template:
+                logger.info(f"[BUILDER_MATCH] Fuzzy match: '{builder_name}' -> '{template}' (score: {score:.2f})")
+            else:
+                logger.warning(f"[BUILDER_MATCH] No match found for builder: '{builder_name}'")
+                template = ""
+
+        with self._lock:
+            self._cache[normalized] = (template, exact)
+            while len(self._cache) > MATCH_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        # A fuzzy guess could pin the wrong template to the customer for good
+        if exact:
+            self.remember_customer_id(customer_id, template)
+        return template
+
+    def detect_in_text(self, text):
+        """
+        Builder display name for the first registered alias found in a block of text.
+
+        Args:
+            text (str): Header text of a PDF
+
+        Returns:
+            str: Display name, or "" if no alias occurs in the text
+        """
+        template, _ = self._find_alias(normalize_builder_name(text).split())
+        return self._display_names.get(template, "") if template else ""
+
+
+def _build_default_registry():
+    registry = BuilderRegistry(fuzzy_threshold=float(os.getenv("BUILDER_FUZZY_THRESHOLD", "0.6")))
+    customer_ids = _parse_customer_ids(os.getenv("BUILDER_TEMPLATE_CUSTOMER_IDS", ""))
+    for template, (display_name, aliases) in BUILDER_ALIASES.items():
+        registry.register(
+            template,
+            display_name,
+            aliases,
+            customer_ids=[cid for cid, t in customer_ids.items() if t == template],
+        )
+    return registry
+
+
+builder_registry = _build_default_registry()
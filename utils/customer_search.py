@@ -0,0 +1,164 @@
+"""
+Paged RFMS customer search with opaque cursors, prefetch and shared caches.
+
+A cursor encodes the search text and the RFMS start index, so clients page by
+handing back next_cursor instead of doing index arithmetic. Pages are cached
+for a short time as futures: once a page is served, the next one is fetched
+in the background, and a click on "load more" (or another user searching the
+same name) waits on that call instead of starting a new round trip.
+Customer records are formatted once, keyed by customer id, and reused by
+every page and search they appear in.
+"""
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_SEARCH_CACHE_SECONDS = float(os.getenv("CUSTOMER_SEARCH_CACHE_SECONDS", "120"))
+CUSTOMER_SEARCH_PREFETCH = os.getenv("CUSTOMER_SEARCH_PREFETCH", "true").lower() == "true"
+# RFMS returns a fixed number of rows per find call; learned from the largest page seen
+CUSTOMER_SEARCH_PAGE_SIZE = int(os.getenv("CUSTOMER_SEARCH_PAGE_SIZE", "10"))
+_MAX_CACHED_PAGES = 256
+_MAX_CACHED_RECORDS = 5000
+
+
+def encode_search_cursor(term, start_index):
+    raw = json.dumps({"q": term, "i": start_index}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor):
+    """
+    Returns:
+        tuple: (search text, start index)
+
+    Raises:
+        ValueError: The cursor was not produced by encode_search_cursor
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(data["q"]), int(data["i"])
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+def _customer_key(customer):
+    detail = customer.get("detail") if isinstance(customer.get("detail"), dict) else {}
+    return (
+        customer.get("customerSourceId") or customer.get("customerId")
+        or detail.get("customerSourceId") or detail.get("customerId")
+    )
+
+
+class CustomerSearch:
+    """Per-process page and record caches in front of RfmsApi customer search."""
+
+    def __init__(self, get_api_client, submit):
+        """
+        Args:
+            get_api_client (callable): Returns a configured RfmsApi instance
+            submit (callable): submit(fn, *args) -> Future, running fn in an app context
+                               on the RFMS background pool
+        """
+        self.get_api_client = get_api_client
+        self.submit = submit
+        self.page_size = CUSTOMER_SEARCH_PAGE_SIZE
+        self._pages = {}  # (term, start_index) -> (expires_at, Future of raw rows)
+        self._records = {}  # customer id -> (expires_at, formatted record)
+        self._lock = threading.Lock()
+        self._stats = {"page_hits": 0, "page_misses": 0, "prefetches": 0, "formatted": 0, "format_reused": 0}
+
+    def _page_future(self, term, start_index, prefetch=False):
+        key = (term.lower(), start_index)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached and cached[0] > now and not (cached[1].done() and cached[1].exception()):
+                if not prefetch:
+                    self._stats["page_hits"] += 1
+                return cached[1], True
+            if len(self._pages) >= _MAX_CACHED_PAGES:
+                self._evict(self._pages, now)
+            # Registered before the call starts so a request arriving meanwhile joins it
+            future = Future()
+            self._pages[key] = (now + CUSTOMER_SEARCH_CACHE_SECONDS, future)
+            self._stats["prefetches" if prefetch else "page_misses"] += 1
+        self.submit(self._fetch_raw, term, start_index).add_done_callback(lambda f: _copy_result(f, future))
+        return future, False
+
+    def _fetch_raw(self, term, start_index):
+        logger.info(f"[CUSTOMER_SEARCH] RFMS find '{term}' from {start_index}")
+        rows = self.get_api_client()._find_customer_by_name_uncached(term, start_index)
+        return rows if isinstance(rows, list) else []
+
+    @staticmethod
+    def _evict(cache, now):
+        for key in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+            del cache[key]
+        # Still full of live entries: drop the oldest half
+        if len(cache) >= _MAX_CACHED_PAGES:
+            for key in sorted(cache, key=lambda k: cache[k][0])[: len(cache) // 2]:
+                del cache[key]
+
+    def format_records(self, rows):
+        """Format raw RFMS rows, reusing records already formatted by an earlier page or search."""
+        now = time.monotonic()
+        formatted = []
+        to_format = []
+        with self._lock:
+            for row in rows:
+                if not isinstance(row, dict):
+                    continue
+                key = _customer_key(row)
+                cached = self._records.get(key) if key else None
+                if cached and cached[0] > now:
+                    formatted.append(cached[1])
+                    self._stats["format_reused"] += 1
+                else:
+                    formatted.append(None)
+                    to_format.append((len(formatted) - 1, key, row))
+        if to_format:
+            results = self.get_api_client()._format_customer_list([row for _, _, row in to_format])
+            with self._lock:
+                if len(self._records) + len(results) > _MAX_CACHED_RECORDS:
+                    self._records = {k: v for k, v in self._records.items() if v[0] > now}
+                for (index, key, _), record in zip(to_format, results):
+                    formatted[index] = record
+                    if key:
+                        self._records[key] = (now + CUSTOMER_SEARCH_CACHE_SECONDS, record)
+                self._stats["formatted"] += len(results)
+        return [record for record in formatted if record is not None]
+
+    def search(self, term, start_index=0):
+        """
+        One page of formatted customers, starting the prefetch of the next page.
+
+        Returns:
+            dict: {"customers": [...], "next_cursor": str or None, "cached": bool}
+        """
+        future, cached = self._page_future(term, start_index)
+        rows = future.result()
+        with self._lock:
+            self.page_size = max(self.page_size, len(rows))
+            full_page = len(rows) >= self.page_size
+        next_cursor = encode_search_cursor(term, start_index + len(rows)) if rows and full_page else None
+        if next_cursor and CUSTOMER_SEARCH_PREFETCH:
+            self._page_future(term, start_index + len(rows), prefetch=True)
+        return {"customers": self.format_records(rows), "next_cursor": next_cursor, "cached": cached}
+
+    def metrics(self):
+        with self._lock:
+            return {**self._stats, "cached_pages": len(self._pages), "cached_records": len(self._records),
+                    "page_size": self.page_size}
+
+
+def _copy_result(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
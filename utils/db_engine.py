@@ -0,0 +1,105 @@
+"""
+Database engine settings for many gunicorn workers sharing one database.
+
+On SQLite every connection gets WAL journaling (readers no longer block the
+writer or each other), a relaxed synchronous level that is still safe with
+WAL, a larger page cache and a busy timeout. A writer that finds the database
+locked then waits its turn instead of failing with "database is locked". On
+Postgres (or any other server database) the connection pool is sized and
+recycled explicitly.
+"""
+import logging
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+logger = logging.getLogger(__name__)
+
+DB_BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_BUSY_TIMEOUT_SECONDS", "15"))
+DB_SQLITE_JOURNAL_MODE = os.getenv("DB_SQLITE_JOURNAL_MODE", "WAL").upper()
+DB_SQLITE_SYNCHRONOUS = os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL").upper()
+DB_SQLITE_CACHE_MB = int(os.getenv("DB_SQLITE_CACHE_MB", "32"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+_SQLITE_JOURNAL_MODES = {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"}
+_SQLITE_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def sqlite_pragmas():
+    """
+    PRAGMA statements run on every new SQLite connection.
+
+    Returns:
+        list: SQL statements
+    """
+    pragmas = [f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_SECONDS * 1000)}"]
+    if DB_SQLITE_JOURNAL_MODE in _SQLITE_JOURNAL_MODES:
+        pragmas.append(f"PRAGMA journal_mode = {DB_SQLITE_JOURNAL_MODE}")
+    if DB_SQLITE_SYNCHRONOUS in _SQLITE_SYNCHRONOUS_LEVELS:
+        pragmas.append(f"PRAGMA synchronous = {DB_SQLITE_SYNCHRONOUS}")
+    if DB_SQLITE_CACHE_MB > 0:
+        # A negative cache_size is in KiB rather than pages
+        pragmas.append(f"PRAGMA cache_size = -{DB_SQLITE_CACHE_MB * 1024}")
+    return pragmas
+
+
+def engine_options(database_url):
+    """
+    SQLAlchemy create_engine() options for a database URL.
+
+    Args:
+        database_url (str): SQLAlchemy database URL
+
+    Returns:
+        dict: Options for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        # The driver's own lock wait; the busy_timeout pragma sets the same for the connection
+        return {"connect_args": {"timeout": DB_BUSY_TIMEOUT_SECONDS}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        # Drop connections before the server or a proxy times them out, and test on checkout
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def configure_database(app):
+    """
+    Apply the engine settings to a Flask app. Call before db.init_app(app).
+
+    Options already in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+    """
+    options = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+    if not event.contains(Engine, "connect", _apply_sqlite_pragmas):
+        event.listen(Engine, "connect", _apply_sqlite_pragmas)
+    backend = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+    if backend == "sqlite":
+        logger.info(f"[DB] SQLite connections use: {'; '.join(sqlite_pragmas())}")
+    else:
+        logger.info(
+            f"[DB] {backend} pool: size {DB_POOL_SIZE} + overflow {DB_MAX_OVERFLOW}, "
+            f"recycle {DB_POOL_RECYCLE}s, pre-ping on"
+        )
@@ -1,9 +1,23 @@
 """
 Email utility module for sending emails via SMTP.
+
+Notifications are normally queued: each message is written to a spool
+directory and a background thread delivers due messages in batches over one
+reused, authenticated SMTP connection, retrying with backoff. Anything still in
+the spool after a crash is picked up again on the next start.
+
+For local testing point SMTP_SERVER/SMTP_PORT at a stand-in such as
+``python -m aiosmtpd -n -l localhost:1025`` with SMTP_USE_TLS=false and
+SMTP_USE_AUTH=false.
 """
 import os
+import json
+import time
+import uuid
 import logging
 import smtplib
+import threading
+from email import message_from_bytes
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -22,17 +36,86 @@ class EmailSender:
         self.smtp_username = os.getenv('SMTP_USERNAME')
         self.smtp_password = os.getenv('SMTP_PASSWORD')
         self.from_email = os.getenv('FROM_EMAIL', self.smtp_username)
+        self.use_tls = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+        self.use_auth = os.getenv('SMTP_USE_AUTH', 'true').lower() == 'true'
+        self.queue_enabled = os.getenv('EMAIL_QUEUE_ENABLED', 'true').lower() == 'true'
         
         # Check if email is configured
         self.is_configured = all([
             self.smtp_server,
             self.smtp_port,
-            self.smtp_username,
-            self.smtp_password
+            self.smtp_username or not self.use_auth,
+            self.smtp_password or not self.use_auth
         ])
         
         if not self.is_configured:
             logger.warning("Email configuration incomplete. Email functionality will be disabled.")
+
+        self.queue = MailQueue(
+            self,
+            spool_dir=os.getenv('EMAIL_SPOOL_DIR', 'mail_spool'),
+            max_attempts=int(os.getenv('EMAIL_MAX_ATTEMPTS', '5')),
+            batch_size=int(os.getenv('EMAIL_BATCH_SIZE', '20')),
+            idle_timeout=float(os.getenv('EMAIL_SMTP_IDLE_SECONDS', '60')),
+        )
+
+    def open_connection(self):
+        """
+        Open an SMTP connection, running STARTTLS and login as configured.
+
+        Returns:
+            smtplib.SMTP: Connected (and authenticated) client
+        """
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.use_auth:
+            server.login(self.smtp_username, self.smtp_password)
+        return server
+
+    def build_message(self, to_email, subject, body, cc_emails=None, attachments=None):
+        """
+        Build the MIME message and recipient list for an email.
+
+        Returns:
+            tuple: (MIMEMultipart message, list of recipient addresses)
+        """
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        
+        if cc_emails:
+            msg['Cc'] = ', '.join(cc_emails)
+        
+        # Add body
+        msg.attach(MIMEText(body, 'html'))
+        
+        # Add attachments
+        if attachments:
+            for file_path in attachments:
+                if os.path.isfile(file_path):
+                    self._attach_file(msg, file_path)
+
+        recipients = [to_email]
+        if cc_emails:
+            recipients.extend(cc_emails)
+        return msg, recipients
+
+    def queue_email(self, to_email, subject, body, cc_emails=None, attachments=None):
+        """
+        Spool an email for background delivery and return immediately.
+
+        Args are as for send_email.
+
+        Returns:
+            str: Spooled message ID, or None if email is not configured
+        """
+        if not self.is_configured:
+            logger.error("Email not configured. Cannot queue email.")
+            return None
+        msg, recipients = self.build_message(to_email, subject, body, cc_emails, attachments)
+        return self.queue.enqueue(msg, recipients)
     
     def send_email(self, to_email, subject, body, cc_emails=None, attachments=None):
         """
@@ -53,34 +136,10 @@ class EmailSender:
             return False
             
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.from_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            if cc_emails:
-                msg['Cc'] = ', '.join(cc_emails)
-            
-            # Add body
-            msg.attach(MIMEText(body, 'html'))
-            
-            # Add attachments
-            if attachments:
-                for file_path in attachments:
-                    if os.path.isfile(file_path):
-                        self._attach_file(msg, file_path)
+            msg, recipients = self.build_message(to_email, subject, body, cc_emails, attachments)
             
             # Connect to server and send
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                
-                # Get all recipients
-                recipients = [to_email]
-                if cc_emails:
-                    recipients.extend(cc_emails)
-                
+            with self.open_connection() as server:
                 server.send_message(msg, to_addrs=recipients)
                 
             logger.info(f"Email sent successfully to {to_email}")
@@ -145,8 +204,249 @@ class EmailSender:
         </html>
         """
         
+        if self.queue_enabled:
+            return self.queue_email(recipient_email, subject, body) is not None
         return self.send_email(recipient_email, subject, body)
 
 
+class MailQueue:
+    """
+    Persistent spool plus background delivery for outgoing email.
+
+    Each message is stored as <id>.eml with an <id>.json sidecar holding the
+    recipients and retry state. A message is claimed by renaming its sidecar into
+    the inflight directory, so several worker processes can share one spool.
+    """
+
+    def __init__(self, sender, spool_dir, max_attempts=5, batch_size=20, idle_timeout=60.0,
+                 base_backoff=30.0, inflight_lease=600.0):
+        """
+        Args:
+            sender (EmailSender): Provides SMTP settings and open_connection()
+            spool_dir (str): Directory for queued, in-flight and failed messages
+            max_attempts (int): Delivery attempts before a message moves to failed/
+            batch_size (int): Messages sent per connection before re-checking the queue
+            idle_timeout (float): Seconds an unused connection is kept open
+            base_backoff (float): First retry delay in seconds, doubled per attempt
+            inflight_lease (float): Age after which an in-flight claim is considered abandoned
+        """
+        self.sender = sender
+        self.queue_dir = os.path.join(spool_dir, 'queue')
+        self.inflight_dir = os.path.join(spool_dir, 'inflight')
+        self.failed_dir = os.path.join(spool_dir, 'failed')
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.base_backoff = base_backoff
+        self.inflight_lease = inflight_lease
+        self._connection = None
+        self._connection_used_at = 0.0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._spool_checked_pid = None
+
+    def _ensure_dirs(self):
+        for path in (self.queue_dir, self.inflight_dir, self.failed_dir):
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def enqueue(self, msg, recipients):
+        """
+        Write a message to the spool and wake the delivery thread.
+
+        Returns:
+            str: Message ID
+        """
+        self._ensure_dirs()
+        message_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:12]}"
+        self._write_atomic(os.path.join(self.queue_dir, f"{message_id}.eml"), msg.as_bytes())
+        meta = {"recipients": recipients, "attempts": 0, "next_attempt": 0, "last_error": None}
+        # The sidecar is written last: a message only becomes visible once both files exist
+        self._write_atomic(os.path.join(self.queue_dir, f"{message_id}.json"), json.dumps(meta).encode())
+        logger.info(f"[MAIL_QUEUE] Spooled message {message_id} for {', '.join(recipients)}")
+        self.ensure_started()
+        self._wake.set()
+        return message_id
+
+    def ensure_started(self):
+        """Start the delivery thread once per process."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._ensure_dirs()
+            self._recover_abandoned()
+            self._pid = os.getpid()
+            self._connection = None
+            self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+            self._thread.start()
+
+    def start_if_pending(self):
+        """
+        Start the delivery thread if the spool already holds messages, e.g. left by
+        a crash or redeploy. Checks once per process; later messages start it via enqueue().
+        """
+        if self._spool_checked_pid == os.getpid():
+            return
+        self._spool_checked_pid = os.getpid()
+        inflight = os.listdir(self.inflight_dir) if os.path.isdir(self.inflight_dir) else []
+        if self.pending_count() or any(name.endswith('.json') for name in inflight):
+            logger.info("[MAIL_QUEUE] Found spooled messages at startup; starting delivery")
+            self.ensure_started()
+            self._wake.set()
+
+    def pending_count(self):
+        if not os.path.isdir(self.queue_dir):
+            return 0
+        return sum(1 for name in os.listdir(self.queue_dir) if name.endswith('.json'))
+
+    def flush(self, timeout=30.0):
+        """
+        Wait until every due message has been attempted (useful in tests and at shutdown).
+
+        Returns:
+            bool: True if the spool has no due messages left
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._due_messages():
+                return True
+            self._wake.set()
+            time.sleep(0.1)
+        return not self._due_messages()
+
+    def _recover_abandoned(self):
+        now = time.time()
+        for name in os.listdir(self.inflight_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.inflight_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.inflight_lease:
+                    message_id = name.split('.')[0]
+                    os.replace(path, os.path.join(self.queue_dir, f"{message_id}.json"))
+                    logger.warning(f"[MAIL_QUEUE] Recovered abandoned message {message_id}")
+            except OSError:
+                continue
+
+    def _due_messages(self):
+        if not os.path.isdir(self.queue_dir):
+            return []
+        due = []
+        now = time.time()
+        for name in sorted(os.listdir(self.queue_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.queue_dir, name)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("next_attempt", 0) <= now:
+                due.append(name[:-len('.json')])
+        return due
+
+    def _claim(self, message_id):
+        inflight_path = os.path.join(self.inflight_dir, f"{message_id}.{os.getpid()}.json")
+        try:
+            os.rename(os.path.join(self.queue_dir, f"{message_id}.json"), inflight_path)
+        except OSError:
+            return None  # Another worker got it first
+        os.utime(inflight_path)
+        return inflight_path
+
+    def _run(self):
+        # Claims by a worker that died after this thread started expire while it runs
+        recover_interval = max(self.inflight_lease / 4, 1.0)
+        last_recovery = time.monotonic()
+        while True:
+            self._wake.wait(timeout=min(self.idle_timeout, 5.0))
+            self._wake.clear()
+            try:
+                if time.monotonic() - last_recovery >= recover_interval:
+                    last_recovery = time.monotonic()
+                    self._recover_abandoned()
+                self._deliver_due()
+            except Exception as e:
+                logger.error(f"[MAIL_QUEUE] Delivery loop error: {str(e)}")
+            if self._connection is not None and time.monotonic() - self._connection_used_at > self.idle_timeout:
+                self._close_connection()
+
+    def _get_connection(self):
+        if self._connection is not None:
+            try:
+                # Make sure the server has not dropped an idle connection
+                if self._connection.noop()[0] == 250:
+                    return self._connection
+            except smtplib.SMTPException:
+                pass
+            self._close_connection()
+        self._connection = self.sender.open_connection()
+        logger.info(f"[MAIL_QUEUE] Opened SMTP connection to {self.sender.smtp_server}:{self.sender.smtp_port}")
+        return self._connection
+
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _deliver_due(self):
+        due = self._due_messages()
+        while due:
+            batch, due = due[:self.batch_size], due[self.batch_size:]
+            for message_id in batch:
+                inflight_path = self._claim(message_id)
+                if inflight_path:
+                    self._deliver(message_id, inflight_path)
+
+    def _deliver(self, message_id, inflight_path):
+        eml_path = os.path.join(self.queue_dir, f"{message_id}.eml")
+        with open(inflight_path) as f:
+            meta = json.load(f)
+        try:
+            with open(eml_path, 'rb') as f:
+                msg = message_from_bytes(f.read())
+            try:
+                self._get_connection().send_message(msg, to_addrs=meta["recipients"])
+            except smtplib.SMTPServerDisconnected:
+                # Connection went away between noop and send; one reconnect per message
+                self._close_connection()
+                self._get_connection().send_message(msg, to_addrs=meta["recipients"])
+            self._connection_used_at = time.monotonic()
+            os.remove(inflight_path)
+            os.remove(eml_path)
+            logger.info(f"[MAIL_QUEUE] Delivered message {message_id} to {', '.join(meta['recipients'])}")
+        except Exception as e:
+            self._close_connection()
+            meta["attempts"] += 1
+            meta["last_error"] = str(e)
+            if meta["attempts"] >= self.max_attempts:
+                self._write_atomic(os.path.join(self.failed_dir, f"{message_id}.json"), json.dumps(meta).encode())
+                if os.path.exists(eml_path):
+                    os.replace(eml_path, os.path.join(self.failed_dir, f"{message_id}.eml"))
+                os.remove(inflight_path)
+                logger.error(f"[MAIL_QUEUE] Giving up on message {message_id} after {meta['attempts']} attempts: {str(e)}")
+                return
+            delay = self.base_backoff * (2 ** (meta["attempts"] - 1))
+            meta["next_attempt"] = time.time() + delay
+            self._write_atomic(inflight_path, json.dumps(meta).encode())
+            os.replace(inflight_path, os.path.join(self.queue_dir, f"{message_id}.json"))
+            logger.warning(f"[MAIL_QUEUE] Message {message_id} attempt {meta['attempts']} failed, retrying in {delay:.0f}s: {str(e)}")
+
+
 # Create a singleton instance
 email_sender = EmailSender() 
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+HTTP caching policy.
+
+Three kinds of response:
+
+  static files      url_for("static", ...) adds ?v=<content hash>. A request carrying
+                    the current hash is cached for a year as immutable; a changed
+                    file gets a new URL, so it is never served stale. Requests
+                    without the hash (e.g. url() references inside CSS) revalidate
+                    with the ETag and Last-Modified that send_file sets.
+  read APIs         Views wrapped in @revalidated get an ETag from the body and a
+                    Last-Modified of when that body was first served, and answer
+                    If-None-Match / If-Modified-Since with 304 Not Modified.
+  everything else   Pages, uploads and POSTs are marked no-store unless the view
+                    set its own Cache-Control.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+STATIC_CACHE_SECONDS = int(os.getenv("STATIC_CACHE_SECONDS", str(365 * 24 * 3600)))
+FINGERPRINT_PARAM = "v"
+NO_STORE = "no-store, no-cache, must-revalidate, max-age=0"
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+# URL -> (etag, first served); least recently used URLs are dropped past the cap,
+# since query strings (search terms, ids) make the set of URLs unbounded
+LAST_MODIFIED_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_LAST_MODIFIED_ENTRIES", "2048"))
+_last_modified = OrderedDict()
+_last_modified_lock = threading.Lock()
+
+
+def static_fingerprint(static_folder, filename):
+    """
+    Short content hash of a static file, recomputed only when its size or mtime changes.
+
+    Returns:
+        str: 12 hex digits, or None if the file does not exist
+    """
+    path = os.path.join(static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:12]
+    with _fingerprints_lock:
+        _fingerprints[path] = (key, fingerprint)
+    return fingerprint
+
+
+def _add_static_fingerprint(endpoint, values):
+    if endpoint != "static" or "filename" not in values or FINGERPRINT_PARAM in values:
+        return
+    fingerprint = static_fingerprint(current_app.static_folder, values["filename"])
+    if fingerprint:
+        values[FINGERPRINT_PARAM] = fingerprint
+
+
+def revalidated(max_age=0):
+    """
+    Decorator for GET views whose JSON changes rarely.
+
+    The response gets a strong ETag (hash of the body) and a Last-Modified of
+    the first time this URL served that body in this process (remembered for
+    the most recently used URLs only; an evicted URL starts again from now); a
+    client that already has it gets 304. Clients may reuse it for max_age
+    seconds before revalidating.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if request.method not in ("GET", "HEAD") or response.status_code != 200:
+                return response
+            etag = hashlib.sha256(response.get_data()).hexdigest()[:32]
+            with _last_modified_lock:
+                seen_etag, modified_at = _last_modified.get(request.full_path, (None, None))
+                if seen_etag != etag:
+                    modified_at = datetime.now(timezone.utc).replace(microsecond=0)
+                    _last_modified[request.full_path] = (etag, modified_at)
+                _last_modified.move_to_end(request.full_path)
+                while len(_last_modified) > LAST_MODIFIED_MAX_ENTRIES:
+                    _last_modified.popitem(last=False)
+            response.set_etag(etag)
+            response.last_modified = modified_at
+            response.cache_control.private = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def apply_cache_policy(response):
+    """after_request hook: long-lived caching for fingerprinted static files, no-store by default."""
+    if request.endpoint == "static":
+        fingerprint = request.args.get(FINGERPRINT_PARAM)
+        if (
+            response.status_code in (200, 206, 304)
+            and fingerprint
+            and fingerprint == static_fingerprint(current_app.static_folder, request.view_args.get("filename", ""))
+        ):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_CACHE_SECONDS
+            response.cache_control.immutable = True
+        # Otherwise send_file's own no-cache + ETag/Last-Modified revalidation applies
+        return response
+    if "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = NO_STORE
+    return response
+
+
+def init_http_cache(app):
+    """Register the static URL fingerprinting and the response caching policy."""
+    app.url_default_functions.setdefault(None, []).append(_add_static_fingerprint)
+    app.after_request(apply_cache_policy)
@@ -0,0 +1,127 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+Text-like responses (HTML, JSON, JS, CSS, SVG) above a size threshold are
+compressed with brotli when the client accepts it and the Brotli package is
+installed, otherwise gzip. Bodies already in memory and below the streaming
+threshold are compressed in one go and keep a Content-Length. Larger bodies,
+files sent with send_file and streamed responses are compressed chunk by
+chunk as they are sent, so a big extraction payload never sits in memory
+twice. Images, PDFs and anything already carrying a Content-Encoding pass
+through untouched, as do ranges and 304s.
+
+Compressed responses get a weak ETag (the bytes differ per encoding but the
+content does not), and every compressible response gets Vary: Accept-Encoding.
+"""
+import logging
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip alone is used without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "true").lower() == "true"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_STREAM_BYTES = int(os.getenv("COMPRESS_STREAM_BYTES", str(256 * 1024)))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def _is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+
+
+def _negotiate():
+    """The encoding to use for this request, or None."""
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(offered)
+    return encoding if encoding in offered else None
+
+
+def _compressor(encoding):
+    """
+    Returns:
+        tuple: (compress(chunk) -> bytes, finish() -> bytes)
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    # wbits 31: zlib writes a gzip header and trailer
+    compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    """Compress a response iterable as it is consumed, closing it (e.g. send_file's file) at the end."""
+    compress, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress_response(response):
+    """after_request hook: compress the body if the client and the content type allow it."""
+    if not COMPRESS_ENABLED or not _is_compressible(response.mimetype):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or "Content-Range" in response.headers
+    ):
+        return response
+    length = response.content_length
+    if length is not None and length < COMPRESS_MIN_BYTES:
+        return response
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+
+    streamed = response.direct_passthrough or response.is_streamed or length is None or length > COMPRESS_STREAM_BYTES
+    if streamed:
+        # The body is only read as it is sent; the compressed length is not known up front
+        response.response = _compress_stream(response.response, encoding)
+        response.direct_passthrough = False
+        response.headers.pop("Content-Length", None)
+    else:
+        compress, finish = _compressor(encoding)
+        body = response.get_data()
+        response.set_data(compress(body) + finish())
+    response.headers["Content-Encoding"] = encoding
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Register response compression. Register it before other after_request hooks so it runs last."""
+    app.after_request(compress_response)
+    logger.info(
+        f"[COMPRESS] {'br+gzip' if brotli is not None else 'gzip'} for text responses over {COMPRESS_MIN_BYTES} bytes"
+        if COMPRESS_ENABLED else "[COMPRESS] Response compression disabled"
+    )
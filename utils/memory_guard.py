@@ -0,0 +1,137 @@
+"""
+Extraction-aware memory accounting for web workers.
+
+PyMuPDF and pdfplumber do not always hand freed memory back to the OS, so a
+long-lived worker creeps upward in RSS after large POs. MemoryGuard samples
+RSS around every extraction, keeps per-process figures for the status
+endpoint, and once a ceiling is crossed asks the worker to exit after the
+current response. Gunicorn treats SIGTERM to a worker as a graceful shutdown:
+in-flight requests finish and the master forks a fresh replacement.
+"""
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process.
+
+    Returns:
+        int: RSS in bytes, or None where it cannot be read
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Not /proc: only the peak is available (bytes on macOS, KB elsewhere)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryGuard:
+    """
+    Per-process RSS metrics around extractions, with a recycle ceiling.
+
+    Deltas are process-wide, so with threaded workers they include whatever
+    other requests allocated at the same time; the ceiling check does not
+    depend on them.
+    """
+
+    def __init__(self, ceiling_mb=0):
+        """
+        Args:
+            ceiling_mb (float): RSS after an extraction above which the worker is
+                                recycled; 0 disables recycling
+        """
+        self.ceiling_bytes = int(ceiling_mb * _MB)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start fresh figures, e.g. in a newly forked worker."""
+        with self._lock:
+            self.pid = os.getpid()
+            self.started_at = time.time()
+            self.extractions = 0
+            self.last_delta_bytes = 0
+            self.max_delta_bytes = 0
+            self.total_growth_bytes = 0
+            self.peak_rss_bytes = current_rss_bytes() or 0
+            self.recycle_pending = False
+            self._recycle_sent = False
+
+    @contextmanager
+    def track(self, label=""):
+        """
+        Sample RSS before and after the wrapped extraction.
+
+        Args:
+            label (str): Shown in the log line (usually the file name)
+        """
+        before = current_rss_bytes()
+        try:
+            yield
+        finally:
+            after = current_rss_bytes()
+            if before is not None and after is not None:
+                self._record(label, before, after)
+
+    def _record(self, label, before, after):
+        delta = after - before
+        with self._lock:
+            self.extractions += 1
+            self.last_delta_bytes = delta
+            self.max_delta_bytes = max(self.max_delta_bytes, delta)
+            self.total_growth_bytes += max(delta, 0)
+            self.peak_rss_bytes = max(self.peak_rss_bytes, after)
+            over = self.ceiling_bytes and after > self.ceiling_bytes
+            if over and not self.recycle_pending:
+                self.recycle_pending = True
+                logger.warning(
+                    f"[MEMORY] Worker {self.pid} at {after / _MB:.1f} MB after '{label}', over the "
+                    f"{self.ceiling_bytes / _MB:.0f} MB ceiling; recycling after this request"
+                )
+        logger.info(f"[MEMORY] '{label}': {before / _MB:.1f} -> {after / _MB:.1f} MB ({delta / _MB:+.1f} MB)")
+
+    def recycle(self):
+        """Ask this worker to shut down gracefully (at most once)."""
+        with self._lock:
+            if self._recycle_sent:
+                return
+            self._recycle_sent = True
+        logger.warning(f"[MEMORY] Sending SIGTERM to worker {self.pid} for recycling")
+        os.kill(self.pid, signal.SIGTERM)
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Current RSS and extraction memory figures in MB for this process
+        """
+        rss = current_rss_bytes()
+        with self._lock:
+            return {
+                "pid": self.pid,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "rss_mb": round(rss / _MB, 1) if rss is not None else None,
+                "peak_rss_mb": round(self.peak_rss_bytes / _MB, 1),
+                "ceiling_mb": round(self.ceiling_bytes / _MB, 1) if self.ceiling_bytes else None,
+                "extractions": self.extractions,
+                "last_delta_mb": round(self.last_delta_bytes / _MB, 1),
+                "max_delta_mb": round(self.max_delta_bytes / _MB, 1),
+                "total_growth_mb": round(self.total_growth_bytes / _MB, 1),
+                "recycle_pending": self.recycle_pending,
+            }
@@ -1,18 +1,42 @@
 import re
 import logging
 import os
-import pdfplumber
-import PyPDF2
-import fitz  # PyMuPDF
+import importlib
 import traceback
 from typing import Dict, Any, List, Tuple, Optional
 from datetime import datetime
-from difflib import SequenceMatcher
 from enum import Enum
 from dataclasses import dataclass
 
+from utils.builder_registry import builder_registry
+from utils.tracing import traced
+
 logger = logging.getLogger(__name__)
 
+# PDF backends (PyMuPDF, pdfplumber with pdfminer, PyPDF2) add a few hundred
+# milliseconds to every import of the app, so they are imported on first use
+PDF_BACKENDS = ("fitz", "pdfplumber", "PyPDF2")
+
+
+def load_pdf_backend(name):
+    """
+    Import a PDF backend module the first time it is needed.
+
+    Args:
+        name (str): One of PDF_BACKENDS
+
+    Returns:
+        module: The imported backend
+    """
+    # sys.modules makes every call after the first a dict lookup
+    return importlib.import_module(name)
+
+
+def preload_pdf_backends():
+    """Import every PDF backend now, e.g. in a pre-fork server master so workers start warm."""
+    for name in PDF_BACKENDS:
+        load_pdf_backend(name)
+
 
 # Template configurations for different companies
 TEMPLATE_CONFIGS = {
@@ -410,7 +434,7 @@ class PDFExtractor:
         """Extract text using PyMuPDF (fitz)."""
         text = ""
         try:
-            with fitz.open(pdf_path) as doc:
+            with load_pdf_backend("fitz").open(pdf_path) as doc:
                 for page in doc:
                     text += page.get_text()
         except Exception as e:
@@ -421,7 +445,7 @@ class PDFExtractor:
         """Extract text using pdfplumber."""
         text = ""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
+            with load_pdf_backend("pdfplumber").open(pdf_path) as pdf:
                 for page in pdf.pages:
                     text += page.extract_text() + "\n"
         except Exception as e:
@@ -433,7 +457,7 @@ class PDFExtractor:
         text = ""
         try:
             with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
+                reader = load_pdf_backend("PyPDF2").PdfReader(file)
                 for page in reader.pages:
                     text += page.extract_text() + "\n"
         except Exception as e:
@@ -511,20 +535,22 @@ class PDFExtractor:
         return extract_data_from_pdf(pdf_path)
 
 
-def detect_template(text: str, builder_name: str = "") -> Dict[str, Any]:
+@traced("pdf.template")
+def detect_template(text: str, builder_name: str = "", builder_id: str = "") -> Dict[str, Any]:
     """
     Detect which builder template the PDF belongs to based on content patterns and builder name.
     
     Args:
         text: The extracted text from the PDF
         builder_name: The builder name from the RFMS database (optional)
+        builder_id: The builder's RFMS customer ID (optional)
         
     Returns:
         dict: Template information including name and confidence score
     """
     # First, try to match based on the builder name if provided
-    if builder_name:
-        template_name = match_builder_to_template(builder_name)
+    if builder_name or builder_id:
+        template_name = match_builder_to_template(builder_name, builder_id)
         if template_name and template_name in TEMPLATE_CONFIGS:
             logger.info(f"Template detected from builder name: {template_name}")
             return TEMPLATE_CONFIGS[template_name]
@@ -869,24 +895,15 @@ def detect_template(text: str, builder_name: str = "") -> Dict[str, Any]:
     return builder_patterns["generic"]
 
 
-def extract_data_from_pdf(pdf_path: str, builder_name: str = "") -> Dict[str, Any]:
-    """
-    Extract relevant data from PDF purchase orders.
-
-    This function tries multiple PDF parsing libraries to maximize extraction success.
-    It looks for patterns like customer information, PO numbers, scope of work and dollar values.
+# Result keys that describe the extraction rather than the document
+NON_FIELD_KEYS = (
+    "raw_text", "page_stats", "field_sources", "field_confidence", "low_confidence_fields", "template",
+)
 
-    Args:
-        pdf_path (str): Path to the PDF file
-        builder_name (str): The builder name from the RFMS database
-
-    Returns:
-        dict: Extracted data including customer details, PO information, and more
-    """
-    logger.info(f"Extracting data from PDF: {pdf_path}")
 
-    # Initialize extracted data dictionary with all required fields
-    extracted_data = {
+def new_extraction_result() -> Dict[str, Any]:
+    """Empty extraction result with every field the UI and export expect."""
+    return {
         # Customer Information
         "customer_name": "",
         "business_name": "",
@@ -937,52 +954,213 @@ def extract_data_from_pdf(pdf_path: str, builder_name: str = "") -> Dict[str, An
         "ship_to_address": "",
     }
 
+
+def merge_missing_fields(extracted_data, candidate, source, field_sources, fields=None):
+    """
+    Merge a fallback backend's result into the result so far.
+
+    With fields=None every empty field is filled. Otherwise only the listed
+    (low-confidence) fields are touched: filled when empty, replaced when the
+    fallback scored them above MIN_FIELD_CONFIDENCE and higher than before. A
+    value PyMuPDF read with confidence, such as a dollar value of 0 from a
+    total line, is never overwritten.
+
+    Args:
+        extracted_data (dict): Result so far; updated in place
+        candidate (dict): Result parsed from the fallback backend's text
+        source (str): Backend name recorded as the provenance of merged fields
+        field_sources (dict): field -> backend map; updated in place
+        fields (iterable): Fields the fallback may change, or None for any empty field
+
+    Returns:
+        list: Names of the fields that were filled or replaced
+    """
+    confidence = extracted_data.setdefault("field_confidence", {})
+    candidate_confidence = candidate.get("field_confidence", {})
+    filled = []
+    for field, value in candidate.items():
+        if field in NON_FIELD_KEYS:
+            continue
+        if fields is None:
+            if field in extracted_data and (extracted_data[field] or not value):
+                continue
+        elif field not in fields or not value:
+            continue
+        elif extracted_data.get(field) or confidence.get(field, 0.0) > 0:
+            # Replacing a value needs a fallback reading that is both confident and better
+            score = candidate_confidence.get(field, 0.0)
+            if score < MIN_FIELD_CONFIDENCE or score <= confidence.get(field, 0.0):
+                continue
+        # Also copies keys the parser only sets on some paths, even when empty
+        extracted_data[field] = value
+        if not value:
+            continue
+        field_sources[field] = source
+        if field in candidate_confidence:
+            confidence[field] = candidate_confidence[field]
+        filled.append(field)
+    return filled
+
+
+def parse_document_text(text, extracted_data, builder_name="", builder_id="", on_po_number=None, template=None):
+    """
+    Detect the builder and template for a document's text and parse it into extracted_data.
+
+    template skips detection when the caller already ran detect_template() on this text.
+
+    Returns:
+        dict: The template used
+    """
+    extracted_data["raw_text"] = text
+
+    # Detect builder from PDF content
+    detected_builder = detect_builder_from_pdf(text)
+    if detected_builder and builder_name:
+        # Normalize builder names for comparison
+        detected_normalized = detected_builder.lower().replace(' ', '')
+        provided_normalized = builder_name.lower().replace(' ', '')
+
+        if detected_normalized not in provided_normalized and provided_normalized not in detected_normalized:
+            logger.warning(f"[BUILDER_MISMATCH] PDF appears to be from '{detected_builder}' but selected builder is '{builder_name}'")
+            extracted_data["builder_mismatch_warning"] = f"PDF appears to be from '{detected_builder}' but selected builder is '{builder_name}'. Please verify the correct builder is selected."
+            extracted_data["detected_builder"] = detected_builder
+
+    if template is None:
+        template = detect_template(text, builder_name, builder_id)
+
+    # Add specific logging for Ambrose
+    if template and "ambrose" in template.get("name", "").lower():
+        logger.info("[AMBROSE] Running Ambrose Construct Group specific extraction logic")
+        logger.info(f"[AMBROSE] Template patterns - PO: {len(template.get('po_patterns', []))}, Customer: {len(template.get('customer_patterns', []))}, Description: {len(template.get('description_patterns', []))}")
+
+    parse_extracted_text(text, extracted_data, template, on_po_number)
+    extracted_data["template"] = template.get("name", "")
+    return template
+
+
+def extract_data_from_text(text: str, builder_name: str = "", builder_id: str = "") -> Dict[str, Any]:
+    """
+    Extract data from text already read out of a PDF, e.g. the raw_text stored with an upload.
+
+    Runs the same detection, parsing and cleaning as the PyMuPDF path of
+    extract_data_from_pdf, without opening the PDF or trying fallback backends.
+
+    Args:
+        text (str): Document text
+        builder_name (str): The builder name from the RFMS database
+        builder_id (str): The builder's RFMS customer ID, matched before the name
+
+    Returns:
+        dict: Extracted data
+    """
+    extracted_data = new_extraction_result()
+    parse_document_text(text, extracted_data, builder_name, builder_id)
+    clean_extracted_data(extracted_data)
+    extracted_data["low_confidence_fields"] = low_confidence_fields(
+        extracted_data, fields=list(extracted_data.get("field_confidence", {})) or ESSENTIAL_FIELDS
+    )
+    return extracted_data
+
+
+def extract_data_from_pdf(pdf_path: str, builder_name: str = "", on_po_number=None,
+                          builder_id: str = "", scan: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Extract relevant data from PDF purchase orders.
+
+    This function tries multiple PDF parsing libraries to maximize extraction success.
+    It looks for patterns like customer information, PO numbers, scope of work and dollar values.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        builder_name (str): The builder name from the RFMS database
+        on_po_number (callable): Optional callback invoked with the PO number as soon as
+                                 it is parsed, before the rest of the document is processed
+        builder_id (str): The builder's RFMS customer ID, matched before the name
+        scan (dict): Optional {"text", "page_stats", "template"} from an earlier PyMuPDF
+                     read of this file (see po_splitter.plan_po_segments), used instead
+                     of reading it again
+
+    Returns:
+        dict: Extracted data including customer details, PO information, and more
+    """
+    logger.info(f"Extracting data from PDF: {pdf_path}")
+
+    # Initialize extracted data dictionary with all required fields
+    extracted_data = new_extraction_result()
+    # Which backend produced each populated field
+    field_sources = {}
+
     # Try different extraction methods in order of reliability
     try:
         # Try PyMuPDF (fitz) first - generally fastest and most reliable
-        text = extract_with_pymupdf(pdf_path)
-        if text:
+        if scan is not None:
+            text, page_stats = scan["text"], list(scan["page_stats"])
+        else:
+            page_stats = []
+            text = extract_with_pymupdf(pdf_path, page_stats)
+        if page_stats:
+            extracted_data["page_stats"] = summarize_page_stats(page_stats)
+
+        # Scanned POs have no text layer: the other backends read the same
+        # text layer, so running them would only cost time
+        if page_stats and all(p["kind"] in ("image_only", "empty") for p in page_stats):
+            stats = extracted_data["page_stats"]
+            logger.warning(
+                f"[SCANNED] No text layer in {pdf_path}: {stats['image_only_pages']} image-only, "
+                f"{stats['empty_pages']} empty of {stats['pages']} pages; skipping fallback backends"
+            )
             extracted_data["raw_text"] = text
-            
-            # Detect builder from PDF content
-            detected_builder = detect_builder_from_pdf(text)
-            if detected_builder and builder_name:
-                # Normalize builder names for comparison
-                detected_normalized = detected_builder.lower().replace(' ', '')
-                provided_normalized = builder_name.lower().replace(' ', '')
-                
-                if detected_normalized not in provided_normalized and provided_normalized not in detected_normalized:
-                    logger.warning(f"[BUILDER_MISMATCH] PDF appears to be from '{detected_builder}' but selected builder is '{builder_name}'")
-                    extracted_data["builder_mismatch_warning"] = f"PDF appears to be from '{detected_builder}' but selected builder is '{builder_name}'. Please verify the correct builder is selected."
-                    extracted_data["detected_builder"] = detected_builder
-            
-            template = detect_template(text, builder_name)
-            
-            # Add specific logging for Ambrose
-            if template and "ambrose" in template.get("name", "").lower():
-                logger.info("[AMBROSE] Running Ambrose Construct Group specific extraction logic")
-                logger.info(f"[AMBROSE] Template patterns - PO: {len(template.get('po_patterns', []))}, Customer: {len(template.get('customer_patterns', []))}, Description: {len(template.get('description_patterns', []))}")
-            
-            parse_extracted_text(text, extracted_data, template)
+            extracted_data["needs_ocr"] = True
+            extracted_data["extraction_warning"] = (
+                "This PDF appears to be a scanned image with no readable text. "
+                "Please enter the details manually."
+            )
+            clean_extracted_data(extracted_data)
+            return extracted_data
 
-        # If we didn't get all needed data, try pdfplumber
-        if not check_essential_fields(extracted_data):
-            text = extract_with_pdfplumber(pdf_path)
-            if text and text != extracted_data["raw_text"]:
-                extracted_data["raw_text"] = text
-                template = detect_template(text, builder_name)
-                parse_extracted_text(text, extracted_data, template)
+        if text:
+            parse_document_text(
+                text, extracted_data, builder_name, builder_id, on_po_number,
+                template=scan["template"] if scan is not None else None,
+            )
+            field_sources.update(
+                (field, "pymupdf") for field, value in extracted_data.items() if value and field not in NON_FIELD_KEYS
+            )
 
-        # Last resort, try PyPDF2
-        if not check_essential_fields(extracted_data):
-            text = extract_with_pypdf2(pdf_path)
-            if text and text != extracted_data["raw_text"]:
+        # If an essential field is missing or doubtful, try pdfplumber, then PyPDF2 as a
+        # last resort. Each fallback is parsed into a scratch result; it replaces
+        # low-confidence essential fields where it scores them higher, and fills any
+        # other field still empty (everything, if PyMuPDF read no text at all).
+        for backend_name, backend in (("pdfplumber", extract_with_pdfplumber), ("pypdf2", extract_with_pypdf2)):
+            missing = low_confidence_fields(extracted_data)
+            if not missing:
+                break
+            text = backend(pdf_path)
+            if not text or text == extracted_data["raw_text"]:
+                continue
+            candidate = new_extraction_result()
+            candidate["raw_text"] = text
+            template = detect_template(text, builder_name, builder_id)
+            parse_extracted_text(
+                text, candidate, template, on_po_number if "po_number" in missing else None
+            )
+            fields = None
+            if extracted_data["raw_text"]:
+                fields = set(missing) | {
+                    field for field in candidate if field not in NON_FIELD_KEYS and not extracted_data.get(field)
+                }
+            filled = merge_missing_fields(extracted_data, candidate, backend_name, field_sources, fields=fields)
+            logger.info(f"[FALLBACK] {backend_name} filled {filled} (low confidence before: {missing})")
+            if not extracted_data["raw_text"]:
                 extracted_data["raw_text"] = text
-                template = detect_template(text, builder_name)
-                parse_extracted_text(text, extracted_data, template)
+                extracted_data["template"] = template.get("name", "")
 
         # Clean and format the extracted data
         clean_extracted_data(extracted_data)
+        extracted_data["field_sources"] = field_sources
+        extracted_data["low_confidence_fields"] = low_confidence_fields(
+            extracted_data, fields=list(extracted_data.get("field_confidence", {})) or ESSENTIAL_FIELDS
+        )
 
         logger.info(f"Successfully extracted data from PDF: {pdf_path}")
         return extracted_data
@@ -995,6 +1173,7 @@ def extract_data_from_pdf(pdf_path: str, builder_name: str = "") -> Dict[str, An
         return extracted_data
 
 
+@traced("pdf.clean")
 def clean_extracted_data(extracted_data):
     """Clean and format the extracted data."""
     # Split name into first and last name if not already done
@@ -1085,27 +1264,17 @@ def clean_extracted_data(extracted_data):
             "999869951",  # Other company number
         ]
 
-        # Create cleaned versions of excluded numbers (digits only)
-        clean_exclude_numbers = []
-        for number in exclude_numbers:
-            if number and isinstance(number, str):
-                clean_exclude_numbers.append("".join(c for c in number if c.isdigit()))
+        # Compare digits only; the main numbers are normalized once, not per phone
+        clean_exclude_numbers = {_digits(number) for number in exclude_numbers if number and isinstance(number, str)}
+        clean_exclude_numbers.update(
+            _digits(extracted_data.get(key)) for key in ("phone", "mobile", "home_phone", "work_phone")
+        )
 
         # Filter the extra_phones list
-        filtered_phones = []
-        for phone in extracted_data["extra_phones"]:
-            if isinstance(phone, str):
-                # Clean the phone
-                clean_phone = "".join(c for c in phone if c.isdigit())
-
-                # Skip if in excluded list or already in customer's main numbers
-                if clean_phone not in clean_exclude_numbers and clean_phone not in [
-                    "".join(c for c in str(extracted_data.get("phone", "") or "") if c.isdigit()),
-                    "".join(c for c in str(extracted_data.get("mobile", "") or "") if c.isdigit()),
-                    "".join(c for c in str(extracted_data.get("home_phone", "") or "") if c.isdigit()),
-                    "".join(c for c in str(extracted_data.get("work_phone", "") or "") if c.isdigit()),
-                ]:
-                    filtered_phones.append(phone)
+        filtered_phones = [
+            phone for phone in extracted_data["extra_phones"]
+            if isinstance(phone, str) and _digits(phone) not in clean_exclude_numbers
+        ]
 
         extracted_data["extra_phones"] = filtered_phones
 
@@ -1132,7 +1301,7 @@ def clean_extracted_data(extracted_data):
             
             for phone_type, phone_value in main_phones:
                 if phone_value and phone_value.strip():
-                    clean_phone = re.sub(r'[^\d]', '', phone_value)
+                    clean_phone = _digits(phone_value)
                     if len(clean_phone) >= 8 and clean_phone not in alt_contact_phones:
                         alt_contact_phones.append(clean_phone)
                         logger.info(f"[PHONE_MAPPING] Found {phone_type} from main contact: {clean_phone}")
@@ -1145,15 +1314,21 @@ def clean_extracted_data(extracted_data):
                     contact_name = contact.get("name", "")
                     
                     if contact_phone:
-                        clean_phone = re.sub(r'[^\d]', '', contact_phone)
+                        clean_phone = _digits(contact_phone)
                         if len(clean_phone) >= 8 and clean_phone not in alt_contact_phones:
                             alt_contact_phones.append(clean_phone)
                             logger.info(f"[PHONE_MAPPING] Found phone from {contact_name}: {clean_phone}")
                     if contact_phone2:
-                        clean_phone2 = re.sub(r'[^\d]', '', contact_phone2)
+                        clean_phone2 = _digits(contact_phone2)
                         if len(clean_phone2) >= 8 and clean_phone2 not in alt_contact_phones:
                             alt_contact_phones.append(clean_phone2)
                             logger.info(f"[PHONE_MAPPING] Found phone2 from {contact_name}: {clean_phone2}")
+
+            # Then the remaining extra phones (e.g. the owner's own numbers from a contact entry)
+            for phone in filtered_phones:
+                clean_phone = _digits(phone)
+                if len(clean_phone) >= 8 and clean_phone not in alt_contact_phones:
+                    alt_contact_phones.append(clean_phone)
         
         # Use alternate contact phones if available, otherwise use filtered_phones
         phones_for_mapping = alt_contact_phones if alt_contact_phones else filtered_phones
@@ -1191,29 +1366,308 @@ def clean_extracted_data(extracted_data):
     extracted_data["alternate_contacts"] = cleaned_contacts
 
 
-def check_essential_fields(data):
-    """Check if essential fields are filled."""
-    essential_fields = ["po_number", "customer_name", "dollar_value"]
-    return all(data[field] for field in essential_fields)
+ESSENTIAL_FIELDS = ("po_number", "customer_name", "dollar_value")
+
+
+# field_sources values of fields filled by the fallback backends rather than PyMuPDF
+FALLBACK_SOURCES = ("pdfplumber", "pypdf2")
+
+# Fields scored below this are re-read by the fallback backends and flagged in the UI
+MIN_FIELD_CONFIDENCE = float(os.getenv("PDF_MIN_FIELD_CONFIDENCE", "0.6"))
+
+# PO labels every builder uses; tried when the template's own PO patterns miss
+GENERIC_PO_PATTERNS = [
+    r"P\.O\.\s*No:?\s*([A-Za-z0-9-]+)",
+    r"PO[:\s#]+([A-Za-z0-9-]+)",
+    r"Purchase\s+Order[:\s#]+([A-Za-z0-9-]+)",
+    r"Order\s+Number[:\s#]+([A-Za-z0-9-]+)",
+    r"CONTRACT\s+NO[.:]?\s*([A-Za-z0-9-]+)",
+    r"Contract\s+Number[.:]?\s*([A-Za-z0-9-]+)",
+]
+
+_EMAIL_SHAPE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+_AU_STATES = {"QLD", "NSW", "VIC", "SA", "WA", "TAS", "NT", "ACT"}
+# Words that mark a company or a form label rather than the insured person
+_NON_PERSON_WORDS = {
+    "pty", "ltd", "insurance", "construct", "construction", "group", "builders", "building",
+    "unit", "contact", "customer", "name", "details", "site", "client", "owner",
+}
+
+
+def _matching_pattern_index(patterns, text, value, normalize):
+    """
+    Index of the first pattern with a match that yields value, or None.
+
+    Every match is tried, not just the first, because builder-specific code
+    may have picked a later occurrence.
+    """
+    target = normalize(value)
+    for index, pattern in enumerate(patterns):
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            captured = match.group(1) if match.groups() else match.group(0)
+            try:
+                if normalize(captured) == target:
+                    return index
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def _normalize_text(value):
+    return " ".join(str(value).split()).lower()
+
+
+def _normalize_amount(value):
+    return round(float(str(value).replace(",", "")), 2)
+
+
+def _score_po_number(value, text, template, entities):
+    is_builder_template = template.get("name") != "Generic Template"
+    rank = _matching_pattern_index(template.get("po_patterns", []), text, value, _normalize_text)
+    if rank is not None:
+        # A builder pattern encodes that builder's PO shape (e.g. 20XXXXXX-XX)
+        score = max((0.95 if is_builder_template else 0.75) - 0.05 * rank, 0.6)
+    elif _matching_pattern_index(GENERIC_PO_PATTERNS, text, value, _normalize_text) is not None:
+        score = 0.6
+    elif any(e.kind == "po" and e.raw.strip() == value for e in entities):
+        score = 0.5
+    else:
+        score = 0.6 if value.lower() in text.lower() else 0.4
+    if not re.search(r"\d", value) or len(value) < 3:
+        score = min(score, 0.2)
+    # Headers and footers repeat the PO number
+    if text.count(value) >= 2:
+        score += 0.05
+    return score
+
+
+def _score_customer_name(value, text, template, extracted_data):
+    rank = _matching_pattern_index(template.get("customer_patterns", []), text, value, _normalize_text)
+    if rank is not None:
+        score = max(0.85 - 0.05 * rank, 0.6)
+    elif _normalize_text(value) in _normalize_text(text):
+        score = 0.7  # Found by builder-specific section parsing
+    else:
+        score = 0.5
+    words = value.split()
+    if len(words) < 2:
+        score -= 0.3
+    if re.search(r"\d", value):
+        score -= 0.3
+    if any(word.lower().strip(".,") in _NON_PERSON_WORDS for word in words):
+        score -= 0.2
+    # A sentence captured by a loose pattern, not a name
+    if len(words) > 5 or (len(words) > 3 and sum(1 for word in words if word[:1].islower()) * 2 > len(words)):
+        score -= 0.4
+    # Agreement with the contact block or the customer's email address
+    surname = words[-1].lower() if words else ""
+    contact_names = {_normalize_text(c.get("name", "")) for c in extracted_data.get("alternate_contacts", [])}
+    if _normalize_text(value) in contact_names or (
+        len(surname) > 2 and surname in extracted_data.get("email", "").lower().split("@")[0]
+    ):
+        score += 0.1
+    return score
+
+
+def _score_dollar_value(value, text, template, entities):
+    patterns = template.get("dollar_patterns", [])
+    total_amounts = [e.amount for e in entities if e.kind == "money" and "total" in e.label and e.amount is not None]
+    # The best-labelled pattern that reads this amount, not just the first in the list
+    pattern_scores = []
+    for rank, pattern in enumerate(patterns):
+        if _matching_pattern_index([pattern], text, value, _normalize_amount) is None:
+            continue
+        pattern = pattern.lower()
+        if "total" in pattern:
+            pattern_scores.append(max(0.9 - 0.03 * rank, 0.75))
+        elif pattern.lstrip("\\").startswith("$"):
+            pattern_scores.append(0.5)  # Any dollar amount on the page
+        else:
+            pattern_scores.append(0.65)
+    if pattern_scores:
+        score = max(pattern_scores)
+    elif value and value in total_amounts:
+        score = 0.7
+    elif value:
+        score = 0.55
+    else:
+        return 0.0
+    if value and total_amounts and value == max(total_amounts):
+        score += 0.05
+    if value > 1_000_000:
+        score -= 0.3
+    return score
+
+
+def _score_format(field, value):
+    """Confidence for a non-essential field from its shape alone."""
+    if field == "email":
+        return 0.9 if _EMAIL_SHAPE.match(value) else 0.3
+    if field in ("phone", "mobile", "work_phone", "home_phone", "supervisor_mobile"):
+        digits = _digits(value)
+        if digits.startswith("61"):
+            digits = "0" + digits[2:]
+        if len(digits) not in (8, 10):
+            return 0.3
+        if field in ("mobile", "supervisor_mobile") and not digits.startswith("04"):
+            return 0.5
+        return 0.85
+    if field == "zip_code":
+        return 0.9 if re.fullmatch(r"\d{4}", value.strip()) else 0.3
+    if field == "state":
+        return 0.9 if value.strip().upper() in _AU_STATES else 0.4
+    return 0.7
+
+
+def score_field_confidence(text, extracted_data, template, entities):
+    """
+    Confidence (0-1) for each populated field of a parse result.
+
+    Essential fields are scored on which pattern produced the value (template
+    pattern rank, generic fallback or loose entity), on whether the value has
+    the expected shape, and on agreement with other signals in the document
+    (repeats, contact block, labelled totals). A dollar value of 0 read from a
+    total line scores high, so it no longer sends the PDF to the fallbacks.
+
+    Args:
+        text (str): The text the fields were parsed from
+        extracted_data (dict): Parse result
+        template (dict): The template used for parsing
+        entities (list): NumericEntity list for text
+
+    Returns:
+        dict: field -> score rounded to 2 places
+    """
+    scores = {
+        "po_number": _score_po_number(extracted_data["po_number"], text, template, entities)
+        if extracted_data["po_number"] else 0.0,
+        "customer_name": _score_customer_name(extracted_data["customer_name"], text, template, extracted_data)
+        if extracted_data["customer_name"] else 0.0,
+        "dollar_value": _score_dollar_value(extracted_data["dollar_value"] or 0, text, template, entities),
+    }
+    for field, value in extracted_data.items():
+        if field in scores or field in NON_FIELD_KEYS or not isinstance(value, str) or not value.strip():
+            continue
+        if field in ("country", "customer_type"):
+            continue  # Defaults, not read from the document
+        scores[field] = _score_format(field, value)
+    return {field: round(min(max(score, 0.0), 1.0), 2) for field, score in scores.items()}
+
+
+def low_confidence_fields(extracted_data, fields=ESSENTIAL_FIELDS):
+    """Fields whose confidence is below MIN_FIELD_CONFIDENCE (missing scores count as 0)."""
+    confidence = extracted_data.get("field_confidence", {})
+    return [field for field in fields if confidence.get(field, 0.0) < MIN_FIELD_CONFIDENCE]
+
+
+# Page classification thresholds for scanned-document detection
+MIN_TEXT_CHARS_PER_PAGE = int(os.getenv("PDF_MIN_TEXT_CHARS_PER_PAGE", "25"))
+MIN_IMAGE_COVERAGE = float(os.getenv("PDF_MIN_IMAGE_COVERAGE", "0.3"))
+
+
+def classify_page(page, page_text):
+    """
+    Classify a PyMuPDF page as text, undecoded_text, image_only or empty from cheap metadata.
+
+    Uses the already extracted text, the page's font resources and its image
+    placement boxes (get_image_info does not decode the images). A page that
+    uses fonts but yielded no text has a text layer PyMuPDF could not decode,
+    which pdfplumber or PyPDF2 may still read.
 
+    Args:
+        page: fitz.Page
+        page_text (str): Text already extracted from the page
 
-def extract_with_pymupdf(file_path):
-    """Extract text from PDF using PyMuPDF."""
+    Returns:
+        dict: {page, kind, chars, images, image_coverage}
+    """
+    chars = len(page_text.strip())
+    page_rect = page.rect
+    page_area = max(page_rect.width * page_rect.height, 1.0)
+    image_area = 0.0
+    images = 0
     try:
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
+        for info in page.get_image_info():
+            bbox = type(page_rect)(info["bbox"]) & page_rect
+            if not bbox.is_empty:
+                image_area += bbox.width * bbox.height
+                images += 1
+    except Exception as e:
+        logger.debug(f"[PAGE_STATS] Could not read image info for page {page.number + 1}: {str(e)}")
+    coverage = min(image_area / page_area, 1.0)
+
+    try:
+        has_fonts = bool(page.get_fonts())
+    except Exception:
+        has_fonts = True  # Unknown: do not rule out the fallback backends
+
+    if chars >= MIN_TEXT_CHARS_PER_PAGE:
+        kind = "text"
+    elif has_fonts:
+        kind = "undecoded_text"
+    elif images and coverage >= MIN_IMAGE_COVERAGE:
+        kind = "image_only"
+    else:
+        kind = "empty"
+    return {
+        "page": page.number + 1,
+        "kind": kind,
+        "chars": chars,
+        "images": images,
+        "image_coverage": round(coverage, 3),
+    }
+
+
+def summarize_page_stats(page_stats):
+    """Roll per-page classifications up into document-level counts."""
+    return {
+        "pages": len(page_stats),
+        "text_pages": sum(1 for p in page_stats if p["kind"] == "text"),
+        "undecoded_text_pages": sum(1 for p in page_stats if p["kind"] == "undecoded_text"),
+        "image_only_pages": sum(1 for p in page_stats if p["kind"] == "image_only"),
+        "empty_pages": sum(1 for p in page_stats if p["kind"] == "empty"),
+        "chars": sum(p["chars"] for p in page_stats),
+        "per_page": page_stats,
+    }
+
+
+@traced("pdf.pymupdf")
+def extract_with_pymupdf(file_path, page_stats=None, page_texts=None):
+    """
+    Extract text from PDF using PyMuPDF.
+
+    Args:
+        file_path (str): Path to the PDF
+        page_stats (list): Optional list that receives a classify_page() entry per page
+        page_texts (list): Optional list that receives each page's text
+    """
+    fitz = None
+    try:
+        fitz = load_pdf_backend("fitz")
+        with fitz.open(file_path) as doc:
+            text = ""
+            for page in doc:
+                page_text = page.get_text()
+                if page_stats is not None:
+                    page_stats.append(classify_page(page, page_text))
+                if page_texts is not None:
+                    page_texts.append(page_text)
+                text += page_text
         return text
     except Exception as e:
         logger.error(f"PyMuPDF extraction error: {str(e)}")
         return ""
+    finally:
+        # Empty MuPDF's global font/image store so large POs don't pin memory
+        if fitz is not None:
+            fitz.TOOLS.store_shrink(100)
 
 
+@traced("pdf.pdfplumber")
 def extract_with_pdfplumber(file_path):
     """Extract text from PDF using pdfplumber."""
     try:
-        with pdfplumber.open(file_path) as pdf:
+        with load_pdf_backend("pdfplumber").open(file_path) as pdf:
             text = ""
             for page in pdf.pages:
                 text += page.extract_text() or ""
@@ -1223,11 +1677,12 @@ def extract_with_pdfplumber(file_path):
         return ""
 
 
+@traced("pdf.pypdf2")
 def extract_with_pypdf2(file_path):
     """Extract text from PDF using PyPDF2."""
     try:
         with open(file_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
+            reader = load_pdf_backend("PyPDF2").PdfReader(file)
             text = ""
             for page in reader.pages:
                 text += page.extract_text() or ""
@@ -1237,7 +1692,8 @@ def extract_with_pypdf2(file_path):
         return ""
 
 
-def parse_extracted_text(text, extracted_data, template):
+@traced("pdf.parse")
+def parse_extracted_text(text, extracted_data, template, on_po_number=None):
     """
     Parse the extracted text to find relevant information.
 
@@ -1245,12 +1701,16 @@ def parse_extracted_text(text, extracted_data, template):
         text (str): The extracted text from the PDF
         extracted_data (dict): Dictionary to update with parsed information
         template (dict): The template configuration to use
+        on_po_number (callable): Optional callback invoked with the PO number once found
     """
     # Handle None or empty text
     if not text:
         logger.warning("parse_extracted_text: text is None or empty")
         return
-    
+
+    # Phones, ABNs, PO-like numbers and amounts, found once for every extractor below
+    entities = tokenize_numeric_entities(text)
+
     # Extract PO number
     for pattern in template["po_patterns"]:
         match = re.search(pattern, text, re.IGNORECASE)
@@ -1260,23 +1720,28 @@ def parse_extracted_text(text, extracted_data, template):
     
     # If no PO number found with template patterns, try generic fallback patterns
     if not extracted_data["po_number"]:
-        generic_po_patterns = [
-            r"P\.O\.\s*No:?\s*([A-Za-z0-9-]+)",
-            r"PO[:\s#]+([A-Za-z0-9-]+)",
-            r"Purchase\s+Order[:\s#]+([A-Za-z0-9-]+)",
-            r"Order\s+Number[:\s#]+([A-Za-z0-9-]+)",
-            r"CONTRACT\s+NO[.:]?\s*([A-Za-z0-9-]+)",
-            r"Contract\s+Number[.:]?\s*([A-Za-z0-9-]+)",
-        ]
-
-        for pattern in generic_po_patterns:
+        for pattern in GENERIC_PO_PATTERNS:
             match = re.search(pattern, text, re.IGNORECASE)
             if match:
                 extracted_data["po_number"] = match.group(1).strip()
                 break
-    
+
+    # Last resort: a number labelled as an order/PO/contract number
+    if not extracted_data["po_number"]:
+        po_entity = next((e for e in entities if e.kind == "po"), None)
+        if po_entity:
+            extracted_data["po_number"] = po_entity.raw.strip()
+
     logger.info(f"[EXTRACT] PO Number: {extracted_data['po_number']}")
 
+    # Let the caller start work that only needs the PO number (e.g. the RFMS
+    # duplicate check) while contacts, addresses and descriptions are parsed
+    if on_po_number and extracted_data["po_number"]:
+        try:
+            on_po_number(extracted_data["po_number"])
+        except Exception as e:
+            logger.warning(f"[EXTRACT] on_po_number callback failed: {e}")
+
     # Extract business name from SUBCONTRACTOR DETAILS section
     subcontractor_section = re.search(
         r"SUBCONTRACTOR\s+DETAILS([\s\S]+?)(?=JOB\s+DETAILS|SUPERVISOR\s+DETAILS|$)",
@@ -1344,7 +1809,7 @@ def parse_extracted_text(text, extracted_data, template):
         logger.warning("[EXTRACT] No customer name found - this may affect ship-to details")
 
     # Extract contact details
-    extract_contact_details(text, extracted_data)
+    extract_contact_details(text, extracted_data, entities)
 
     # Extract Job Number and Supervisor Details
     extract_job_and_supervisor_details(text, extracted_data, template)
@@ -1494,7 +1959,13 @@ def parse_extracted_text(text, extracted_data, template):
                 break
             except ValueError:
                 continue
-    
+
+    # No template match: take the largest amount labelled as a total
+    if not extracted_data["dollar_value"]:
+        totals = [e.amount for e in entities if e.kind == "money" and "total" in e.label and e.amount]
+        if totals:
+            extracted_data["dollar_value"] = max(totals)
+
     logger.info(f"[EXTRACT] Dollar Value: {extracted_data['dollar_value']}")
 
     # --- Enhanced Ambrose contact extraction for all contact types ---
@@ -1505,338 +1976,61 @@ def parse_extracted_text(text, extracted_data, template):
         # Track phones for Phone3/Phone4 mapping (prioritize Authorised Contact and Site Contact)
         phone_numbers = []
         
-        # First, extract from BEST CONTACT DETAILS section
         best_contact_section = re.search(
             r"BEST\s+CONTACT\s+DETAILS([\s\S]+?)(?=SUPERVISOR|JOB\s+DETAILS|$)",
             text,
             re.IGNORECASE
         )
-        
-        if best_contact_section:
-            contact_text = best_contact_section.group(1)
-            logger.info(f"[AMBROSE] Found BEST CONTACT DETAILS section: {contact_text[:200]}...")
-            
-            # Extract contact entries that start with "Contact Type: Name" pattern
-            # Look for patterns like "Decision Maker: Mark Mclenahan" or "Site Contact: Amy Mclenahan"
-            contact_name_patterns = [
-                r"(Decision\s+Maker)[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Contact\s+Type|$)",
-                r"(Site\s+Contact)[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Contact\s+Type|$)",
-                r"(Authorised\s+Contact)[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Contact\s+Type|$)",
-                r"(Best\s+Contact)[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Contact\s+Type|$)",
-                r"(Occupant\s+Contact)[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Contact\s+Type|$)",
-            ]
-            
-            for pattern in contact_name_patterns:
-                contact_matches = re.finditer(pattern, contact_text, re.IGNORECASE)
-                for match in contact_matches:
-                    contact_type = match.group(1).strip()
-                    name = match.group(2).strip()
-                    
-                    # Get context after this contact entry (next 300 characters for more details)
-                    start_pos = match.end()
-                    context = contact_text[start_pos:start_pos + 300]
-                    
-                    # Extract phone numbers from the context (handle line breaks better)
-                    # Remove line breaks for cleaner matching
-                    clean_context = re.sub(r'\n\r?', ' ', context)
-                    
-                    # Look for Mobile: pattern specifically 
-                    mobile_matches = re.findall(r"Mobile[:\s]*([0-9\s\-\(\)]+)", clean_context, re.IGNORECASE)
-                    
-                    # Also look for Phone: pattern
-                    phone_matches = re.findall(r"Phone[:\s]*([0-9\s\-\(\)]+)", clean_context, re.IGNORECASE)
-                    
-                    # Look for standalone phone patterns (10 digits)
-                    standalone_phone_matches = re.findall(r"([0-9]{10})", clean_context)
-                    
-                    # Combine all phone matches
-                    all_phone_matches = mobile_matches + phone_matches + standalone_phone_matches
-                    
-                    # Clean phone numbers
-                    cleaned_phones = []
-                    for phone_raw in all_phone_matches:
-                        cleaned = re.sub(r'[^\d]', '', phone_raw)
-                        if len(cleaned) >= 8 and len(cleaned) <= 12:  # Valid Australian phone length
-                            cleaned_phones.append(cleaned)
-                    
-                    phone = cleaned_phones[0] if cleaned_phones else ""
-                    phone2 = cleaned_phones[1] if len(cleaned_phones) > 1 else ""
-                    
-                    # Extract email
-                    email_match = re.search(r"Email[:\s]*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", context, re.IGNORECASE)
-                    email = email_match.group(1) if email_match else ""
-                    
-                    # Add to contacts if we have meaningful data
-                    if name and name.lower() != main_customer_name and len(name.strip()) > 2:
-                        contact_entry = {
-                            "type": contact_type,
-                            "name": name,
-                            "phone": phone,
-                            "phone2": phone2,
-                            "email": email
-                        }
-                        extracted_data["alternate_contacts"].append(contact_entry)
-                        logger.info(f"[AMBROSE] Added {contact_type}: {name}, Phone: {phone}, Email: {email}")
-                        
-                        # Prioritize Authorised Contact and Site Contact for Phone3/Phone4
-                        if contact_type.lower() in ["authorised contact", "site contact"]:
-                            if phone and phone not in phone_numbers:
-                                phone_numbers.insert(0, phone)  # Insert at beginning for priority
-                            if phone2 and phone2 not in phone_numbers:
-                                phone_numbers.insert(len(phone_numbers) if phone else 1, phone2)
-                        else:
-                            # Add other phones at the end
-                            if phone and phone not in phone_numbers:
-                                phone_numbers.append(phone)
-                            if phone2 and phone2 not in phone_numbers:
-                                phone_numbers.append(phone2)
-                        
-                        # Set as primary alternate contact if it's a priority type
-                        if (contact_type.lower() in ["decision maker", "authorised contact", "site contact"] and 
-                            not extracted_data.get("alternate_contact_name") and name):
-                            extracted_data["alternate_contact_name"] = name
-                            extracted_data["alternate_contact_phone"] = phone
-                            extracted_data["alternate_contact_email"] = email
-            
-            # Also handle old-style "Contact Type: Type" patterns for backwards compatibility
-            contact_type_matches = re.finditer(
-                r"Contact\s+Type[:\s]*([A-Za-z\s]+?)(?=\n|$)",
-                contact_text,
-                re.IGNORECASE
-            )
-            
-            for match in contact_type_matches:
-                contact_type = match.group(1).strip()
-                # Get context after this contact type (next 150 characters)
-                start_pos = match.end()
-                context = contact_text[start_pos:start_pos + 150]
-                
-                # Extract name (first line after contact type)
-                name_match = re.search(r"^\s*([A-Za-z\s\-'\.]+?)(?=\n|Mobile|Phone|Email|$)", context, re.MULTILINE)
-                name = name_match.group(1).strip() if name_match else ""
-                
-                # Extract phone numbers (more comprehensive patterns, handle line breaks)
-                # Remove line breaks from context for better matching
-                clean_context = re.sub(r'\n\r?', ' ', context)
-                phone_matches = re.findall(r"(?:Mobile|Phone|Home)[:\s]*([0-9\s\-\(\)]+)", clean_context, re.IGNORECASE)
-                # Also look for standalone phone patterns in the context  
-                standalone_phone_matches = re.findall(r"([0-9]{4}[0-9\s\-\(\)]{6,})", clean_context)
-                
-                # Special pattern for mobile numbers that might be split across lines
-                mobile_split_matches = re.findall(r"Mobile[:\s]*([0-9]{4})[\s\n\r]*([0-9]{3})[\s\n\r]*([0-9]{3})", context, re.IGNORECASE)
-                if mobile_split_matches:
-                    for match in mobile_split_matches:
-                        combined_mobile = ''.join(match)
-                        standalone_phone_matches.append(combined_mobile)
-                
-                # Combine and clean phone numbers
-                all_phone_matches = phone_matches + standalone_phone_matches
-                cleaned_phones = []
-                for phone_raw in all_phone_matches:
-                    cleaned = re.sub(r'[^\d]', '', phone_raw)
-                    if len(cleaned) >= 8 and len(cleaned) <= 12:  # Valid Australian phone length
-                        cleaned_phones.append(cleaned)
-                
-                phone = cleaned_phones[0] if cleaned_phones else ""
-                phone2 = cleaned_phones[1] if len(cleaned_phones) > 1 else ""
-                
-                # Extract email
-                email_match = re.search(r"Email[:\s]*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", context, re.IGNORECASE)
-                email = email_match.group(1) if email_match else ""
-                
-                # Add to contacts if we have meaningful data
-                if name and name.lower() != main_customer_name and len(name.strip()) > 2:
-                    contact_entry = {
-                        "type": contact_type,
-                        "name": name,
-                        "phone": phone,
-                        "phone2": phone2,
-                        "email": email
-                    }
-                    extracted_data["alternate_contacts"].append(contact_entry)
-                    logger.info(f"[AMBROSE] Added {contact_type}: {name}, Phone: {phone}, Email: {email}")
-                    
-                    # Prioritize Authorised Contact and Site Contact for Phone3/Phone4
-                    if contact_type.lower() in ["authorised contact", "site contact"]:
-                        if phone and phone not in phone_numbers:
-                            phone_numbers.insert(0, phone)  # Insert at beginning for priority
-                        if phone2 and phone2 not in phone_numbers:
-                            phone_numbers.insert(len(phone_numbers) if phone else 1, phone2)
-                    else:
-                        # Add other phones at the end
-                        if phone and phone not in phone_numbers:
-                            phone_numbers.append(phone)
-                        if phone2 and phone2 not in phone_numbers:
-                            phone_numbers.append(phone2)
-                    
-                    # Set as primary alternate contact if it's a priority type
-                    if (contact_type.lower() in ["decision maker", "authorised contact", "site contact"] and 
-                        not extracted_data.get("alternate_contact_name") and name):
-                        extracted_data["alternate_contact_name"] = name
-                        extracted_data["alternate_contact_phone"] = phone
-                        extracted_data["alternate_contact_email"] = email
-            
-            # Also look for standalone patterns in BEST CONTACT DETAILS
-            standalone_patterns = [
-                ("Decision Maker", r"Decision\s+Maker[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|$)"),
-                ("Mobile Number", r"Mobile\s+Number[:\s]*([0-9\s\-\(\)]+)"),
-                ("Site Contact", r"Site\s+Contact[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Contact\s+Type|$)"),
-                ("Authorised Contact", r"Authorised\s+Contact[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|$)"),
-                ("Mobile", r"Mobile[:\s]*([0-9\s\-\(\)]+)"),  # Generic mobile pattern
-                ("Phone", r"Phone[:\s]*([0-9\s\-\(\)]+)"),    # Generic phone pattern
-            ]
-            
-            for pattern_type, pattern in standalone_patterns:
-                matches = re.finditer(pattern, contact_text, re.IGNORECASE)
-                for match in matches:
-                    if pattern_type == "Mobile Number":
-                        phone = match.group(1).strip()
-                        if phone and phone not in phone_numbers:
-                            phone_numbers.append(phone)
-                    elif pattern_type in ["Decision Maker", "Site Contact"]:
-                        name = match.group(1).strip()
-                        if name and name.lower() != main_customer_name and len(name.strip()) > 2:
-                            # Look for associated phone/email nearby
-                            context_start = max(0, match.start() - 50)
-                            context_end = min(len(contact_text), match.end() + 100)
-                            context = contact_text[context_start:context_end]
-                            
-                            phone_match = re.search(r"(?:Mobile|Phone)[:\s]*([0-9\s\-\(\)]+)", context, re.IGNORECASE)
-                            phone = phone_match.group(1).strip() if phone_match else ""
-                            
-                            email_match = re.search(r"Email[:\s]*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", context, re.IGNORECASE)
-                            email = email_match.group(1) if email_match else ""
-                            
-                            # Check if this contact already exists
-                            existing = any(c.get("name", "").lower() == name.lower() for c in extracted_data["alternate_contacts"])
-                            if not existing:
-                                contact_entry = {
-                                    "type": pattern_type,
-                                    "name": name,
-                                    "phone": phone,
-                                    "phone2": "",
-                                    "email": email
-                                }
-                                extracted_data["alternate_contacts"].append(contact_entry)
-                                logger.info(f"[AMBROSE] Added standalone {pattern_type}: {name}, Phone: {phone}")
-                                
-                                if phone and phone not in phone_numbers:
-                                    phone_numbers.append(phone)
-            
-            # Extract specific Ambrose patterns like "Authorised Contact #: (H) 7899737 (M) 0409483445"
-            auth_contact_pattern = r"Authorised\s+Contact\s*#?[:\s]*\(H\)\s*([0-9\s\-\(\)]+)\s*\(M\)\s*([0-9\s\-\(\)]+)"
-            auth_match = re.search(auth_contact_pattern, contact_text, re.IGNORECASE)
-            if auth_match:
-                home_phone = auth_match.group(1).strip()
-                mobile_phone = auth_match.group(2).strip()
-                
-                # Look for the name before this pattern
-                context_start = max(0, auth_match.start() - 100)
-                context = contact_text[context_start:auth_match.start()]
-                
-                # Try to find "Authorised Contact:" followed by a name
-                name_match = re.search(r"Authorised\s+Contact[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Authorised\s+Contact\s*#|$)", context, re.IGNORECASE)
-                name = name_match.group(1).strip() if name_match else "Authorised Contact"
-                
-                if name and name.lower() != main_customer_name:
-                    contact_entry = {
-                        "type": "Authorised Contact",
-                        "name": name,
-                        "phone": mobile_phone,
-                        "phone2": home_phone,
-                        "email": ""
-                    }
-                    extracted_data["alternate_contacts"].append(contact_entry)
-                    logger.info(f"[AMBROSE] Added Authorised Contact: {name}, Mobile: {mobile_phone}, Home: {home_phone}")
-                    
-                    # Add both phones to the priority list
-                    if mobile_phone and mobile_phone not in phone_numbers:
-                        phone_numbers.insert(0, mobile_phone)  # Mobile gets priority
-                    if home_phone and home_phone not in phone_numbers:
-                        phone_numbers.append(home_phone)
-                    
-                    # Set as primary if we don't have one yet
-                    if not extracted_data.get("alternate_contact_name"):
-                        extracted_data["alternate_contact_name"] = name
-                        extracted_data["alternate_contact_phone"] = mobile_phone
-                        extracted_data["alternate_contact_email"] = ""
-        
-        # Extract other contact types outside BEST CONTACT DETAILS
-        other_contact_patterns = [
-            ("Occupant Contact", r"Occupant\s+Contact[:\s]*([A-Za-z\s\-'\.]*?)(?=\n|Property\s+Manager|Real\s+Estate|BEST\s+CONTACT|$)"),
-            ("Property Manager", r"Property\s+Manager[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|Real\s+Estate|BEST\s+CONTACT|$)"),
-            ("Real Estate Contact", r"Real\s+Estate\s+Contact[:\s]*([A-Za-z\s\-'\.]+?)(?=\n|BEST\s+CONTACT|$)"),
-        ]
-        
-        for contact_type, pattern in other_contact_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                name = match.group(1).strip() if match.groups() else ""
-                if name and name.lower() != main_customer_name and len(name.strip()) > 2:
-                    # Look for phone/email near this contact
-                    context_start = max(0, match.start() - 50)
-                    context_end = min(len(text), match.end() + 100)
-                    context = text[context_start:context_end]
-                    
-                    phone_match = re.search(r"(?:Mobile|Phone)[:\s]*([0-9\s\-\(\)]+)", context, re.IGNORECASE)
-                    phone = phone_match.group(1).strip() if phone_match else ""
-                    
-                    email_match = re.search(r"Email[:\s]*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", context, re.IGNORECASE)
-                    email = email_match.group(1) if email_match else ""
-                    
-                    contact_entry = {
-                        "type": contact_type,
-                        "name": name,
-                        "phone": phone,
-                        "phone2": "",
-                        "email": email
-                    }
-                    extracted_data["alternate_contacts"].append(contact_entry)
-                    logger.info(f"[AMBROSE] Added {contact_type}: {name}, Phone: {phone}, Email: {email}")
-                    
-                    if phone and phone not in phone_numbers:
-                        phone_numbers.append(phone)
-        
-        # Enhanced phone extraction for contacts that don't have phones yet
-        for contact in extracted_data["alternate_contacts"]:
-            if not contact.get("phone") or not contact.get("phone").strip():
-                contact_name = contact.get("name", "")
-                if contact_name and contact_name != "Email" and len(contact_name.strip()) > 2:
-                    # Look for phone numbers near this contact's name in the entire text
-                    name_index = text.find(contact_name)
-                    if name_index >= 0:
-                        # Search in a 300 character window around the name
-                        search_start = max(0, name_index - 150)
-                        search_end = min(len(text), name_index + len(contact_name) + 150)
-                        search_window = text[search_start:search_end]
-                        
-                        # Look for phone patterns in this window (comprehensive patterns)
-                        phone_patterns = [
-                            r"Mobile[:\s]*([0-9\s\-\(\)]{8,})",
-                            r"Phone[:\s]*([0-9\s\-\(\)]{8,})",
-                            r"([0-9]{4}[0-9\s\-\(\)]{6,})",  # Any number starting with 4 digits
-                            r"([0-9]{2}[)\s\-]*[0-9]{4}[)\s\-]*[0-9]{4})",  # AU phone pattern
-                            r"(\([0-9]{2}\)[)\s\-]*[0-9]{4}[)\s\-]*[0-9]{4})",  # (area) number
-                            r"([0-9]{4}[)\s\-]*[0-9]{3}[)\s\-]*[0-9]{3})",  # 10 digit pattern
-                            # Pattern for Australian mobile numbers starting with 04
-                            r"(0[45][0-9\s\-\(\)]{8,})",
-                            # Pattern for numbers that appear after contact names (line break tolerant)
-                            rf"{re.escape(contact_name)}.*?([0-9]{{4,}}[0-9\s\-\(\)]{{4,}})"
-                        ]
-                        
-                        for pattern in phone_patterns:
-                            phone_match = re.search(pattern, search_window, re.IGNORECASE | re.DOTALL)
-                            if phone_match:
-                                phone = phone_match.group(1)
-                                # Clean the phone number
-                                clean_phone = re.sub(r'[^\d]', '', phone)
-                                if len(clean_phone) >= 8 and len(clean_phone) <= 12:
-                                    contact["phone"] = clean_phone
-                                    if clean_phone not in phone_numbers:
-                                        phone_numbers.append(clean_phone)
-                                    logger.info(f"[AMBROSE] Found phone for {contact_name}: {clean_phone}")
-                                    break
-        
+
+        # Ambrose two-column layouts put Authorised Contact and Occupant lines
+        # outside the BEST CONTACT DETAILS heading, so parse the whole document
+        for contact in parse_contact_block(text):
+            name = contact["name"]
+            contact_type = contact["type"]
+            if name.lower() == main_customer_name:
+                # The insured owner listed as a contact: numbers not already on the main
+                # record become phone2 (if free) and extra phones
+                main_numbers = {
+                    _digits(extracted_data.get(key))
+                    for key in ("phone", "mobile", "home_phone", "work_phone", "phone2")
+                    if extracted_data.get(key)
+                }
+                for number in (contact["phone"], contact["phone2"]):
+                    if not number or _digits(number) in main_numbers or number in phone_numbers:
+                        continue
+                    if not extracted_data.get("phone2"):
+                        extracted_data["phone2"] = number
+                        logger.info(f"[AMBROSE] Set phone2 from owner's {contact_type} entry: {number}")
+                    phone_numbers.append(number)
+                continue
+            if len(name) <= 2 or any(
+                c.get("name", "").lower() == name.lower() for c in extracted_data["alternate_contacts"]
+            ):
+                continue
+            extracted_data["alternate_contacts"].append(contact)
+            phone, phone2, email = contact["phone"], contact["phone2"], contact["email"]
+            logger.info(f"[AMBROSE] Added {contact_type}: {name}, Phone: {phone}, Email: {email}")
+
+            # Prioritize Authorised Contact and Site Contact for Phone3/Phone4
+            if contact_type.lower() in ["authorised contact", "site contact"]:
+                if phone and phone not in phone_numbers:
+                    phone_numbers.insert(0, phone)  # Insert at beginning for priority
+                if phone2 and phone2 not in phone_numbers:
+                    phone_numbers.insert(len(phone_numbers) if phone else 1, phone2)
+            else:
+                # Add other phones at the end
+                if phone and phone not in phone_numbers:
+                    phone_numbers.append(phone)
+                if phone2 and phone2 not in phone_numbers:
+                    phone_numbers.append(phone2)
+
+            # Set as primary alternate contact if it's a priority type
+            if (contact_type.lower() in ["decision maker", "authorised contact", "site contact"] and
+                    not extracted_data.get("alternate_contact_name")):
+                extracted_data["alternate_contact_name"] = name
+                extracted_data["alternate_contact_phone"] = phone
+                extracted_data["alternate_contact_email"] = email
+
         # Store phones for Phone3/Phone4 mapping (first 2 go to Phone3/Phone4)
         extracted_data["extra_phones"] = phone_numbers[:4]
         logger.info(f"[AMBROSE] Collected phones for Phone3/Phone4: {phone_numbers[:4]}")
@@ -2031,25 +2225,18 @@ def parse_extracted_text(text, extracted_data, template):
                     extracted_data["alternate_contact_email"] = email
 
     # --- Explicitly extract 'Authorised Contact' and 'Site Contact' as alternates even if not in a section ---
-    for label in ["Authorised Contact", "Site Contact"]:
-        # Match lines like 'Authorised Contact: Name' or 'Site Contact: Name'
-        pattern = rf"{label}:?\s*([A-Za-z\s\-'\.]+)\n?(\(H\)\s*\d+)?\s*(\(M\)\s*\d+)?"
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            name = match[0].strip()
-            phone1 = match[1].replace("(H)", "").strip() if match[1] else ""
-            phone2 = match[2].replace("(M)", "").strip() if match[2] else ""
-            # Only add if name is not empty and not the main customer
-            if name and name.lower() != main_customer_name:
-                extracted_data["alternate_contacts"].append(
-                    {
-                        "type": label,
-                        "name": name,
-                        "phone": phone1,
-                        "phone2": phone2,
-                        "email": "",
-                    }
-                )
+    for contact in parse_contact_block(text, roles=("Authorised Contact", "Site Contact")):
+        name = contact["name"]
+        # Only add if not the main customer and not already found above
+        # Skip a name or phone already found above (one person is often listed twice
+        # with the name spelt differently)
+        if name.lower() == main_customer_name or any(
+            c.get("name", "").lower() == name.lower()
+            or (contact["phone"] and _digits(c.get("phone")) == _digits(contact["phone"]))
+            for c in extracted_data["alternate_contacts"]
+        ):
+            continue
+        extracted_data["alternate_contacts"].append(contact)
 
     # Extract Campbell-specific Site Contact if this is Campbell template
     if "campbell" in template["name"].lower():
@@ -2557,8 +2744,288 @@ def parse_extracted_text(text, extracted_data, template):
     # After extracting alternate contacts
     logger.info(f"[EXTRACT] Alternate Contacts: {extracted_data['alternate_contacts']}")
 
+    extracted_data["field_confidence"] = score_field_confidence(text, extracted_data, template, entities)
+    logger.info(f"[CONFIDENCE] {extracted_data['field_confidence']}")
+
+
+# One pass over the text finds every phone-like digit run and every dollar amount
+_NUMERIC_ENTITY_PATTERN = re.compile(
+    r"(?P<money>\$\s*\d[\d,]*(?:\.\d{1,2})?)"
+    r"|(?P<number>(?<!\d)(?:\+?61|0)?(?:\(?\d{2,4}\)?\s?\d{3,4}\s?\d{3,4}|\d{4}\s?\d{3}\s?\d{3}|\d{8,10})(?!\d))"
+)
+# Trailing "Label:" (or "(M)") before a number on the same line
+_ENTITY_LABEL_PATTERN = re.compile(r"([A-Za-z][A-Za-z .#/&]*?|\([A-Za-z]\))\s*[:#]?\s*$")
+_PO_LABEL_PATTERN = re.compile(r"\b(?:P\.?\s?O|purchase\s+order|order|contract|job)\b", re.IGNORECASE)
+_ABN_WEIGHTS = (10, 1, 3, 5, 7, 9, 11, 13, 15, 17, 19)
+
+
+@dataclass
+class NumericEntity:
+    kind: str          # phone, mobile, abn (ABN or ACN), po, money or number
+    raw: str           # Text as it appears in the document
+    digits: str        # Digits only (money keeps its decimal point)
+    start: int
+    end: int
+    label: str = ""    # Nearest label on the same line, lower-cased, without the colon
+
+    @property
+    def amount(self) -> Optional[float]:
+        if self.kind != "money":
+            return None
+        try:
+            return float(self.digits)
+        except ValueError:
+            return None
+
+
+def is_valid_abn(digits):
+    """Check an 11-digit ABN against the ATO weighted checksum."""
+    if len(digits) != 11 or not digits.isdigit() or digits[0] == "0":
+        return False
+    values = [int(d) for d in digits]
+    values[0] -= 1
+    return sum(v * w for v, w in zip(values, _ABN_WEIGHTS)) % 89 == 0
+
+
+def _entity_label(text, start):
+    line_start = text.rfind("\n", 0, start) + 1
+    prefix = text[max(line_start, start - 40):start]
+    match = _ENTITY_LABEL_PATTERN.search(prefix)
+    return match.group(1).strip().lower() if match else ""
+
+
+def _classify_numeric_entity(digits, label):
+    # ACNs are company identifiers too and never a contact number
+    if "abn" in label or "acn" in label or (len(digits) == 11 and is_valid_abn(digits)):
+        return "abn"
+    if _PO_LABEL_PATTERN.search(label):
+        return "po"
+    if label in ("(m)", "m") or "mobile" in label or (
+        (len(digits) == 10 and digits.startswith("04")) or (len(digits) == 11 and digits.startswith("614"))
+    ):
+        return "mobile"
+    if 8 <= len(digits) <= 12:
+        return "phone"
+    return "number"
+
+
+def tokenize_numeric_entities(text):
+    """
+    Find, normalize and classify every numeric entity in the text in one pass.
+
+    Args:
+        text (str): Document text
+
+    Returns:
+        list: NumericEntity objects in document order
+    """
+    entities = []
+    if not text:
+        return entities
+    for match in _NUMERIC_ENTITY_PATTERN.finditer(text):
+        raw = match.group(0)
+        label = _entity_label(text, match.start())
+        if match.lastgroup == "money":
+            digits = "".join(c for c in raw if c.isdigit() or c == ".")
+            kind = "money"
+        else:
+            digits = "".join(c for c in raw if c.isdigit())
+            kind = _classify_numeric_entity(digits, label)
+        entities.append(NumericEntity(kind, raw, digits, match.start(), match.end(), label))
+    return entities
+
+
+def _digits(value):
+    return "".join(c for c in str(value or "") if c.isdigit())
+
+
+# Line headings that start a contact record in contact sections; "#" lines
+# ("Authorised Contact #: (H) ... (M) ...") add numbers to the last record of that role
+CONTACT_ROLES = (
+    "Decision Maker",
+    "Authorised Contact",
+    "Site Contact",
+    "Best Contact",
+    "Occupant Contact",
+    "Property Manager",
+    "Real Estate Contact",
+    "Real Estate Agent",
+)
+_CONTACT_ROLE_LINE = re.compile(
+    r"^(?P<role>" + "|".join(r"\s+".join(role.split()) for role in CONTACT_ROLES).replace("Authorised", "Authori[sz]ed")
+    + r")(?:\s+(?P<field>Phone|Mobile|Email|Name))?\s*(?P<hash>#)?\s*:\s*(?P<value>.*)$",
+    re.IGNORECASE,
+)
+# Staff addresses of the builders and our own business, never a customer contact's
+COMPANY_EMAIL_DOMAINS = (
+    "ambroseconstruct.com.au",
+    "atozflooringsolutions.com.au",
+    "campbellcc.com.au",
+    "profilebuildgroup.com.au",
+)
+_CONTACT_TYPE_LINE = re.compile(r"^Contact\s+Type\s*:\s*(?P<value>.*)$", re.IGNORECASE)
+_CONTACT_PHONE_LINE = re.compile(
+    r"^(?P<label>Mobile(?:\s+Number)?|Phone\s*[12]?|Home|Work|Tel|Contact\s+No\.?)\s*:\s*(?P<value>.*)$",
+    re.IGNORECASE,
+)
+_CONTACT_EMAIL_LINE = re.compile(r"^E-?mail\s*:\s*(?P<value>.*)$", re.IGNORECASE)
+_CONTACT_PHONE_VALUE = re.compile(r"(?:\((?P<tag>[HMW])\)\s*)?(?P<number>\+?\d[\d \-\(\)]{6,}\d)")
+_CONTACT_EMAIL_VALUE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+_CONTACT_NAME_VALUE = re.compile(r"^[A-Za-z][A-Za-z\s\-'\.]*$")
+
+
+def _contact_phones(value, mobile_label=False):
+    """(digits, is_mobile) pairs for every phone-length number in a value."""
+    phones = []
+    for match in _CONTACT_PHONE_VALUE.finditer(value):
+        digits = _digits(match.group("number"))
+        if 8 <= len(digits) <= 12:
+            tag = match.group("tag")
+            is_mobile = tag == "M" if tag else (mobile_label or digits.startswith("04"))
+            phones.append((digits, is_mobile))
+    return phones
+
+
+def parse_contact_block(text, roles=None):
+    """
+    Parse contact records out of a contact section in a single pass over its lines.
+
+    Each role heading ("Site Contact: Jane Smith") opens a record; the Email,
+    Mobile/Phone/Home/Work and "Contact Type" lines that follow fill it in. A
+    value on the line after an empty "Mobile:" or "Site Contact:" is picked up,
+    as is a name wrapped onto the next line. Any other line closes the record.
+
+    Args:
+        text (str): Section (or whole document) text
+        roles (iterable): Role headings to accept; defaults to CONTACT_ROLES
+
+    Returns:
+        list: {type, name, phone, phone2, email} dicts in document order.
+              Mobiles are preferred for phone; records without a name are dropped.
+    """
+    accepted = {" ".join(role.lower().replace("authorized", "authorised").split()) for role in (roles or CONTACT_ROLES)}
+    records = []
+    current = None
+    state = "idle"  # idle | contact | await_name | await_phone | await_email | name_wrap
+    pending_mobile = False
+
+    def open_record(role, name=""):
+        record = {"type": role, "name": name, "email": "", "_phones": []}
+        records.append(record)
+        return record
+
+    def add_phones(record, phones):
+        for digits, is_mobile in phones:
+            if all(digits != known for known, _ in record["_phones"]):
+                record["_phones"].append((digits, is_mobile))
+
+    for raw_line in (text or "").splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        role_match = _CONTACT_ROLE_LINE.match(line)
+        if role_match:
+            role = " ".join(role_match.group("role").split()).title()
+            key = role.lower().replace("authorized", "authorised")
+            if key not in accepted:
+                current, state = None, "idle"
+                continue
+            role = "Authorised Contact" if key == "authorised contact" else role
+            value = role_match.group("value").strip()
+            field = (role_match.group("field") or "").lower()
+            if field == "email":
+                current = next((r for r in reversed(records) if r["type"] == role), None) or open_record(role)
+                found = _CONTACT_EMAIL_VALUE.search(value)
+                if found and not found.group(0).lower().endswith(COMPANY_EMAIL_DOMAINS):
+                    current["email"] = current["email"] or found.group(0)
+                state = "contact"
+                continue
+            if role_match.group("hash") or field in ("phone", "mobile"):
+                # Numbers for a contact named earlier under the same heading
+                current = next((r for r in reversed(records) if r["type"] == role), None) or open_record(role)
+                add_phones(current, _contact_phones(value, field == "mobile"))
+                state = "contact"
+                continue
+            # "Jane Smith - Daughter": keep the name, drop the relationship
+            value = re.split(r"\s+-\s+", value, maxsplit=1)[0]
+            if value and _CONTACT_NAME_VALUE.match(value):
+                current = open_record(role, value)
+                # A trailing space means the PDF wrapped the name onto the next line
+                state = "name_wrap" if raw_line.endswith(" ") else "contact"
+            else:
+                current = open_record(role)
+                add_phones(current, _contact_phones(value))
+                state = "await_name"
+            continue
+
+        type_match = _CONTACT_TYPE_LINE.match(line)
+        if type_match:
+            if current is None:
+                # Older layout: "Contact Type: Site Contact" with the name on the next line
+                current = open_record(type_match.group("value").strip())
+                state = "await_name"
+            else:
+                state = "contact"
+            continue
+
+        if current is None:
+            continue
+
+        phone_match = _CONTACT_PHONE_LINE.match(line)
+        if phone_match:
+            mobile_label = phone_match.group("label").lower().startswith("mobile")
+            phones = _contact_phones(phone_match.group("value"), mobile_label)
+            add_phones(current, phones)
+            pending_mobile = mobile_label
+            state = "contact" if phones else "await_phone"
+            continue
+
+        email_match = _CONTACT_EMAIL_LINE.match(line)
+        if email_match:
+            found = _CONTACT_EMAIL_VALUE.search(email_match.group("value"))
+            if found and not current["email"] and not found.group(0).lower().endswith(COMPANY_EMAIL_DOMAINS):
+                current["email"] = found.group(0)
+            state = "contact" if found else "await_email"
+            continue
+
+        if state == "await_phone":
+            phones = _contact_phones(line, pending_mobile)
+            if phones and _digits(line) == "".join(digits for digits, _ in phones):
+                add_phones(current, phones)
+                state = "contact"
+                continue
+        elif state == "await_email":
+            found = _CONTACT_EMAIL_VALUE.fullmatch(line)
+            if found and not line.lower().endswith(COMPANY_EMAIL_DOMAINS):
+                current["email"] = current["email"] or found.group(0)
+                state = "contact"
+                continue
+        elif state in ("await_name", "name_wrap") and _CONTACT_NAME_VALUE.match(re.split(r"\s+-\s+", line, maxsplit=1)[0]):
+            line = re.split(r"\s+-\s+", line, maxsplit=1)[0]
+            current["name"] = f"{current['name']} {line}".strip()
+            state = "name_wrap" if state == "await_name" and raw_line.endswith(" ") else "contact"
+            continue
 
-def extract_contact_details(text, extracted_data):
+        # Anything else ends the record
+        current, state = None, "idle"
+
+    contacts = []
+    for record in records:
+        if not record["name"]:
+            continue
+        phones = sorted(record["_phones"], key=lambda phone: not phone[1])
+        contacts.append({
+            "type": record["type"],
+            "name": record["name"],
+            "phone": phones[0][0] if phones else "",
+            "phone2": phones[1][0] if len(phones) > 1 else "",
+            "email": record["email"],
+        })
+    return contacts
+
+
+def extract_contact_details(text, extracted_data, entities=None):
     """Extract all contact details from the text."""
     # Extract email
     email_pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
@@ -2605,19 +3072,17 @@ def extract_contact_details(text, extracted_data):
 
     # Extract all phone numbers from the document for potential extra phone fields
     all_phone_numbers = []
-
-    # General pattern to find all phone numbers
-    phone_pattern = r"(?<!\d)(?:\+?61|0)?(?:\(?\d{2,4}\)?\s?\d{3,4}\s?\d{3,4}|\d{4}\s?\d{3}\s?\d{3}|\d{8,10})(?!\d)"
-    all_matches = re.finditer(phone_pattern, text)
+    if entities is None:
+        entities = tokenize_numeric_entities(text)
 
     # Company phone numbers to exclude
-    company_phone_numbers = [
+    company_phone_numbers = {
         "0731100077",      # A to Z Flooring Solutions
         "35131176",        # Company number
         "999869951",       # Other company number
         "0736380304",      # Profile Build Group office phone (07 3638 0304)
         "74658650821",     # ABN number
-    ]
+    }
 
     # Profile Build Group specific patterns to exclude
     profile_build_exclusion_patterns = [
@@ -2629,88 +3094,69 @@ def extract_contact_details(text, extracted_data):
         r"QBCC.*?([0-9\s\-\(\)]+)",  # Phone numbers near QBCC license
     ]
 
-    excluded_number_patterns = [
-        r"ABN:\s*(\d+)",  # ABN pattern
-        r"Job\s+Number:?\s*([0-9-]+)",  # Job number pattern
-        r"QBCC\s+License:?\s*([0-9-]+)",  # QBCC license pattern
-    ]
-
-    # Extract numbers to exclude from ABN and other patterns
-    numbers_to_exclude = []
-    for pattern in excluded_number_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Extract all digit sequences from the match
-            digits = "".join(c for c in match.group(1) if c.isdigit())
-            if digits and len(digits) >= 8:  # Only exclude if it looks like a phone number
-                numbers_to_exclude.append(digits)
+    # ABNs, job numbers and QBCC licences that happen to look like phone numbers
+    for entity in entities:
+        if len(entity.digits) >= 8 and (
+            entity.kind == "abn" or "job number" in entity.label or "qbcc" in entity.label
+        ):
+            company_phone_numbers.add(entity.digits)
 
     # Extract Profile Build specific exclusions
-    if "profile build" in text.lower() or "profilebuildgroup" in text.lower():
+    lowered_text = text.lower()
+    is_profile_build = "profile build" in lowered_text or "profilebuildgroup" in lowered_text
+    if is_profile_build:
         for pattern in profile_build_exclusion_patterns:
             matches = re.finditer(pattern, text, re.IGNORECASE)
             for match in matches:
                 # Extract phone numbers from the matched text
                 phone_matches = re.finditer(r"([0-9\s\-\(\)]{8,})", match.group(0))
                 for phone_match in phone_matches:
-                    clean_phone = "".join(c for c in phone_match.group(1) if c.isdigit())
+                    clean_phone = _digits(phone_match.group(1))
                     if 8 <= len(clean_phone) <= 12:
-                        company_phone_numbers.append(clean_phone)
+                        company_phone_numbers.add(clean_phone)
+
+    supervisor_mobile = _digits(extracted_data["supervisor_mobile"])
+    main_phones = {_digits(extracted_data.get(key)) for key in ("phone", "mobile", "home_phone", "work_phone")}
 
-    for match in all_matches:
-        phone = match.group(0).strip()
-        # Clean the phone number for comparison
-        clean_phone = "".join(c for c in phone if c.isdigit())
+    for entity in entities:
+        if entity.kind == "money":
+            continue
+        phone = entity.raw.strip()
+        clean_phone = entity.digits
 
         # Skip supervisor's mobile
-        if extracted_data["supervisor_mobile"] and clean_phone == "".join(
-            c for c in extracted_data["supervisor_mobile"] if c.isdigit()
-        ):
+        if supervisor_mobile and clean_phone == supervisor_mobile:
             continue
 
         # Skip if it matches one of our excluded numbers
-        if any(
-            clean_phone == "".join(c for c in num if c.isdigit())
-            for num in company_phone_numbers + numbers_to_exclude
-        ):
+        if clean_phone in company_phone_numbers:
             continue
 
         # Additional Profile Build specific exclusions - check context around the phone number
-        if "profile build" in text.lower() or "profilebuildgroup" in text.lower():
-            # Find the context around this phone number in the original text
-            phone_position = text.find(phone)
-            if phone_position != -1:
-                # Get 100 characters before and after the phone number for context
-                context_start = max(0, phone_position - 100)
-                context_end = min(len(text), phone_position + len(phone) + 100)
-                context = text[context_start:context_end].lower()
-                
-                # Skip if phone appears in company/builder context
-                profile_build_context_keywords = [
-                    "profile build group",
-                    "2/133 redland bay rd",
-                    "capalaba qld 4157",
-                    "t:",  # Company phone format
-                    "abn:",
-                    "qbcc",
-                    "supervisor:",
-                    "profilebuildgroup.com.au",
-                    "to: a to z flooring"
-                ]
-                
-                if any(keyword in context for keyword in profile_build_context_keywords):
-                    logger.info(f"[PROFILE BUILD] Excluding phone {phone} - found in company context: {context[:50]}...")
-                    continue
+        if is_profile_build:
+            # Get 100 characters before and after the phone number for context
+            context = lowered_text[max(0, entity.start - 100):entity.end + 100]
+
+            # Skip if phone appears in company/builder context
+            profile_build_context_keywords = [
+                "profile build group",
+                "2/133 redland bay rd",
+                "capalaba qld 4157",
+                "t:",  # Company phone format
+                "abn:",
+                "qbcc",
+                "supervisor:",
+                "profilebuildgroup.com.au",
+                "to: a to z flooring"
+            ]
+
+            if any(keyword in context for keyword in profile_build_context_keywords):
+                logger.info(f"[PROFILE BUILD] Excluding phone {phone} - found in company context: {context[:50]}...")
+                continue
 
         # Only add if it's not already one of our main numbers and looks like a valid phone
-        if len(clean_phone) >= 8 and clean_phone not in [
-            "".join(c for c in str(extracted_data.get("phone", "") or "") if c.isdigit()),
-            "".join(c for c in str(extracted_data.get("mobile", "") or "") if c.isdigit()),
-            "".join(c for c in str(extracted_data.get("home_phone", "") or "") if c.isdigit()),
-            "".join(c for c in str(extracted_data.get("work_phone", "") or "") if c.isdigit()),
-        ]:
-            if len(clean_phone) >= 8 and len(clean_phone) <= 12:
-                all_phone_numbers.append(phone)
+        if 8 <= len(clean_phone) <= 12 and clean_phone not in main_phones:
+            all_phone_numbers.append(clean_phone)
 
     # Extract phone numbers from BEST CONTACT DETAILS section if available
     if best_contact_section:
@@ -2784,23 +3230,12 @@ def extract_contact_details(text, extracted_data):
                 break
 
     # Add all unique phone numbers to extra_phones (will be filtered in clean_extracted_data)
-    for phone in all_phone_numbers:
-        # Clean the phone number - keep only digits
-        clean_phone = "".join(c for c in phone if c.isdigit())
-
-        # Check against existing phone numbers (also cleaned)
-        main_phones = []
-        for key in ["phone", "mobile", "home_phone", "work_phone"]:
-            if extracted_data[key]:
-                main_phones.append(
-                    "".join(c for c in extracted_data[key] if c.isdigit())
-                )
-
+    main_phones = {
+        _digits(extracted_data[key]) for key in ("phone", "mobile", "home_phone", "work_phone") if extracted_data[key]
+    }
+    for clean_phone in all_phone_numbers:
         # Only add if it's not already in our main numbers and not already in extra_phones
-        if (
-            clean_phone not in main_phones
-            and clean_phone not in extracted_data["extra_phones"]
-        ):
+        if clean_phone not in main_phones and clean_phone not in extracted_data["extra_phones"]:
             extracted_data["extra_phones"].append(clean_phone)
 
 
@@ -3144,109 +3579,45 @@ def parse_ambrose_address(address_str, extracted_data):
     logger.info(f"[AMBROSE ADDRESS PARSE] Raw: '{address_str}' | address1: '{extracted_data['address1']}', city: '{extracted_data['city']}', state: '{extracted_data['state']}', zip: '{extracted_data['zip_code']}'")
 
 
-def match_builder_to_template(builder_name: str) -> str:
+def match_builder_to_template(builder_name: str, customer_id: str = "") -> str:
     """
-    Match a builder name from the database to the appropriate extraction template.
-    Uses fuzzy matching to handle variations in builder names.
-    
+    Match a builder from the database to the appropriate extraction template.
+    Looks up the RFMS customer ID and normalized name in the builder registry,
+    falling back to n-gram fuzzy matching to handle variations in builder names.
+
     Args:
         builder_name: The builder name from the RFMS database
-        
+        customer_id: The builder's RFMS customer ID (optional)
+
     Returns:
         The template name to use for extraction
     """
-    if not builder_name:
+    if not builder_name and not customer_id:
         return ""
-    
-    # Normalize the builder name for comparison
-    normalized_name = builder_name.lower().strip()
-    
-    # Define builder name patterns and their corresponding templates
-    builder_patterns = {
-        "ambrose": ["ambrose", "ambrose construct", "ambrose construction"],
-        "profile_build": ["profile build", "profile build group", "pbg"],
-        "rizon": ["rizon", "rizon group"],
-        "campbell": ["campbell", "campbell construction", "campbell build"],
-        "australian_restoration": ["australian restoration", "arc", "restoration company"],
-        "townsend": ["townsend", "townsend building", "tbs", "townsend services"],
-        "one_solutions": ["one solutions", "a to z flooring", "a to z flooring solutions"],
-        "johns_lyng": ["johns lyng", "johns lyng group", "jl group"],
-        "advance": ["advance", "advance builders", "advance building", "advance construction"]
-    }
-    
-    # First try exact substring matches
-    for template, patterns in builder_patterns.items():
-        for pattern in patterns:
-            if pattern in normalized_name:
-                logger.info(f"[BUILDER_MATCH] Exact match: '{builder_name}' -> '{template}'")
-                return template
-    
-    # If no exact match, use fuzzy matching
-    best_match = None
-    best_score = 0.0
-    
-    for template, patterns in builder_patterns.items():
-        for pattern in patterns:
-            # Calculate similarity score
-            score = SequenceMatcher(None, normalized_name, pattern).ratio()
-            if score > best_score and score > 0.6:  # 60% similarity threshold
-                best_score = score
-                best_match = template
-    
-    if best_match:
-        logger.info(f"[BUILDER_MATCH] Fuzzy match: '{builder_name}' -> '{best_match}' (score: {best_score:.2f})")
-        return best_match
-    
-    logger.warning(f"[BUILDER_MATCH] No match found for builder: '{builder_name}'")
-    return ""
+    return builder_registry.match(builder_name, customer_id)
 
 
 def detect_builder_from_pdf(text: str) -> str:
     """
     Detect builder name from the first 5 lines of the PDF.
     Looks for builder names in headers, logos, addressed to sections, etc.
-    
+
     Args:
         text: The extracted text from the PDF
-        
+
     Returns:
         The detected builder name or empty string if not found
     """
     # Get first 5 lines or first 500 characters, whichever is less
     lines = text.split('\n')[:5]
-    first_section = '\n'.join(lines)[:500].lower()
-    
-    logger.info(f"[BUILDER_DETECT] Analyzing first section: {first_section[:200]}...")
-    
-    # Check for known builder patterns
-    builder_patterns = {
-        'profile build group': ['profile build', 'profile building group', 'profilebuildgroup'],
-        'ambrose construct group': ['ambrose construct', 'ambrose construction', 'ambrose group'],
-        'campbell construction': ['campbell construction', 'campbell', 'ccc'],
-        'australian restoration company': ['australian restoration', 'arc', 'aust restoration'],
-        'townsend building services': ['townsend building', 'townsend', 'tbs'],
-        'rizon group': ['rizon', 'rizon group', 'rizon construction'],
-        'one solutions': ['one solutions', 'a to z flooring', 'a to z flooring solutions'],
-        'johns lyng group': ['johns lyng', 'johns lyng group', 'jl group'],
-        'advance builders': ['advance builders', 'advance building', 'advance construction', 'advance']
-    }
-    
-    for builder_name, patterns in builder_patterns.items():
-        for pattern in patterns:
-            if pattern in first_section:
-                logger.info(f"[BUILDER_DETECT] Found builder: {builder_name}")
-                return builder_name
-                
-    # Check for "To:" or "Attention:" patterns
-    to_match = re.search(r'(?:to|attention|attn):\s*([a-z\s&]+?)(?:\n|$)', first_section, re.IGNORECASE)
-    if to_match:
-        potential_builder = to_match.group(1).strip()
-        logger.info(f"[BUILDER_DETECT] Found in To/Attention field: {potential_builder}")
-        # Match against known builders
-        for builder_name, patterns in builder_patterns.items():
-            for pattern in patterns:
-                if pattern in potential_builder.lower():
-                    return builder_name
-    
+    first_section = '\n'.join(lines)[:500]
+
+    logger.info(f"[BUILDER_DETECT] Analyzing first section: {first_section[:200].lower()}...")
+
+    builder_name = builder_registry.detect_in_text(first_section)
+    if builder_name:
+        logger.info(f"[BUILDER_DETECT] Found builder: {builder_name}")
+        return builder_name
+
     logger.info("[BUILDER_DETECT] No builder detected in first section")
     return ""
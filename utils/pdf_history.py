@@ -0,0 +1,268 @@
+"""
+Upload history: keyset-paginated listing of PdfData and archival of old rows.
+
+Listings are ordered newest first on (created_at, id), and the cursor carries
+the last row's key. Each page is then one index range scan, however deep the
+page is, unlike OFFSET. Only summary columns are selected, so the JSON blobs
+are never read for a listing.
+
+Rows older than the retention window are moved, blob and all, into one
+gzip-compressed payload per calendar month (PdfArchiveMonth). A small
+uncompressed PdfArchiveEntry per row keeps them searchable through the same
+filters, and the full row is read back from its month's payload on demand.
+"""
+import base64
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, or_, tuple_
+
+from models import PdfArchiveEntry, PdfArchiveMonth, PdfData, RfmsOutbox, db
+
+logger = logging.getLogger(__name__)
+
+PDF_LIST_DEFAULT_LIMIT = 50
+PDF_LIST_MAX_LIMIT = 200
+PDF_ARCHIVE_RETENTION_DAYS = int(os.getenv("PDF_ARCHIVE_RETENTION_DAYS", "365"))
+
+# Columns a listing returns; the extracted data JSON is deliberately not among them
+SUMMARY_COLUMNS = (
+    "id", "filename", "po_number", "customer_name", "business_name", "dollar_value", "processed", "created_at",
+)
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor for the row after which the next page starts."""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (created_at, id)
+
+    Raises:
+        ValueError: The cursor was not produced by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_date_bound(value, end=False):
+    """
+    Parse a since/until filter. A bare date as an upper bound covers that whole day.
+
+    Raises:
+        ValueError: Not an ISO date or datetime
+    """
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def apply_filters(query, model, builder="", po_number="", processed=None, since=None, until=None):
+    """
+    Filter a PdfData or PdfArchiveEntry query.
+
+    Args:
+        builder (str): Matches business_name anywhere, or the start of the detected template name
+        po_number (str): PO number prefix
+        processed (bool): Exported to RFMS or not; None for both
+        since (datetime): created_at lower bound (inclusive)
+        until (datetime): created_at upper bound (exclusive)
+    """
+    if builder:
+        escaped = _escape_like(builder)
+        if model is PdfArchiveEntry:
+            template_match = model.template.ilike(f"{escaped}%", escape="\\")
+        else:
+            # The template name lives only in the JSON blob; match it as stored
+            template_match = model.extracted_data_json.ilike(f'%"template": "{escaped}%', escape="\\")
+        query = query.filter(or_(model.business_name.ilike(f"%{escaped}%", escape="\\"), template_match))
+    if po_number:
+        query = query.filter(model.po_number.ilike(f"{_escape_like(po_number)}%", escape="\\"))
+    if processed is not None:
+        query = query.filter(model.processed.is_(processed))
+    if since:
+        query = query.filter(model.created_at >= since)
+    if until:
+        query = query.filter(model.created_at < until)
+    return query
+
+
+def list_pdfs(cursor=None, limit=PDF_LIST_DEFAULT_LIMIT, archived=False, **filters):
+    """
+    One page of upload summaries, newest first.
+
+    Args:
+        cursor (str): next_cursor from the previous page, or None for the first page
+        limit (int): Page size, capped at PDF_LIST_MAX_LIMIT
+        archived (bool): List archived rows instead of the live table
+        **filters: See apply_filters
+
+    Returns:
+        dict: {"items": [...], "next_cursor": str or None, "limit": int}
+
+    Raises:
+        ValueError: Invalid cursor
+    """
+    model = PdfArchiveEntry if archived else PdfData
+    limit = max(1, min(int(limit), PDF_LIST_MAX_LIMIT))
+    columns = [getattr(model, name) for name in SUMMARY_COLUMNS]
+    if archived:
+        columns += [model.template, model.archived_at]
+
+    query = apply_filters(db.session.query(*columns), model, **filters)
+    if cursor:
+        query = query.filter(tuple_(model.created_at, model.id) < decode_cursor(cursor))
+    # One extra row tells whether there is a next page
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+    items = []
+    for row in rows[:limit]:
+        item = dict(row._mapping)
+        item["created_at"] = item["created_at"].strftime("%Y-%m-%d %H:%M:%S") if item["created_at"] else None
+        if archived:
+            item["archived_at"] = item["archived_at"].strftime("%Y-%m-%d %H:%M:%S")
+            item["archived"] = True
+        items.append(item)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+
+def load_archived_pdf(pdf_id):
+    """
+    Full row of an archived upload, in the shape of PdfData.to_dict(), or None.
+    """
+    entry = db.session.get(PdfArchiveEntry, pdf_id)
+    if entry is None:
+        return None
+    archive = db.session.get(PdfArchiveMonth, entry.month)
+    for record in archive.iter_records():
+        if record["id"] == pdf_id:
+            record["archived"] = True
+            record["archived_at"] = entry.archived_at.strftime("%Y-%m-%d %H:%M:%S")
+            return record
+    logger.error(f"[ARCHIVE] Entry {pdf_id} points at month {entry.month}, which does not hold it")
+    return None
+
+
+def _archive_record(row):
+    record = {}
+    for column in PdfData.__table__.columns:
+        value = getattr(row, column.name)
+        if isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M:%S")
+        record[column.name] = value
+    record["extracted_data"] = json.loads(record.pop("extracted_data_json") or "{}")
+    return record
+
+
+def archive_old_pdfs(retention_days=PDF_ARCHIVE_RETENTION_DAYS, batch_size=500, now=None):
+    """
+    Move PdfData rows created before the retention window into monthly archives.
+
+    Each batch is one transaction: the rows are appended to their months'
+    payloads, get a summary entry and are deleted from the live table. Rows
+    with an RFMS export still pending in the outbox are left until it settles;
+    settled outbox rows keep their PO number but lose the link to the
+    archived row.
+
+    Archive entries keep the PdfData id. A SQLite pdf_data table created
+    without AUTOINCREMENT reuses the highest id once that row is deleted, so
+    there the row with the highest id is never archived.
+
+    Returns:
+        dict: {"cutoff", "archived", "months": {month: rows archived}}
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    pending_export = exists().where(
+        and_(
+            RfmsOutbox.pdf_id == PdfData.id,
+            RfmsOutbox.status.in_((RfmsOutbox.STATUS_PENDING, RfmsOutbox.STATUS_IN_PROGRESS)),
+        )
+    )
+    keep_newest_id = db.engine.dialect.name == "sqlite" and not _sqlite_autoincrement(PdfData.__tablename__)
+    months_archived = defaultdict(int)
+    total = 0
+    while True:
+        query = PdfData.query.filter(PdfData.created_at < cutoff, ~pending_export)
+        if keep_newest_id:
+            query = query.filter(PdfData.id < db.session.query(db.func.max(PdfData.id)).scalar_subquery())
+        rows = (
+            query
+            .order_by(PdfData.created_at, PdfData.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[row.created_at.strftime("%Y-%m")].append(row)
+        try:
+            for month, month_rows in by_month.items():
+                records = [_archive_record(row) for row in month_rows]
+                archive = db.session.get(PdfArchiveMonth, month)
+                if archive is None:
+                    archive = PdfArchiveMonth(month=month, row_count=0, payload=b"")
+                    db.session.add(archive)
+                archive.append(records)
+                for row, record in zip(month_rows, records):
+                    db.session.add(PdfArchiveEntry(
+                        id=row.id,
+                        month=month,
+                        filename=row.filename,
+                        customer_name=row.customer_name,
+                        business_name=row.business_name,
+                        po_number=row.po_number,
+                        template=record["extracted_data"].get("template", ""),
+                        dollar_value=row.dollar_value,
+                        processed=row.processed,
+                        created_at=row.created_at,
+                    ))
+                months_archived[month] += len(month_rows)
+            ids = [row.id for row in rows]
+            RfmsOutbox.query.filter(RfmsOutbox.pdf_id.in_(ids)).update({"pdf_id": None}, synchronize_session=False)
+            PdfData.query.filter(PdfData.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        db.session.expunge_all()
+        total += len(rows)
+        logger.info(f"[ARCHIVE] Archived {total} rows created before {cutoff:%Y-%m-%d}")
+    return {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S"), "archived": total, "months": dict(months_archived)}
+
+
+def _sqlite_autoincrement(table_name):
+    """Whether a SQLite table was created with AUTOINCREMENT (ids of deleted rows are not reused)."""
+    with db.engine.connect() as connection:
+        sql = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).scalar()
+    return "AUTOINCREMENT" in (sql or "").upper()
+
+
+def ensure_history_indexes():
+    """Create the listing indexes on databases whose tables predate them (create_all skips existing tables)."""
+    for table in (PdfData.__table__, PdfArchiveEntry.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
@@ -0,0 +1,253 @@
+"""
+Split PDFs that bundle several purchase orders and extract each one separately.
+
+Some builders send one file with many POs back to back. The page text is read
+once to find where each PO starts: a page whose PO number (by the template's
+PO patterns) differs from the current segment's starts a new segment when the
+previous PO already showed its total, or when the page carries a "Page 1 of N"
+cue. That read is the same PyMuPDF pass extract_data_from_pdf makes, so a file
+holding a single PO is extracted from it without opening the PDF again. Each
+segment is written out as its own PDF and run through extract_data_from_pdf
+on a process pool, so a bundle takes about as long as its largest PO rather
+than the sum of all of them.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.pdf_extractor import detect_template, extract_data_from_pdf, extract_with_pymupdf, load_pdf_backend
+from utils.tracing import current_trace, start_trace, traced
+
+logger = logging.getLogger(__name__)
+
+PO_SPLIT_ENABLED = os.getenv("PO_SPLIT_ENABLED", "true").lower() == "true"
+PO_SPLIT_WORKERS = int(os.getenv("PO_SPLIT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_PAGE_ONE_CUE = re.compile(r"\bPage\s+1\s+(?:of|/)\s+\d+\b", re.IGNORECASE)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _first_po(page_text, po_patterns):
+    for pattern in po_patterns:
+        match = pattern.search(page_text)
+        if match:
+            return (match.group(1) if match.groups() else match.group(0)).strip()
+    return ""
+
+
+def find_po_segments(page_texts, template):
+    """
+    Group pages into one segment per purchase order.
+
+    Args:
+        page_texts (list): Text of each page, in order
+        template (dict): Template from detect_template()
+
+    Returns:
+        list: [{"po_number", "first_page", "last_page"}] with 0-based pages, or an
+              empty list when the document holds fewer than two distinct POs
+    """
+    po_patterns = [re.compile(p, re.IGNORECASE) for p in template.get("po_patterns", [])]
+    # Only the explicit "total" patterns; bare "$" amounts appear on every page
+    total_patterns = [
+        re.compile(p, re.IGNORECASE) for p in template.get("dollar_patterns", []) if "total" in p.lower()
+    ]
+    segments = []
+    current = None
+    for index, text in enumerate(page_texts):
+        po_number = _first_po(text, po_patterns)
+        if current is None:
+            current = {"po_number": po_number, "first_page": index, "has_total": False}
+        elif po_number and not current["po_number"]:
+            current["po_number"] = po_number
+        elif po_number and po_number != current["po_number"] and (
+            current["has_total"] or _PAGE_ONE_CUE.search(text)
+        ):
+            current["last_page"] = index - 1
+            segments.append(current)
+            current = {"po_number": po_number, "first_page": index, "has_total": False}
+        if any(pattern.search(text) for pattern in total_patterns):
+            current["has_total"] = True
+    if current is not None:
+        current["last_page"] = len(page_texts) - 1
+        segments.append(current)
+
+    if len({segment["po_number"] for segment in segments if segment["po_number"]}) < 2:
+        return []
+    return [
+        {"po_number": s["po_number"], "first_page": s["first_page"], "last_page": s["last_page"]}
+        for s in segments
+    ]
+
+
+@traced("pdf.split_plan")
+def plan_po_segments(pdf_path, builder_name="", builder_id=""):
+    """
+    Read the page text of a PDF and find its PO segments.
+
+    Returns:
+        tuple: (segments as returned by find_po_segments(), scan) where scan is the
+               {"text", "page_stats", "template"} that extract_data_from_pdf accepts
+    """
+    page_stats = []
+    page_texts = []
+    text = extract_with_pymupdf(pdf_path, page_stats, page_texts)
+    template = detect_template(text, builder_name, builder_id)
+    scan = {"text": text, "page_stats": page_stats, "template": template}
+    if len(page_texts) < 2 or not text:
+        return [], scan
+    return find_po_segments(page_texts, template), scan
+
+
+@traced("pdf.split_write")
+def write_segment_pdfs(pdf_path, segments, directory):
+    """
+    Save each segment's pages as its own PDF.
+
+    Returns:
+        list: Paths of the segment files, in segment order
+    """
+    fitz = load_pdf_backend("fitz")
+    paths = []
+    with fitz.open(pdf_path) as source:
+        for index, segment in enumerate(segments):
+            path = os.path.join(directory, f"segment-{index + 1:03d}.pdf")
+            with fitz.open() as part:
+                part.insert_pdf(source, from_page=segment["first_page"], to_page=segment["last_page"])
+                part.save(path)
+            paths.append(path)
+    return paths
+
+
+def _segment_pool():
+    """
+    Process pool for segment extraction, created on first use in each process.
+
+    Workers come from a fork server (spawn where that is unavailable), never
+    from a fork of a threaded web worker.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["utils.pdf_extractor"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=PO_SPLIT_WORKERS, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _extract_segment(path, builder_name, builder_id):
+    return extract_data_from_pdf(path, builder_name=builder_name, builder_id=builder_id)
+
+
+def _extract_segment_traced(path, builder_name, builder_id, trace_id):
+    """Pool entry point: extract a segment under the caller's trace ID and hand the spans back."""
+    with start_trace(trace_id) as trace:
+        result = _extract_segment(path, builder_name, builder_id)
+    return result, trace.export()
+
+
+def _extract_segments(paths, builder_name, builder_id, on_result):
+    """Run every segment through the pool (or inline with one worker), calling on_result as each finishes."""
+    results = [None] * len(paths)
+    if PO_SPLIT_WORKERS > 1:
+        trace = current_trace()
+        try:
+            pool = _segment_pool()
+            if trace is not None:
+                futures = {
+                    pool.submit(_extract_segment_traced, path, builder_name, builder_id, trace.trace_id): i
+                    for i, path in enumerate(paths)
+                }
+            else:
+                futures = {pool.submit(_extract_segment, path, builder_name, builder_id): i for i, path in enumerate(paths)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if trace is not None:
+                    results[index], exported = results[index]
+                    trace.merge(exported["spans"], exported["started_at"])
+                on_result(results[index])
+            return results
+        except BrokenProcessPool as e:
+            logger.error(f"[PO_SPLIT] Segment pool failed ({str(e)}); extracting remaining segments inline")
+            _discard_pool()
+    for index, path in enumerate(paths):
+        if results[index] is None:
+            results[index] = _extract_segment(path, builder_name, builder_id)
+            on_result(results[index])
+    return results
+
+
+def extract_purchase_orders(pdf_path, builder_name="", on_po_number=None, builder_id=""):
+    """
+    Extract every purchase order in a PDF.
+
+    A single-PO file goes straight to extract_data_from_pdf. A bundle is split
+    and its segments are extracted concurrently.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        builder_name (str): The builder name from the RFMS database
+        on_po_number (callable): Optional callback invoked with each PO number as its
+                                 segment finishes (for a single PO, as soon as it is parsed)
+        builder_id (str): The builder's RFMS customer ID
+
+    Returns:
+        list: One extraction result per PO, in page order. Results from a split
+              file carry "po_segment": {"index", "count", "pages"}.
+    """
+    segments = []
+    scan = None
+    if PO_SPLIT_ENABLED:
+        try:
+            segments, scan = plan_po_segments(pdf_path, builder_name, builder_id)
+        except Exception as e:
+            logger.warning(f"[PO_SPLIT] Could not scan {pdf_path} for PO boundaries: {str(e)}")
+    if not segments:
+        # A single PO: extraction reuses the text read while looking for PO boundaries
+        return [extract_data_from_pdf(pdf_path, builder_name, on_po_number, builder_id, scan=scan)]
+
+    logger.info(
+        f"[PO_SPLIT] {pdf_path} holds {len(segments)} POs: "
+        + ", ".join(f"{s['po_number'] or '?'} (p{s['first_page'] + 1}-{s['last_page'] + 1})" for s in segments)
+    )
+
+    def on_result(result):
+        if on_po_number and result.get("po_number"):
+            on_po_number(result["po_number"])
+
+    workdir = tempfile.mkdtemp(prefix=".po-split-", dir=os.path.dirname(os.path.abspath(pdf_path)))
+    try:
+        paths = write_segment_pdfs(pdf_path, segments, workdir)
+        results = _extract_segments(paths, builder_name, builder_id, on_result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for index, (segment, result) in enumerate(zip(segments, results)):
+        result["po_segment"] = {
+            "index": index + 1,
+            "count": len(segments),
+            "pages": [segment["first_page"] + 1, segment["last_page"] + 1],
+        }
+    return results
@@ -9,9 +9,14 @@ from models import db, RFMSSession
 import http.client
 import time
 from functools import lru_cache
+from utils.rfms_resilience import CircuitBreaker, CircuitOpenError, RateLimitExceeded, TokenBucket
+from utils.tracing import current_trace
 
 logger = logging.getLogger(__name__)
 
+# Endpoint families that get their own circuit breaker
+ENDPOINT_FAMILIES = ("session", "customers", "orders", "billing_groups")
+
 
 class RfmsApi:
     """
@@ -20,7 +25,7 @@ class RfmsApi:
     This class handles authentication and provides methods for various API endpoints.
     """
 
-    def __init__(self, base_url, store_code, username, api_key):
+    def __init__(self, base_url, store_code, username, api_key, write_behind=None):
         """
         Initialize the RFMS API client.
 
@@ -29,8 +34,11 @@ class RfmsApi:
             store_code (str): The store code for authentication
             username (str): The username for authentication
             api_key (str): The API key for authentication
+            write_behind (WriteBehindQueue): Optional queue for the shared session row;
+                                             without one it is committed immediately
         """
         self.base_url = base_url
+        self.write_behind = write_behind
         self.store_code = store_code
         self.username = username
         self.api_key = api_key
@@ -44,6 +52,24 @@ class RfmsApi:
         self.max_retries = 2
         self.auth = None  # Will store the current auth tuple
 
+        # Fail fast per endpoint family while RFMS is down, and cap our request rate
+        breaker_settings = {
+            "failure_threshold": float(os.getenv("RFMS_CIRCUIT_FAILURE_RATE", "0.5")),
+            "window_size": int(os.getenv("RFMS_CIRCUIT_WINDOW", "20")),
+            "min_calls": int(os.getenv("RFMS_CIRCUIT_MIN_CALLS", "5")),
+            "open_seconds": float(os.getenv("RFMS_CIRCUIT_OPEN_SECONDS", "30")),
+            "half_open_probes": int(os.getenv("RFMS_CIRCUIT_HALF_OPEN_PROBES", "1")),
+        }
+        self.breakers = {family: CircuitBreaker(family, **breaker_settings) for family in ENDPOINT_FAMILIES}
+        # The configured rate is for the whole deployment, but each worker process
+        # has its own bucket; gunicorn.conf.py sets the process count to its worker count
+        rate_processes = max(1, int(os.getenv("RFMS_RATE_LIMIT_PROCESSES", "1")))
+        self.rate_limiter = TokenBucket(
+            rate=float(os.getenv("RFMS_RATE_LIMIT_PER_SECOND", "5")) / rate_processes,
+            capacity=max(1, int(os.getenv("RFMS_RATE_LIMIT_BURST", "10")) // rate_processes),
+        )
+        self.rate_limit_max_wait = float(os.getenv("RFMS_RATE_LIMIT_MAX_WAIT", "30"))
+
         # Validate required credentials
         self._validate_credentials()
 
@@ -77,13 +103,81 @@ class RfmsApi:
             headers.update(extra_headers)
         return headers
 
+    @staticmethod
+    def _endpoint_family(url):
+        lowered = url.lower()
+        if "/session/" in lowered:
+            return "session"
+        if "billinggroup" in lowered:
+            return "billing_groups"
+        if "/order" in lowered or "/quote" in lowered:
+            return "orders"
+        return "customers"
+
+    def _send(self, method, url, **kwargs):
+        """
+        Send one HTTP request to RFMS through the rate limiter and the circuit
+        breaker for the URL's endpoint family.
+
+        Args:
+            method (str): HTTP method
+            url (str): Request URL
+            **kwargs: Passed through to requests.request (timeout defaults to self.timeout)
+
+        Returns:
+            requests.Response: The raw response
+
+        Raises:
+            CircuitOpenError: If the endpoint family is failing and the call was not sent
+            RateLimitExceeded: If no rate-limit token was available in time
+        """
+        family = self._endpoint_family(url)
+        breaker = self.breakers[family]
+        if not breaker.allow():
+            raise CircuitOpenError(f"RFMS {family} endpoints are unavailable (circuit open); not calling {url}")
+        started = time.perf_counter()
+        try:
+            self.rate_limiter.acquire(max_wait=self.rate_limit_max_wait)
+        except RateLimitExceeded:
+            breaker.release()
+            raise
+        kwargs.setdefault("timeout", self.timeout)
+        sent = time.perf_counter()
+        trace = current_trace()
+        try:
+            response = requests.request(method, url, **kwargs)
+        except RequestException as e:
+            breaker.record_failure()
+            if trace is not None:
+                trace.add(f"rfms.{family}", sent, time.perf_counter() - sent, method=method, error=type(e).__name__)
+            raise
+        if trace is not None:
+            # Time spent waiting on the rate limiter is reported apart from RFMS itself
+            if sent - started >= 0.001:
+                trace.add("rfms.rate_wait", started, sent - started)
+            trace.add(f"rfms.{family}", sent, time.perf_counter() - sent, method=method, status=response.status_code)
+        # Server errors and throttling mean RFMS is struggling; 4xx (including 401) is on us
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def circuit_status(self):
+        """
+        Returns:
+            dict: Circuit breaker state for each endpoint family
+        """
+        return {family: breaker.to_dict() for family, breaker in self.breakers.items()}
+
     def get_stored_session(self):
         session_row = RFMSSession.query.first()
         if session_row:
             return session_row.token, session_row.expiry
         return None, None
 
-    def store_session(self, token, expiry):
+    @staticmethod
+    def _save_session_row(token, expiry):
         session_row = RFMSSession.query.first()
         if session_row:
             session_row.token = token
@@ -91,11 +185,39 @@ class RfmsApi:
         else:
             session_row = RFMSSession(token=token, expiry=expiry)
             db.session.add(session_row)
-        db.session.commit()
+
+    def store_session(self, token, expiry):
+        # The row only shares the token with other workers; this process keeps its own copy
+        if self.write_behind is not None:
+            self.write_behind.submit("rfms_session", self._save_session_row, token, expiry)
+        else:
+            self._save_session_row(token, expiry)
+            db.session.commit()
+
+    def invalidate_session(self, token=None):
+        """
+        Drop a token RFMS rejected so the next ensure_session performs a handshake.
+
+        Args:
+            token (str): The rejected token; the stored session is only expired if it
+                         still holds this token (another thread may already have renewed it)
+        """
+        token = token or self.session_token
+        self.session_token = None
+        self.session_expiry = None
+        # Synchronous: the retry right after a 401 must not read the rejected token back
+        session_row = RFMSSession.query.first()
+        if session_row and session_row.token == token:
+            session_row.expiry = datetime.utcnow()
+            db.session.commit()
 
     def ensure_session(self):
         now = datetime.utcnow()
         skew = timedelta(seconds=10)
+        # This process's own token first: no database read, and it is current even
+        # while a write-behind of the shared row is still pending
+        if self.session_token and isinstance(self.session_expiry, datetime) and now < self.session_expiry - skew:
+            return True
         token, expiry = self.get_stored_session()
         logger.debug(f"[SESSION] ensure_session: now (UTC)={now} ({type(now)}), expiry={expiry} ({type(expiry)})")
         # If expiry is a string, try to parse it as UTC
@@ -134,9 +256,7 @@ class RfmsApi:
             logger.info(f"Attempting to begin session at {url} with store code {self.store_code}")
             logger.debug(f"[RFMS API] Outgoing handshake auth: (username: {auth[0]}, password: {'*' * len(auth[1])})")
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.post(
-                url, headers=headers, auth=auth, timeout=self.timeout
-            )
+            response = self._send("POST", url, headers=headers, auth=auth)
             logger.info(f"RFMS API response status: {response.status_code}")
             if response.status_code == 200:
                 data = response.json()
@@ -175,7 +295,7 @@ class RfmsApi:
             method (str): HTTP method (GET, POST, PUT, DELETE)
             url (str): Request URL
             payload (dict): Request payload (for POST/PUT)
-            retry_count (int): Current retry count
+            retry_count (int): Number of 401 retries already used
 
         Returns:
             dict: Response data if successful
@@ -184,35 +304,27 @@ class RfmsApi:
             Exception: If request fails after all retries
         """
         logger.info(f"[RFMS API] {method} {url} | Payload: {payload}")
-        if not self.ensure_session():
-            raise Exception("Failed to establish RFMS API session")
-        headers = self._get_headers()
-        auth = self._get_auth()
-        logger.debug(
-            f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
-        )
-        logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-        try:
-            logger.debug(f"Executing {method} request to {url}")
+        if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"Unsupported HTTP method: {method}")
 
-            if method.upper() == "GET":
-                response = requests.get(
-                    url, headers=headers, auth=auth, timeout=self.timeout
-                )
-            elif method.upper() == "POST":
-                response = requests.post(
-                    url, headers=headers, auth=auth, json=payload, timeout=self.timeout
-                )
-            elif method.upper() == "PUT":
-                response = requests.put(
-                    url, headers=headers, auth=auth, json=payload, timeout=self.timeout
-                )
-            elif method.upper() == "DELETE":
-                response = requests.delete(
-                    url, headers=headers, auth=auth, timeout=self.timeout
-                )
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+        # Iterate rather than recurse: a 401 gets a fresh handshake and one more
+        # try, up to max_retries, without stacking frames or blocked threads
+        while True:
+            if not self.ensure_session():
+                raise Exception("Failed to establish RFMS API session")
+            headers = self._get_headers()
+            auth = self._get_auth()
+            logger.debug(
+                f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
+            )
+            logger.debug(f"[RFMS API] Outgoing headers: {headers}")
+            try:
+                logger.debug(f"Executing {method} request to {url}")
+                body = payload if method.upper() in ("POST", "PUT") else None
+                response = self._send(method.upper(), url, headers=headers, auth=auth, json=body)
+            except Exception as e:
+                logger.error(f"Error executing request: {str(e)}")
+                raise
 
             # Check for successful response
             if response.status_code == 200:
@@ -223,30 +335,25 @@ class RfmsApi:
                     raise Exception("Invalid JSON response from API")
 
             # Handle unauthorized response (401) by getting a new session and retrying
-            elif response.status_code == 401 and retry_count < self.max_retries:
+            if response.status_code == 401 and retry_count < self.max_retries:
                 logger.warning(
                     "Session expired or unauthorized, requesting new session"
                 )
-                self.session_token = None
-                self.session_expiry = None
-                return self.execute_request(method, url, payload, retry_count + 1)
+                self.invalidate_session(auth[1])
+                retry_count += 1
+                continue
 
             # Handle other errors
-            else:
-                error_message = f"API request failed with status {response.status_code}"
-                try:
-                    error_data = response.json()
-                    if "error" in error_data:
-                        error_message += f": {error_data['error']}"
-                except:
-                    error_message += f": {response.text}"
-
-                logger.error(error_message)
-                raise Exception(error_message)
+            error_message = f"API request failed with status {response.status_code}"
+            try:
+                error_data = response.json()
+                if "error" in error_data:
+                    error_message += f": {error_data['error']}"
+            except:
+                error_message += f": {response.text}"
 
-        except Exception as e:
-            logger.error(f"Error executing request: {str(e)}")
-            raise
+            logger.error(error_message)
+            raise Exception(error_message)
 
     def check_status(self):
         """
@@ -262,9 +369,7 @@ class RfmsApi:
                 f"[RFMS API] Outgoing handshake auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
             )
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.post(
-                url, headers=headers, auth=auth, timeout=self.timeout
-            )
+            response = self._send("POST", url, headers=headers, auth=auth)
             if response.status_code == 200:
                 return "online"
             else:
@@ -278,6 +383,9 @@ class RfmsApi:
         except ConnectionError:
             logger.error("API connection error during status check")
             return "offline"
+        except CircuitOpenError as e:
+            logger.warning(f"API status check skipped: {str(e)}")
+            return "offline"
         except Exception as e:
             logger.error(f"Error checking API status: {str(e)}")
             return "offline"
@@ -329,9 +437,7 @@ class RfmsApi:
                 f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
             )
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.post(
-                url, headers=headers, auth=auth, json=payload, timeout=self.timeout
-            )
+            response = self._send("POST", url, headers=headers, auth=auth, json=payload)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -556,9 +662,7 @@ class RfmsApi:
                 f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
             )
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.get(
-                url, headers=headers, auth=auth, timeout=self.timeout
-            )
+            response = self._send("GET", url, headers=headers, auth=auth)
             if response.status_code == 200:
                 data = response.json()
                 if "result" in data:
@@ -658,9 +762,7 @@ class RfmsApi:
                 f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
             )
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.post(
-                url, headers=headers, auth=auth, json=payload, timeout=self.timeout
-            )
+            response = self._send("POST", url, headers=headers, auth=auth, json=payload)
             if response.status_code == 200:
                 data = response.json()
                 return data.get("result", {}).get("quote", {})
@@ -713,11 +815,14 @@ class RfmsApi:
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
             logger.info(f"[RFMS API] Payload format: {'comprehensive' if 'soldTo' in job_data else 'legacy'}")
             
-            response = requests.post(
-                f"{self.base_url}/v2/order/create", 
-                headers=headers, 
-                auth=auth, 
-                json=payload
+            # Order creation can be slow on RFMS's side; allow longer than lookups
+            response = self._send(
+                "POST",
+                f"{self.base_url}/v2/order/create",
+                headers=headers,
+                auth=auth,
+                json=payload,
+                timeout=max(self.timeout, 30),
             )
             
             logger.info(f"[RFMS API] Order creation response status: {response.status_code}")
@@ -762,9 +867,7 @@ class RfmsApi:
                 f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
             )
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.post(
-                url, headers=headers, auth=auth, json=payload, timeout=self.timeout
-            )
+            response = self._send("POST", url, headers=headers, auth=auth, json=payload)
             if response.status_code == 200:
                 data = response.json()
                 return data.get("result", {})
@@ -789,13 +892,7 @@ class RfmsApi:
             # Remove 'stores' key if present
             if 'stores' in search_params:
                 del search_params['stores']
-            response = requests.post(
-                url,
-                headers=headers,
-                auth=auth,
-                json=search_params,
-                timeout=self.timeout,
-            )
+            response = self._send("POST", url, headers=headers, auth=auth, json=search_params)
             if response.status_code == 200:
                 return response.json().get("result", {})
             else:
@@ -814,9 +911,7 @@ class RfmsApi:
                 f"[RFMS API] Outgoing auth: (username: {auth[0]}, password: {'*' * len(str(auth[1]))})"
             )
             logger.debug(f"[RFMS API] Outgoing headers: {headers}")
-            response = requests.get(
-                url, headers=headers, auth=auth, timeout=self.timeout
-            )
+            response = self._send("GET", url, headers=headers, auth=auth)
             if response.status_code == 200:
                 return response.json().get("result", {})
             else:
@@ -978,17 +1073,23 @@ class RfmsApi:
         logger.info(f"[TIMER] _format_customer_list duration: {end_time - start_time:.2f}s for {len(formatted_customers)} customers")
         return formatted_customers
 
-    def find_order_by_po_number(self, po_number):
+    def find_order_by_po_number(self, po_number, raise_on_error=False):
         """
         Search for an order in RFMS by PO number.
         Returns the order if found, or None if not found.
+
+        Args:
+            po_number (str): The PO number to look up
+            raise_on_error (bool): Raise instead of returning None when the lookup
+                                   itself fails, so callers can tell "not found"
+                                   apart from "could not check"
         """
         url = f"{self.base_url}/v2/order/find"
         payload = {"poNumber": po_number}
         headers = self._get_headers()
         auth = self._get_auth()
         try:
-            response = requests.post(url, headers=headers, auth=auth, json=payload, timeout=self.timeout)
+            response = self._send("POST", url, headers=headers, auth=auth, json=payload)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("result"):
@@ -998,7 +1099,11 @@ class RfmsApi:
                 return None
             else:
                 logger.error(f"Order find failed: {response.status_code} {response.text}")
+                if raise_on_error:
+                    raise Exception(f"Order find failed - HTTP {response.status_code}: {response.text}")
                 return None
         except Exception as e:
             logger.error(f"Error searching for order by PO number: {str(e)}")
+            if raise_on_error:
+                raise
             return None
@@ -0,0 +1,278 @@
+"""
+Persistent outbox for RFMS order creation.
+
+Export requests are written to the rfms_outbox table under an idempotency key
+before any RFMS call is made. A background dispatcher claims due rows, delivers
+them through payload_service.export_data_to_rfms and records the outcome, so a
+browser retry, a worker restart or a timeout after RFMS committed the order can
+never create the same order twice.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, PdfData, RfmsOutbox
+from utils import payload_service
+
+logger = logging.getLogger(__name__)
+
+
+def compute_idempotency_key(export_data):
+    """
+    Derive the idempotency key for an export request.
+
+    Args:
+        export_data (dict): Export request as sent by the review UI
+
+    Returns:
+        str: "<po_number>:<sha256 of the canonical payload>"
+    """
+    po_number = (export_data.get("job_details", {}) or {}).get("po_number", "") or ""
+    canonical = json.dumps(export_data, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{str(po_number)[:50]}:{digest}"
+
+
+def enqueue_export(export_data):
+    """
+    Store an export request in the outbox, or return the existing entry for it.
+
+    A failed entry submitted again is put back in the queue; a pending, in-flight
+    or delivered entry is returned untouched.
+
+    Args:
+        export_data (dict): Export request as sent by the review UI
+
+    Returns:
+        tuple: (RfmsOutbox entry, created flag)
+    """
+    key = compute_idempotency_key(export_data)
+    entry = RfmsOutbox.query.filter_by(idempotency_key=key).first()
+    if entry is None:
+        pdf_id = export_data.get("pdf_id")
+        entry = RfmsOutbox(
+            idempotency_key=key,
+            po_number=(export_data.get("job_details", {}) or {}).get("po_number"),
+            pdf_id=int(pdf_id) if str(pdf_id or "").isdigit() else None,
+            status=RfmsOutbox.STATUS_PENDING,
+            next_attempt_at=datetime.utcnow(),
+        )
+        entry.payload = export_data
+        db.session.add(entry)
+        try:
+            db.session.commit()
+            logger.info(f"[OUTBOX] Queued export {entry.id} for PO {entry.po_number}")
+            return entry, True
+        except IntegrityError:
+            # Another request inserted the same key between our lookup and insert
+            db.session.rollback()
+            entry = RfmsOutbox.query.filter_by(idempotency_key=key).first()
+            return entry, False
+
+    if entry.status == RfmsOutbox.STATUS_FAILED:
+        # Keep last_error so the dispatcher reconciles with RFMS before re-creating
+        entry.status = RfmsOutbox.STATUS_PENDING
+        entry.attempts = 0
+        entry.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"[OUTBOX] Re-queued failed export {entry.id} for PO {entry.po_number}")
+    return entry, False
+
+
+class OutboxDispatcher:
+    """
+    Background delivery of queued RFMS exports.
+
+    Rows are claimed with a conditional UPDATE so only one thread or worker
+    process delivers a given entry. Any entry that has been attempted before is
+    reconciled against RFMS (order lookup by PO number) before another create
+    is sent.
+    """
+
+    def __init__(self, app, get_api_client, poll_interval=None, max_attempts=None,
+                 base_backoff=None, lease_seconds=None, batch_size=10):
+        """
+        Args:
+            app: Flask application, used for app contexts in the dispatcher thread
+            get_api_client (callable): Returns a configured RfmsApi instance
+            poll_interval (float): Seconds between scans for due entries
+            max_attempts (int): Attempts before an entry is marked failed
+            base_backoff (float): First retry delay in seconds, doubled per attempt
+            lease_seconds (int): How long a claim is held before another worker may retake it
+            batch_size (int): Entries delivered per scan
+        """
+        self.app = app
+        self.get_api_client = get_api_client
+        self.poll_interval = poll_interval or float(os.getenv("RFMS_OUTBOX_POLL_SECONDS", "5"))
+        self.max_attempts = max_attempts or int(os.getenv("RFMS_OUTBOX_MAX_ATTEMPTS", "5"))
+        self.base_backoff = base_backoff or float(os.getenv("RFMS_OUTBOX_BACKOFF_SECONDS", "10"))
+        self.lease_seconds = lease_seconds or int(os.getenv("RFMS_OUTBOX_LEASE_SECONDS", "300"))
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        """Start the dispatcher thread once per process (safe to call on every request)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="rfms-outbox", daemon=True)
+            self._thread.start()
+            logger.info(f"[OUTBOX] Dispatcher started (poll every {self.poll_interval}s)")
+
+    def wake(self):
+        """Ask the dispatcher to scan now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    self.dispatch_due()
+            except Exception as e:
+                logger.error(f"[OUTBOX] Dispatcher scan failed: {str(e)}")
+
+    def _claimable_filter(self, now):
+        stale_before = now - timedelta(seconds=self.lease_seconds)
+        return db.or_(
+            db.and_(RfmsOutbox.status == RfmsOutbox.STATUS_PENDING, RfmsOutbox.next_attempt_at <= now),
+            db.and_(RfmsOutbox.status == RfmsOutbox.STATUS_IN_PROGRESS, RfmsOutbox.claimed_at < stale_before),
+        )
+
+    def dispatch_due(self):
+        """Deliver every entry that is due, or whose claim has gone stale."""
+        now = datetime.utcnow()
+        due_ids = [
+            row.id for row in RfmsOutbox.query.with_entities(RfmsOutbox.id)
+            .filter(self._claimable_filter(now))
+            .order_by(RfmsOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .all()
+        ]
+        for entry_id in due_ids:
+            self.deliver(entry_id)
+        return len(due_ids)
+
+    def _claim(self, entry_id):
+        now = datetime.utcnow()
+        claimed = RfmsOutbox.query.filter(
+            RfmsOutbox.id == entry_id, self._claimable_filter(now)
+        ).update(
+            {
+                RfmsOutbox.status: RfmsOutbox.STATUS_IN_PROGRESS,
+                RfmsOutbox.claimed_at: now,
+                RfmsOutbox.attempts: RfmsOutbox.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def deliver(self, entry_id):
+        """
+        Claim and deliver one outbox entry. Must run inside an app context.
+
+        Args:
+            entry_id (int): RfmsOutbox primary key
+
+        Returns:
+            RfmsOutbox: The entry in its state after this call. If another worker
+                        holds the claim, or the entry is not yet due, it is
+                        returned unchanged.
+        """
+        claimed = self._claim(entry_id)
+        db.session.expire_all()
+        entry = db.session.get(RfmsOutbox, entry_id)
+        if not claimed or entry is None:
+            return entry
+
+        export_data = entry.payload
+        logger.info(f"[OUTBOX] Delivering export {entry.id} for PO {entry.po_number} (attempt {entry.attempts})")
+        try:
+            api_client = self.get_api_client()
+            if not api_client.ensure_session():
+                raise Exception("Could not establish RFMS session")
+
+            # A previous attempt may have reached RFMS even though we never saw
+            # the response, so look the PO up before creating it again
+            if entry.attempts > 1 or entry.last_error:
+                existing = api_client.find_order_by_po_number(entry.po_number, raise_on_error=True)
+                if existing:
+                    self._reconcile_existing(entry, export_data, existing)
+                    return entry
+
+            result = payload_service.export_data_to_rfms(api_client, export_data, logger)
+            self._mark_delivered(entry, result)
+        except Exception as e:
+            self._mark_retry(entry, e)
+        return entry
+
+    def _reconcile_existing(self, entry, export_data, existing):
+        order = existing[0] if isinstance(existing, list) and existing else existing
+        order_id = None
+        if isinstance(order, dict):
+            order_id = order.get("id") or order.get("orderId") or order.get("documentNumber")
+        elif order:
+            order_id = order
+
+        billing_group = export_data.get("billing_group", {}) or {}
+        if billing_group.get("is_billing_group"):
+            # The child order and grouping may or may not have been created; a
+            # human has to check rather than risk a second parent order
+            entry.status = RfmsOutbox.STATUS_FAILED
+            entry.rfms_order_id = str(order_id) if order_id else None
+            entry.last_error = (
+                f"Order {order_id} already exists in RFMS for PO {entry.po_number}; "
+                "billing group state must be checked manually"
+            )
+            db.session.commit()
+            logger.warning(f"[OUTBOX] Export {entry.id}: {entry.last_error}")
+            return
+
+        self._mark_delivered(entry, {
+            "success": True,
+            "order_id": order_id,
+            "reconciled": True,
+            "message": f"Order already existed in RFMS for PO {entry.po_number}; no new order created",
+        })
+
+    def _mark_delivered(self, entry, result):
+        entry.status = RfmsOutbox.STATUS_DELIVERED
+        entry.rfms_order_id = str(result.get("order_id")) if result.get("order_id") else None
+        entry.result = result
+        entry.last_error = None
+        entry.delivered_at = datetime.utcnow()
+        if entry.pdf_id:
+            pdf_entry = db.session.get(PdfData, entry.pdf_id)
+            if pdf_entry:
+                pdf_entry.processed = True
+        db.session.commit()
+        logger.info(f"[OUTBOX] Export {entry.id} delivered: order {entry.rfms_order_id}")
+
+    def _mark_retry(self, entry, error):
+        db.session.rollback()
+        entry = db.session.get(RfmsOutbox, entry.id)
+        entry.last_error = str(error)
+        if entry.attempts >= self.max_attempts:
+            entry.status = RfmsOutbox.STATUS_FAILED
+            logger.error(f"[OUTBOX] Export {entry.id} failed after {entry.attempts} attempts: {entry.last_error}")
+        else:
+            delay = min(self.base_backoff * (2 ** (entry.attempts - 1)), 3600)
+            entry.status = RfmsOutbox.STATUS_PENDING
+            entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(
+                f"[OUTBOX] Export {entry.id} attempt {entry.attempts} failed, retrying in {delay:.0f}s: {entry.last_error}"
+            )
+        db.session.commit()
@@ -0,0 +1,182 @@
+"""
+Circuit breaker and token-bucket rate limiter for RFMS API calls.
+
+RfmsApi keeps one CircuitBreaker per endpoint family (session, customers,
+orders, billing groups) and a single TokenBucket shared by every call, so a
+dead RFMS fails fast instead of tying up worker threads for the full timeout,
+and batch jobs cannot send requests faster than the configured rate. Buckets
+are per process: RfmsApi gives each one RFMS_RATE_LIMIT_PER_SECOND divided by
+RFMS_RATE_LIMIT_PROCESSES.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling RFMS while an endpoint family's circuit is open."""
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not get a rate-limit token within its wait budget."""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over a rolling window of recent calls.
+
+    closed     - calls go through; outcomes are recorded in the window
+    open       - calls fail fast until open_seconds have passed
+    half_open  - up to half_open_probes calls are let through; one success
+                 closes the circuit, one failure opens it again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=0.5, window_size=20, min_calls=5,
+                 open_seconds=30.0, half_open_probes=1):
+        """
+        Args:
+            name (str): Endpoint family name, used in logs and errors
+            failure_threshold (float): Failure rate (0-1) in the window that opens the circuit
+            window_size (int): Number of recent calls considered
+            min_calls (int): Calls needed in the window before the rate is trusted
+            open_seconds (float): Time to stay open before probing
+            half_open_probes (int): Concurrent probe calls allowed while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._window = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            logger.info(f"[CIRCUIT] {self.name} half-open, allowing probe calls")
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._window.clear()
+
+    def allow(self):
+        """
+        Reserve permission for one call.
+
+        Returns:
+            bool: True if the call may proceed; the caller must then report the
+                  outcome with record_success, record_failure or release
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def release(self):
+        """Give back a reserved call that was never sent."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._window.clear()
+                logger.info(f"[CIRCUIT] {self.name} closed after successful probe")
+            elif self._state == self.CLOSED:
+                self._window.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                logger.warning(f"[CIRCUIT] {self.name} probe failed, re-opened for {self.open_seconds}s")
+                return
+            if self._state != self.CLOSED:
+                return
+            self._window.append(False)
+            if len(self._window) >= self.min_calls:
+                failures = self._window.count(False)
+                if failures / len(self._window) >= self.failure_threshold:
+                    self._open()
+                    logger.warning(
+                        f"[CIRCUIT] {self.name} opened: {failures} failures in last calls, "
+                        f"failing fast for {self.open_seconds}s"
+                    )
+
+    def to_dict(self):
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "recent_calls": len(self._window),
+                "recent_failures": self._window.count(False),
+            }
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, bursts of up to capacity.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): Tokens added per second; 0 or less disables limiting
+            capacity (int): Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        """
+        Take one token, sleeping until one is available.
+
+        Args:
+            max_wait (float): Longest time to wait; None waits as long as needed
+
+        Raises:
+            RateLimitExceeded: If no token becomes available within max_wait
+        """
+        if self.rate <= 0:
+            return
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise RateLimitExceeded(f"RFMS rate limit: no token available within {max_wait}s")
+            time.sleep(wait)
@@ -0,0 +1,242 @@
+"""
+Request-scoped tracing.
+
+Every request gets a trace ID (the caller's X-Request-ID when it sends a
+sane one) and a Trace that collects timed spans: PDF backends, template
+detection and parsing in pdf_extractor, each HTTP call RfmsApi makes, and
+the waits in the upload route. The current trace lives in a context
+variable, so code deep in the extractor or the RFMS client records spans
+without being handed anything; submit_rfms_task copies the context into the
+background pool, and the PO splitter carries the trace ID into its worker
+processes and merges their spans back.
+
+When the response is sent, span durations are summed by name into a
+Server-Timing header (visible in the browser's network panel and read by
+the debug panel in main.js), the trace ID is echoed in X-Request-ID, and
+once the body has been sent one JSON trace record is written per request.
+Log records carry the trace ID as %(trace_id)s.
+
+Outside a request (CLI tools, background jobs) span() does nothing.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+# JSON lines file for trace records; unset logs them through the app log as [TRACE]
+TRACE_LOG_FILE = os.getenv("TRACE_LOG_FILE", "")
+# Only write trace records for requests at least this slow (Server-Timing is always sent)
+TRACE_RECORD_MIN_MS = float(os.getenv("TRACE_RECORD_MIN_MS", "0"))
+
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Spans recorded for one request, from any thread that carries its context."""
+
+    def __init__(self, trace_id=None, name=""):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, started, duration, **attrs):
+        """
+        Args:
+            name (str): Span name; spans with the same name are summed in Server-Timing
+            started (float): time.perf_counter() when the span began
+            duration (float): Seconds
+        """
+        entry = {
+            "name": name,
+            "start_ms": round((started - self._started) * 1000, 2),
+            "dur_ms": round(duration * 1000, 2),
+        }
+        if attrs:
+            entry["attrs"] = attrs
+        with self._lock:
+            self._spans.append(entry)
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def merge(self, spans, started_at):
+        """Add spans exported by a trace in another process that began at wall time started_at."""
+        offset = round((started_at - self.started_at) * 1000, 2)
+        with self._lock:
+            self._spans.extend({**span, "start_ms": round(span["start_ms"] + offset, 2)} for span in spans)
+
+    def export(self):
+        return {"started_at": self.started_at, "spans": self.spans()}
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self._started) * 1000, 2)
+
+    def server_timing(self):
+        """Server-Timing header value: one entry per span name, then the total so far."""
+        totals = {}
+        for span in self.spans():
+            duration, count = totals.get(span["name"], (0.0, 0))
+            totals[span["name"]] = (duration + span["dur_ms"], count + 1)
+        entries = [
+            f'{name};dur={duration:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (duration, count) in totals.items()
+        ]
+        entries.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+
+def current_trace():
+    return _current.get()
+
+
+def current_trace_id():
+    trace = _current.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextmanager
+def use_trace(trace):
+    """Make an existing Trace (e.g. the submitting request's, in a pool thread) current for the block."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def start_trace(trace_id=None, name=""):
+    """Make a new Trace current for the duration of the block."""
+    return use_trace(Trace(trace_id, name))
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as a span of the current trace; a no-op when there is none."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter() - started, **attrs)
+
+
+def traced(name):
+    """Decorator: time every call of the function as a span."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_log_record_factory():
+    """Give every log record a trace_id attribute ("-" outside a trace) for use in log formats."""
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, "adds_trace_id", False):
+        return
+
+    def factory(*args, **kwargs):
+        record = previous(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+
+    factory.adds_trace_id = True
+    logging.setLogRecordFactory(factory)
+
+
+def _trace_logger():
+    trace_logger = logging.getLogger("trace")
+    if TRACE_LOG_FILE and not trace_logger.handlers:
+        handler = logging.FileHandler(TRACE_LOG_FILE, delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_logger.addHandler(handler)
+        trace_logger.setLevel(logging.INFO)
+        trace_logger.propagate = False
+    return trace_logger
+
+
+# Flask is imported in the request hooks only: pdf_extractor and its worker
+# processes import this module and should not pay for Flask at startup
+
+def _begin_request_trace():
+    from flask import g, request
+
+    if not TRACE_ENABLED:
+        return
+    incoming = request.headers.get("X-Request-ID", "")
+    trace = Trace(incoming if _TRACE_ID_PATTERN.match(incoming) else None, request.endpoint or "")
+    g.trace = trace
+    g.trace_token = _current.set(trace)
+
+
+def _finish_request_trace(response):
+    from flask import g, request
+
+    trace = g.get("trace")
+    if trace is None:
+        return response
+    response.headers["X-Request-ID"] = trace.trace_id
+    response.headers["Server-Timing"] = trace.server_timing()
+    if request.endpoint == "static":
+        return response
+
+    method, path, status = request.method, request.path, response.status_code
+
+    def write_record():
+        # After the body is sent, so streamed responses include their spans
+        duration_ms = trace.elapsed_ms()
+        if duration_ms < TRACE_RECORD_MIN_MS:
+            return
+        record = {
+            "trace_id": trace.trace_id,
+            "endpoint": trace.name,
+            "method": method,
+            "path": path,
+            "status": status,
+            "started_at": round(trace.started_at, 3),
+            "duration_ms": duration_ms,
+            "spans": trace.spans(),
+        }
+        message = json.dumps(record)
+        with use_trace(trace):
+            _trace_logger().info(message if TRACE_LOG_FILE else f"[TRACE] {message}")
+
+    response.call_on_close(write_record)
+    return response
+
+
+def _end_request_trace(exc):
+    from flask import g
+
+    token = g.pop("trace_token", None)
+    if token is not None:
+        try:
+            _current.reset(token)
+        except ValueError:  # Set in a different context (e.g. a copied one); nothing to undo here
+            pass
+
+
+def init_tracing(app):
+    """Register per-request traces, the Server-Timing and X-Request-ID headers and trace records."""
+    app.before_request(_begin_request_trace)
+    app.after_request(_finish_request_trace)
+    app.teardown_request(_end_request_trace)
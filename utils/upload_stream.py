@@ -0,0 +1,166 @@
+"""
+Streaming ingestion for PDF uploads.
+
+Werkzeug's multipart parser hands each file part to the request's stream
+factory chunk by chunk. StreamingUploadRequest replaces the default factory for
+PDF parts with PdfUploadSpool, which writes straight to a temp file in the
+upload folder, hashes the bytes as they arrive, checks the %PDF header within
+the first chunk and stops the upload as soon as it exceeds the size limit. The
+extractor then gets that file path directly, with no second copy and no
+whole-upload buffer in memory.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+# PDF readers accept junk before the header, but it must appear within the first 1 KB
+PDF_HEADER = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+
+
+class PdfUploadTooLarge(RequestEntityTooLarge):
+    description = "The uploaded PDF is larger than the allowed maximum."
+
+
+class NotAPdfUpload(BadRequest):
+    description = "The uploaded file is not a PDF."
+
+
+class PdfUploadSpool:
+    """
+    Writable file object that receives one uploaded PDF.
+
+    Data goes to a named temp file while a SHA-256 is updated on the fly. The
+    file is removed on close() unless it was moved elsewhere with persist() or
+    handed over with release().
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        Args:
+            directory (str): Where to create the spool file (same filesystem as the
+                             final upload location, so persist() is a rename)
+            max_bytes (int): Largest accepted file size
+        """
+        os.makedirs(directory, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(suffix=".pdf", prefix=".upload-", dir=directory)
+        self._file = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._persisted = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise PdfUploadTooLarge(
+                f"The uploaded PDF exceeds the maximum size of {self.max_bytes / (1024 * 1024):.1f} MB."
+            )
+        if len(self._head) < PDF_HEADER_WINDOW:
+            self._head += data[:PDF_HEADER_WINDOW - len(self._head)]
+            if len(self._head) >= PDF_HEADER_WINDOW and PDF_HEADER not in self._head:
+                self.discard()
+                raise NotAPdfUpload()
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def finish(self):
+        """
+        Final checks once the part has been fully received.
+
+        Raises:
+            NotAPdfUpload: If the file was too short to contain a PDF header
+        """
+        if PDF_HEADER not in self._head:
+            self.discard()
+            raise NotAPdfUpload()
+        self._file.flush()
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def release(self):
+        """
+        Close the file handle but keep the file at self.name; the caller now owns it.
+
+        Call before another reader opens the path: Windows cannot remove or rename
+        a file that is still open.
+        """
+        self._file.flush()
+        self._file.close()
+        self._persisted = True
+
+    def persist(self, path):
+        """Move the spooled file to path (a rename, not a copy)."""
+        self.release()
+        os.replace(self.name, path)
+        self.name = path
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.name):
+            os.remove(self.name)
+
+    def close(self):
+        self._file.close()
+        if not self._persisted and os.path.exists(self.name):
+            os.remove(self.name)
+
+    # The parser and FileStorage also seek/read/tell the container
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+
+
+class StreamingUploadRequest(Request):
+    """Flask request class that spools .pdf file parts through PdfUploadSpool."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and filename.lower().endswith(".pdf"):
+            config = current_app.config
+            return PdfUploadSpool(
+                directory=config.get("UPLOAD_SPOOL_DIR") or config["UPLOAD_FOLDER"],
+                max_bytes=config.get("PDF_MAX_UPLOAD_BYTES") or config.get("MAX_CONTENT_LENGTH") or 16 * 1024 * 1024,
+            )
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def spool_upload(file_storage, directory):
+    """
+    Get an on-disk path and SHA-256 for an uploaded PDF.
+
+    Uses the streamed spool when the request went through StreamingUploadRequest,
+    otherwise saves the upload to a temp file and hashes it.
+
+    Args:
+        file_storage (FileStorage): The uploaded file
+        directory (str): Temp directory for the fallback path
+
+    Returns:
+        tuple: (PdfUploadSpool or None, file path, sha256 hex digest)
+
+    Raises:
+        NotAPdfUpload: If the content does not start like a PDF
+    """
+    spool = file_storage.stream if isinstance(file_storage.stream, PdfUploadSpool) else None
+    if spool is not None:
+        spool.finish()
+        return spool, spool.name, spool.hexdigest()
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=directory) as tmp_file:
+        file_storage.save(tmp_file.name)
+        path = tmp_file.name
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(PDF_HEADER_WINDOW)
+        digest.update(head)
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    if PDF_HEADER not in head:
+        os.remove(path)
+        raise NotAPdfUpload()
+    return None, path, digest.hexdigest()
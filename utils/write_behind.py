@@ -0,0 +1,151 @@
+"""
+Write-behind queue for database writes that can wait a moment.
+
+Writes that only cache or record something (the shared RFMS session token,
+for example) do not need their own commit on the request thread. They are
+queued under a key; a later write with the same key replaces the pending one,
+and a background thread commits everything pending in a single transaction
+every flush interval. On SQLite that turns many short write locks into one.
+
+Writes a request depends on (new uploads, outbox state, processed flags) stay
+synchronous.
+"""
+import atexit
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Coalesces keyed writes and commits them in batches from a background thread.
+
+    A write is a callable that changes rows through db.session but does not
+    commit. It runs in the flusher thread's own app context, so it must not
+    rely on objects loaded by the caller's session.
+    """
+
+    def __init__(self, app, flush_interval=None, max_batch=None, enabled=None):
+        """
+        Args:
+            app: Flask application, used for app contexts in the flusher thread
+            flush_interval (float): Seconds between flushes
+            max_batch (int): Pending writes that trigger an early flush
+            enabled (bool): False runs every write immediately, as before
+        """
+        self.app = app
+        self.flush_interval = flush_interval or float(os.getenv("DB_WRITE_BEHIND_FLUSH_SECONDS", "0.5"))
+        self.max_batch = max_batch or int(os.getenv("DB_WRITE_BEHIND_MAX_BATCH", "200"))
+        if enabled is None:
+            enabled = os.getenv("DB_WRITE_BEHIND_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = Counter()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queue a write.
+
+        Args:
+            key (str): Writes with the same key coalesce (last one wins); None never coalesces
+            fn (callable): Called as fn(*args, **kwargs) inside an app context; must not commit
+        """
+        if not self.enabled:
+            fn(*args, **kwargs)
+            db.session.commit()
+            return
+        self.ensure_started()
+        with self._lock:
+            if key is None:
+                key = uuid.uuid4().hex
+            elif key in self._pending:
+                self._stats["coalesced"] += 1
+            self._pending[key] = (fn, args, kwargs)
+            self._stats["submitted"] += 1
+            pending = len(self._pending)
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    def ensure_started(self):
+        """Start the flusher thread once per process."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Inherited from the parent across a fork; the parent flushes its own
+                self._pending.clear()
+                self._stats.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+            logger.info(f"[WRITE_BEHIND] Flusher started (every {self.flush_interval}s)")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[WRITE_BEHIND] Flush failed: {str(e)}")
+
+    def flush(self):
+        """
+        Commit every pending write now.
+
+        Returns:
+            int: Writes committed
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending or self._pid != os.getpid():
+                    return 0
+                batch, self._pending = self._pending, {}
+            with self.app.app_context():
+                try:
+                    for fn, args, kwargs in batch.values():
+                        fn(*args, **kwargs)
+                    db.session.commit()
+                    committed = len(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"[WRITE_BEHIND] Batch of {len(batch)} failed ({str(e)}); retrying one by one")
+                    committed = self._commit_each(batch)
+            self._stats["committed"] += committed
+            self._stats["batches"] += 1
+            return committed
+
+    def _commit_each(self, batch):
+        committed = 0
+        for key, (fn, args, kwargs) in batch.items():
+            try:
+                fn(*args, **kwargs)
+                db.session.commit()
+                committed += 1
+            except Exception as e:
+                db.session.rollback()
+                self._stats["dropped"] += 1
+                logger.error(f"[WRITE_BEHIND] Dropped write {key}: {str(e)}")
+        return committed
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Counters since the process started, plus the current backlog
+        """
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending), "enabled": self.enabled}